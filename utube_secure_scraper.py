@@ -1,7 +1,4 @@
 import streamlit as st
-import googleapiclient.discovery
-import pandas as pd
-from datetime import datetime
 
 
 
@@ -10,6 +7,13 @@ import re
 import logging
 import html
 
+from yt_fetcher import get_all_channels_videos, get_all_videos, read_channel_ids
+from yt_history import get_history
+from yt_keys import get_key_pool, split_keys
+from yt_quota import QuotaTracker
+from yt_trace import Tracer, profiled
+from yt_ui import StreamlitListener, dataset_view, load_prewarmed
+
 # Logging: for developer-only diagnostics (Streamlit Cloud logs). Do NOT print API keys.
 logger = logging.getLogger(__name__)
 if not logger.handlers:
@@ -22,6 +26,13 @@ CHANNEL_ID_REGEX = re.compile(r"^UC[0-9A-Za-z\-_]{22}$") # YouTube channel id pa
 # Defensive length caps (absolute upper limit to avoid ultra-long inputs)
 MAX_INPUT_LENGTH = 250
 
+# Most API keys accepted at once (comma-separated in the API Key field)
+MAX_API_KEYS = 20
+
+# Caps for multi-channel loads (number of ids, size of an uploaded id file)
+MAX_CHANNELS = 500
+MAX_CHANNEL_FILE_BYTES = 64 * 1024
+
 # till here (p1)
 
 
@@ -83,188 +94,14 @@ def looks_malicious(s: str) -> bool:
 
 
 
-# ==========================================
-# FUNCTIONS
-# ==========================================
-
-def get_channel_stats(youtube, channel_id):
-    try:
-        response = youtube.channels().list(
-            id=channel_id,
-            part='snippet,statistics,contentDetails'
-        ).execute()
-        
-        if response['items']:
-            item = response['items'][0]
-            return {
-                'title': item['snippet']['title'],
-                'thumbnail': item['snippet']['thumbnails']['high']['url'],
-                'subscribers': item['statistics']['subscriberCount'],
-                'total_views': item['statistics']['viewCount'],
-                'video_count': item['statistics']['videoCount'],
-                'uploads_playlist': item['contentDetails']['relatedPlaylists']['uploads']
-            }
-    # except Exception as e:
-    #     st.error(f"Error fetching channel info: {e}")
-    # return None
-
-    # i added (p4)
-    except Exception:
-     logger.exception("get_channel_stats failed for channel_id=%s", channel_id)
-    st.error("Failed to fetch channel info. Please check the Channel ID and API key.")
-    return None
-# till here(p4)
-
-
-def get_video_details(youtube, video_ids):
-    all_stats = {}
-    
-    # Iterate over video_ids in chunks of 50
-    for i in range(0, len(video_ids), 50):
-        chunk = video_ids[i:i+50]
-        
-        # 1. The TRY block starts here
-        try:
-            response = youtube.videos().list(
-                part="snippet,statistics",
-                id=','.join(chunk)
-            ).execute()
-            
-            for item in response.get('items', []):
-                vid = item['id']
-                snippet = item['snippet']
-                stats = item['statistics']
-                
-                all_stats[vid] = {
-                    'views': int(stats.get('viewCount', 0)),
-                    'likes': int(stats.get('likeCount', 0)),
-                    'comments': int(stats.get('commentCount', 0)),
-                    'thumbnail': snippet['thumbnails']['high']['url'],
-                    'tags': snippet.get('tags', [])
-                }
-
-        # 2. The EXCEPT block must align with the TRY block above
-        except Exception:
-            # 3. The code inside must be indented relative to 'except'
-            logger.exception("get_video_details batch failed (videos chunk size=%d)", len(chunk))
-            st.error("Failed to fetch video statistics. Try again or check API quota.")
-            continue  # This skips to the next batch of 50 videos
-
-    return all_stats
-
-
-# def get_video_details(youtube, video_ids):
-#     all_stats = {}
-#     for i in range(0, len(video_ids), 50):
-#         chunk = video_ids[i:i+50]
-#         try:
-#             response = youtube.videos().list(
-#                 id=",".join(chunk),
-#                 part="statistics,snippet"
-#             ).execute()
-
-#             for item in response['items']:
-#                 vid = item['id']
-#                 stats = item['statistics']
-#                 snippet = item['snippet']
-#                 all_stats[vid] = {
-#                     'views': int(stats.get('viewCount', 0)),
-#                     'likes': int(stats.get('likeCount', 0)),
-#                     'comments': int(stats.get('commentCount', 0)),
-#                     'thumbnail': snippet['thumbnails']['high']['url'],
-#                     'tags': snippet.get('tags', [])
-#                 }
-#     #     except Exception as e:
-#     #         st.error(f"Error fetching video stats batch: {e}")
-#     # return all_stats
-
-#     # i added (p5)
-#         except Exception:
-#          logger.exception("get_video_details batch failed (videos chunk size=%d)", len(chunk))
-#     st.error("Failed to fetch video statistics. Try again or check API quota.")
-#     continue
-# return all_stats
-# till here(p5)
-
-def get_all_videos(api_key, channel_id):
-    youtube = googleapiclient.discovery.build("youtube", "v3", developerKey=api_key)
-
-    channel_info = get_channel_stats(youtube, channel_id)
-    if not channel_info:
-        return None, None
-
-    uploads_playlist_id = channel_info['uploads_playlist']
-    
-    videos_basic = []
-    next_page_token = None
-
-    status_text = st.empty()
-    status_text.text("Fetching video list...")
-
-    while True:
-        playlist_response = youtube.playlistItems().list(
-            playlistId=uploads_playlist_id,
-            part='contentDetails,snippet',
-            maxResults=50,
-            pageToken=next_page_token
-        ).execute()
-
-        for item in playlist_response['items']:
-            video_id = item['contentDetails']['videoId']
-            title = item['snippet']['title']
-
-
-
-            published_at = item['snippet']['publishedAt']
-
-            try:
-                date_obj = datetime.strptime(published_at, "%Y-%m-%dT%H:%M:%SZ")
-                date_str = date_obj.strftime("%Y-%m-%d")
-            except:
-                date_str = published_at
-
-
-
-            videos_basic.append({
-                'video_id': video_id,
-                'title': title,
-                'published_at': date_str,
-                'publish_dt': date_obj
-            })
-
-        next_page_token = playlist_response.get('nextPageToken')
-        if not next_page_token:
-            break
-
-    status_text.text(f"Found {len(videos_basic)} videos. Fetching detailed stats...")
-
-    video_ids_list = [v['video_id'] for v in videos_basic]
-    detailed_stats = get_video_details(youtube, video_ids_list)
-
-    final_data = []
-    for v in videos_basic:
-        vid = v['video_id']
-        stats = detailed_stats.get(vid, {})
-
-        final_data.append({
-            'Thumbnail': stats.get('thumbnail', ''),
-            'Title': v['title'],
-            'Published': v['published_at'],
-            'Views': stats.get('views', 0),
-            'Likes': stats.get('likes', 0),
-            'Comments': stats.get('comments', 0),
-            'Video ID': vid,
-            'publish_dt': v['publish_dt']
-        })
-
-    status_text.empty()
-    return channel_info, pd.DataFrame(final_data)
-
 # ==========================================
 # STREAMLIT UI LAYOUT
 # ==========================================
 st.set_page_config(page_title="YouTube Analytics Dashboard", layout="wide", page_icon="Hz")
 
+# Rows stream in here while a load is running
+progress_area = st.container()
+
 
 
 # with st.sidebar:
@@ -294,37 +131,84 @@ with st.sidebar:
     st.header("⚙️ Settings")
 
     # User must enter API key and Channel ID
-    api_key_input = st.text_input("API Key", value=DEFAULT_API_KEY, type="password")
+    api_key_input = st.text_input("API Key", value=DEFAULT_API_KEY, type="password",
+                                  help="Several keys, comma-separated, share the load and the daily quota.")
     channel_id_input = st.text_input("Channel ID", value=DEFAULT_CHANNEL_ID)
+    use_cache_input = st.checkbox("Use local cache", value=True,
+                                  help="Reuse recently fetched results instead of calling the API again.")
+    incremental_input = st.checkbox("Only fetch new videos", value=False, disabled=not use_cache_input,
+                                    help="Stop at the first already-known video; older stats refresh once a day.")
+
+    extra_ids_input = st.text_area("More Channel IDs (optional)",
+                                   help="One per line or comma-separated. Loads all channels into one table.")
+    channel_file = st.file_uploader("...or upload a file of Channel IDs", type=["txt", "csv"])
 
     if st.button("Load Data", type="primary"):
-        # Normalize
-        api_key = clean_input(api_key_input)
+        quota = QuotaTracker()
+        tracer = Tracer()
+
+        # Normalize (several API keys may be given, comma-separated)
+        api_keys = split_keys(clean_input(api_key_input))
         channel_id = clean_input(channel_id_input)
 
+        # Collect every channel id (single field, text area, uploaded file)
+        file_error = None
+        channel_ids = read_channel_ids([channel_id, clean_input(extra_ids_input)])
+        if channel_file is not None:
+            if channel_file.size > MAX_CHANNEL_FILE_BYTES:
+                file_error = "Channel ID file is too large."
+            else:
+                try:
+                    channel_ids += [cid for cid in read_channel_ids(channel_file) if cid not in channel_ids]
+                except UnicodeDecodeError:
+                    file_error = "Channel ID file must be UTF-8 text."
+
         # Basic presence checks
-        if not api_key or not channel_id:
+        if not api_keys or not channel_ids:
             st.error("Both API Key and Channel ID are required.")
+        elif file_error:
+            st.error(file_error)
+            logger.warning("Rejected channel id file: %s", file_error)
         # Length caps
-        elif len(api_key) > MAX_INPUT_LENGTH or len(channel_id) > MAX_INPUT_LENGTH:
+        elif any(len(key) > MAX_INPUT_LENGTH for key in api_keys) or any(len(cid) > MAX_INPUT_LENGTH for cid in channel_ids):
             st.error("Input is too long. Please enter valid API Key and Channel ID.")
             logger.warning("Rejected excessively long input (possible attack or paste mistake).")
+        elif len(api_keys) > MAX_API_KEYS:
+            st.error(f"Too many API keys. At most {MAX_API_KEYS} can be used at once.")
+            logger.info("Rejected %d API keys.", len(api_keys))
+        elif len(channel_ids) > MAX_CHANNELS:
+            st.error(f"Too many channels. At most {MAX_CHANNELS} can be loaded at once.")
+            logger.info("Rejected bulk load of %d channels.", len(channel_ids))
         # Heuristic malicious tokens (extra precaution)
-        elif looks_malicious(api_key) or looks_malicious(channel_id):
+        elif any(looks_malicious(key) for key in api_keys) or any(looks_malicious(cid) for cid in channel_ids):
             st.error("Input contains disallowed characters or tokens.")
             logger.warning("Rejected input that looks malicious.")
         # Strict allowlist validation
-        elif not is_plausible_api_key(api_key):
+        elif not all(is_plausible_api_key(key) for key in api_keys):
             st.error("API Key format invalid. Ensure you pasted the correct YouTube API key.")
             logger.info("API key format validation failed.")
-        elif not is_plausible_channel_id(channel_id):
+        elif not all(is_plausible_channel_id(cid) for cid in channel_ids):
             st.error("Channel ID format invalid. Channel IDs typically start with 'UC' and are 24 characters long.")
             logger.info("Channel ID format validation failed.")
-        else:
+        elif use_cache_input and (stored := load_prewarmed(channel_ids)) is not None:
+            # Kept fresh by the background refresher (yt_refresh): shown without any API call
+            channels, df, refreshed_at = stored
+            st.session_state['data'] = df
+            st.session_state['channel'] = channels[channel_ids[0]] if len(channel_ids) == 1 else None
+            st.session_state['channels'] = channels
+            st.session_state['quota'] = None
+            st.session_state['phases'] = None
+            st.session_state['refreshed_at'] = refreshed_at
+            st.session_state['keys'] = None
+            st.session_state['derived'] = {}
+        elif len(channel_ids) == 1:
             # All validations passed; proceed
-            with st.spinner("Scraping YouTube..."):
+            with st.spinner("Scraping YouTube..."), profiled():
                 try:
-                    channel_info, df = get_all_videos(api_key, channel_id)
+                    channel_info, df = get_all_videos(api_keys, channel_ids[0], use_cache_input,
+                                                      incremental_input, quota=quota, tracer=tracer,
+                                                      listener=StreamlitListener(progress_area, error_details=False),
+                                                      history=get_history())
                 except Exception as e:
                     # Log full technical detail for developer; do not expose to user
                     logger.exception("Unhandled error in get_all_videos")
@@ -334,63 +218,42 @@ with st.sidebar:
                 if channel_info and not (df is None) and not df.empty:
                     st.session_state['data'] = df
                     st.session_state['channel'] = channel_info
+                    st.session_state['channels'] = {channel_ids[0]: channel_info}
+                    st.session_state['quota'] = quota.summary()
+                    st.session_state['phases'] = tracer.phase_summary()
+                    st.session_state['refreshed_at'] = None
+                    st.session_state['keys'] = get_key_pool(api_keys)
+                    st.session_state['derived'] = {}
                 else:
                     st.error("Could not fetch data. Check your API key and Channel ID.")
+        else:
+            with st.spinner(f"Scraping {len(channel_ids)} channels..."), profiled():
+                try:
+                    channels, df = get_all_channels_videos(api_keys, channel_ids, use_cache_input,
+                                                           incremental_input, quota=quota, tracer=tracer,
+                                                           listener=StreamlitListener(progress_area, error_details=False),
+                                                           history=get_history())
+                except Exception:
+                    logger.exception("Unhandled error in get_all_channels_videos")
+                    st.error("An unexpected error occurred while fetching data. Please try again later.")
+                    channels, df = None, None
+
+                if channels and not (df is None) and not df.empty:
+                    st.session_state['data'] = df
+                    st.session_state['channel'] = None
+                    st.session_state['channels'] = channels
+                    st.session_state['quota'] = quota.summary()
+                    st.session_state['phases'] = tracer.phase_summary()
+                    st.session_state['refreshed_at'] = None
+                    st.session_state['keys'] = get_key_pool(api_keys)
+                    st.session_state['derived'] = {}
+                else:
+                    st.error("Could not fetch data. Check your API key and Channel IDs.")
 
 # till here (p3)
 
 
 if 'data' in st.session_state:
-    df = st.session_state['data']
-    ch = st.session_state['channel']
-
-
-
-    col1, col2 = st.columns([1, 4])
-    with col1:
-        st.image(ch['thumbnail'], width=150)
-
-
-
-    with col2:
-        st.title(ch['title'])
-        st.write(f"**Subscribers:** {int(ch['subscribers']):,} | "
-                 f"**Total Videos:** {ch['video_count']} | "
-                 f"**Total Views:** {int(ch['total_views']):,}")
-
-    st.divider()
-
-    m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Avg Views per Video", f"{int(df['Views'].mean()):,}")
-    m2.metric("Most Viewed Video", f"{int(df['Views'].max()):,}")
-    m3.metric("Avg Likes", f"{int(df['Likes'].mean()):,}")
-    m4.metric("Total Likes", f"{int(df['Likes'].sum()):,}")
-
-    st.divider()
-
-    st.subheader("📺 Video Performance")
-
-    st.dataframe(
-        df,
-        column_config={
-            "Thumbnail": st.column_config.ImageColumn("Thumbnail", width="medium"),
-            "Views": st.column_config.NumberColumn("Views", format="%d 👁️"),
-            "Likes": st.column_config.NumberColumn("Likes", format="%d 👍"),
-            "Comments": st.column_config.NumberColumn("Comments", format="%d 💬"),
-            "publish_dt": None
-        },
-        use_container_width=True,
-        hide_index=True,
-        height=800
-    )
-
-
-
-
-
-
-    csv = df.to_csv(index=False).encode('utf-8')
-    st.download_button("Download Data as CSV", csv, "youtube_stats_dashboard.csv", "text/csv")
-
+    dataset_view(max_chars=MAX_INPUT_LENGTH)
 else:
     st.info("👈 Enter API key & Channel ID in sidebar, then click **Load Data**.")
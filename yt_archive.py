@@ -0,0 +1,310 @@
+"""
+Record/replay archive of raw API responses.
+
+With recording on, every channels, playlistItems and videos response a
+FetchSession receives is kept on disk exactly as it came over the wire.
+Replaying feeds those bodies back through the same client and parsing
+code at disk speed, with no API key and no quota, so a change to how
+the video table is built can be checked or a dataset re-derived offline:
+
+    YT_ARCHIVE_MODE=record streamlit run dashboard.py      # every session records
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.csv --record .yt_archive
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.parquet --replay .yt_archive
+
+    archive = ResponseArchive(".yt_archive", mode='replay')
+    get_all_videos(None, channel_id, archive=archive)
+
+The archive is append-only: bodies go to a pack file, each distinct body
+once (compressed, named by its SHA-256), and a SQLite index lists every
+recorded call with the request it answered and when. Re-recording
+unchanged pages or videos costs an index row, not another copy. Replay
+answers a request with the latest body recorded for it (or the latest
+before `as_of`); requests match on their path and query, without the
+API key. An id lookup (channels or videos by id) that was never made
+in that form is put together from the recorded bodies holding its ids,
+so a channel recorded in a multi-channel run replays on its own too.
+A request that cannot be answered fails with ArchiveMissError.
+Several processes may record into one archive (the refresher and the
+dashboards): each append to the pack and its index rows happen under a
+lock file.
+Replayed sessions do not read or write the response cache or the
+snapshot history.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import httplib2
+
+from yt_lock import file_lock
+
+try:
+    import pyarrow as pa
+except ImportError:  # bodies fall back to zlib
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# 'record' or 'replay' turns the archive on for every FetchSession; empty
+# leaves it off (override with YT_ARCHIVE_MODE)
+ARCHIVE_MODE = os.environ.get("YT_ARCHIVE_MODE", "")
+
+# Directory holding the pack file and its index (override with YT_ARCHIVE_DIR)
+ARCHIVE_DIR = os.environ.get("YT_ARCHIVE_DIR", ".yt_archive")
+
+# API methods whose responses are recorded and replayed
+ARCHIVE_METHODS = ('youtube.channels.list', 'youtube.playlistItems.list', 'youtube.videos.list')
+
+# zstd (through pyarrow) if available, else zlib
+ZSTD_LEVEL = 9
+ZLIB_LEVEL = 6
+
+# Query parameters that do not change the response
+_IGNORED_PARAMS = {'key', 'quotaUser'}
+
+
+class ArchiveMissError(LookupError):
+    """Replay was asked for a request the archive has no response to."""
+
+
+def request_key(uri, method="GET", body=None):
+    """
+    What identifies a request in the archive: its path and sorted query,
+    without the API key, so recordings replay against any endpoint. A long
+    GET the client sent as a POST (query in the body) gets the same key.
+    """
+    parsed = urlparse(uri)
+    query = parsed.query
+    if method == "POST" and body:
+        query = body if isinstance(body, str) else body.decode('utf-8')
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                    if name not in _IGNORED_PARAMS)
+    return f"{parsed.path}?{urlencode(params)}"
+
+
+def _split_ids(request):
+    """(the request without its id parameter, [ids]) for an id lookup, else (request, [])."""
+    path, _, query = request.partition('?')
+    params = parse_qsl(query, keep_blank_values=True)
+    ids = [value for name, value in params if name == 'id']
+    if not ids:
+        return request, []
+    # maxResults does not change an id lookup (at most 50 ids either way)
+    rest = [(name, value) for name, value in params if name not in ('id', 'maxResults')]
+    return f"{path}?{urlencode(rest)}", [item_id for value in ids for item_id in value.split(',') if item_id]
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def _default_codec():
+    if pa is not None and pa.Codec.is_available('zstd'):
+        return 'zstd'
+    return 'zlib'
+
+
+def _compress(data, codec):
+    if codec == 'zstd':
+        return pa.Codec('zstd', ZSTD_LEVEL).compress(data, asbytes=True)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(data, codec, size):
+    if codec == 'zstd':
+        if pa is None:
+            raise ImportError("This archive holds zstd bodies; reading them needs pyarrow (pip install pyarrow)")
+        return pa.Codec('zstd').decompress(data, decompressed_size=size, asbytes=True)
+    return zlib.decompress(data)
+
+
+class ResponseArchive:
+    """
+    Raw response bodies in an append-only pack file, each distinct body
+    stored once, with a SQLite index of every recorded call (by a hash of
+    its request key). `mode` is 'record' or 'replay' and tells a
+    FetchSession how to use it; replay serves the latest body recorded at
+    or before `as_of` (a timestamp; default: the latest). Thread-safe.
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, mode='record', as_of=None, codec=None):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Archive mode is 'record' or 'replay', not '{mode}'")
+        self.directory = directory
+        self.mode = mode
+        self.as_of = as_of
+        self.codec = codec or _default_codec()
+        self._lock = threading.Lock()
+        self._items = {}     # base hash -> {item id: [(recorded_at, digest, item), ...]}, built on first use
+        os.makedirs(directory, exist_ok=True)
+        self._pack_path = os.path.join(directory, "responses.pack")
+        self._pack = open(self._pack_path, "ab")
+        self._reader = open(self._pack_path, "rb")
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bodies ("
+            " digest TEXT PRIMARY KEY,"
+            " offset INTEGER NOT NULL,"
+            " length INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " codec TEXT NOT NULL)"
+        )
+        # `base` (id lookups only) is the hash of the request without its ids
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            " request TEXT NOT NULL,"
+            " base TEXT,"
+            " digest TEXT NOT NULL,"
+            " recorded_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS calls_request ON calls (request, recorded_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS calls_base ON calls (base)")
+        self._conn.commit()
+
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+
+    def record(self, request, content, recorded_at=None):
+        """Add one call: `request` (a request_key) answered with `content` (bytes)."""
+        digest = hashlib.sha256(content).hexdigest()
+        recorded_at = recorded_at or time.time()
+        base, ids = _split_ids(request)
+        with self._lock, file_lock(self._pack_path + ".lock"):
+            known = self._conn.execute("SELECT 1 FROM bodies WHERE digest = ?", (digest,)).fetchone()
+            if known is None:
+                data = _compress(content, self.codec)
+                # Another process may have appended since this one last wrote: the pack's end is the offset
+                offset = os.fstat(self._pack.fileno()).st_size
+                self._pack.write(data)
+                # Body first, index row after: a crash leaves unreferenced bytes, never a dangling row
+                self._pack.flush()
+                self._conn.execute("INSERT OR IGNORE INTO bodies (digest, offset, length, size, codec)"
+                                   " VALUES (?, ?, ?, ?, ?)",
+                                   (digest, offset, len(data), len(content), self.codec))
+            self._conn.execute("INSERT INTO calls (request, base, digest, recorded_at) VALUES (?, ?, ?, ?)",
+                               (_hash(request), _hash(base) if ids else None, digest, recorded_at))
+            self._conn.commit()
+            self._items.pop(_hash(base), None)
+
+    def lookup(self, request, as_of=None):
+        """
+        The latest body recorded for `request` at or before `as_of` (default:
+        self.as_of), or for an id lookup one assembled from the latest bodies
+        holding each id. None if the archive cannot answer it.
+        """
+        as_of = as_of if as_of is not None else self.as_of
+        as_of = as_of if as_of is not None else float('inf')
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM calls WHERE request = ? AND recorded_at <= ? ORDER BY recorded_at DESC LIMIT 1",
+                (_hash(request), as_of),
+            ).fetchone()
+        if row is not None:
+            return self._body(row[0])
+
+        base, ids = _split_ids(request)
+        if not ids:
+            return None
+        recorded = self._item_index(_hash(base))
+        items = []
+        for item_id in dict.fromkeys(ids):
+            versions = [version for version in recorded.get(item_id, ()) if version[0] <= as_of]
+            if versions:
+                items.append(max(versions, key=lambda version: version[0])[2])
+        if not items:
+            return None
+        # Ids no recorded response holds are left out, as the API leaves out unknown ids
+        return json.dumps({'items': items}, separators=(',', ':')).encode('utf-8')
+
+    def _item_index(self, base):
+        """{item id: [(recorded_at, digest, item), ...]} over every body recorded for `base`."""
+        index = self._items.get(base)
+        if index is not None:
+            return index
+        with self._lock:
+            rows = self._conn.execute("SELECT digest, MIN(recorded_at), MAX(recorded_at) FROM calls"
+                                      " WHERE base = ? GROUP BY digest", (base,)).fetchall()
+        index = {}
+        for digest, _, recorded_at in rows:
+            for item in json.loads(self._body(digest)).get('items', []):
+                index.setdefault(item.get('id'), []).append((recorded_at, digest, item))
+        self._items[base] = index
+        return index
+
+    def _body(self, digest):
+        with self._lock:
+            offset, length, size, codec = self._conn.execute(
+                "SELECT offset, length, size, codec FROM bodies WHERE digest = ?", (digest,)).fetchone()
+            self._reader.seek(offset)
+            data = self._reader.read(length)
+        return _decompress(data, codec, size)
+
+    def stats(self):
+        """Calls recorded, distinct bodies, bytes received over all calls and bytes stored."""
+        with self._lock:
+            calls, received = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM calls c JOIN bodies b ON b.digest = c.digest"
+            ).fetchone()
+            bodies, stored = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM bodies").fetchone()
+        return {'calls': calls, 'bodies': bodies, 'bytes_received': received, 'bytes_stored': stored}
+
+    def close(self):
+        with self._lock:
+            self._pack.close()
+            self._reader.close()
+            self._conn.close()
+
+
+class RecordingHttp:
+    """An httplib2.Http stand-in that passes requests on to `http` and records the 200 responses."""
+
+    def __init__(self, http, archive):
+        self.http = http
+        self.archive = archive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        response, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        if response.status == 200:
+            try:
+                self.archive.record(request_key(uri, method, body), content)
+            except Exception:
+                logger.exception("Could not archive the response to %s", urlparse(uri).path)
+        return response, content
+
+
+class ReplayHttp:
+    """An httplib2.Http stand-in that answers every request from `archive`."""
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        key = request_key(uri, method, body)
+        content = self.archive.lookup(key)
+        if content is None:
+            raise ArchiveMissError(f"No archived response for {key}")
+        response = httplib2.Response({'status': '200', 'content-type': 'application/json; charset=UTF-8',
+                                      'content-length': str(len(content))})
+        return response, content
+
+
+@functools.lru_cache(maxsize=1)
+def get_archive():
+    """The process-wide archive ARCHIVE_MODE asks for, or None when it is off."""
+    if not ARCHIVE_MODE:
+        return None
+    logger.info("Response archive in %s mode at %s", ARCHIVE_MODE, ARCHIVE_DIR)
+    return ResponseArchive(ARCHIVE_DIR, ARCHIVE_MODE)
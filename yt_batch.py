@@ -0,0 +1,132 @@
+import contextvars
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import googleapiclient.http
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Upper bound on API requests in flight at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Idle keep-alive HTTP objects kept for reuse (more are built under load)
+HTTP_POOL_SIZE = 2 * MAX_CONCURRENT_REQUESTS
+
+
+class HttpPool:
+    """
+    Keep-alive HTTP objects shared by every thread and run in the process.
+    httplib2.Http is not thread-safe, so a request checks one out for its
+    duration and hands it back; the next request reuses its open connection
+    instead of paying a new TCP/TLS handshake on every fresh worker thread.
+    """
+
+    def __init__(self, size=HTTP_POOL_SIZE, timeout=None):
+        self.size = size
+        self.timeout = timeout   # socket timeout in seconds (None: the client library's default)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            http = self._idle.pop() if self._idle else None
+        if http is None:
+            http = googleapiclient.http.build_http()
+            if self.timeout is not None:
+                http.timeout = self.timeout
+        try:
+            yield http
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(http)   # most recently used first: its socket is warmest
+
+
+@functools.lru_cache(maxsize=1)
+def get_http_pool():
+    """The process-wide HttpPool all API calls go through."""
+    return HttpPool()
+
+
+def run_batches(fetch, batches, max_workers=MAX_CONCURRENT_REQUESTS):
+    """
+    Call fetch(batch) for every batch on a bounded thread pool.
+
+    Returns a list of (batch, result, error) tuples in the same order as
+    `batches`, so callers can merge deterministically. A batch that raises
+    gets error set and result None; the other batches still run. Workers
+    run in a copy of the caller's context (so yt_trace spans nest).
+    """
+    batches = list(batches)
+    if not batches:
+        return []
+
+    def _safe(batch):
+        try:
+            return batch, fetch(batch), None
+        except Exception as e:
+            return batch, None, e
+
+    workers = max(1, min(max_workers, len(batches)))
+    if workers == 1:
+        return [_safe(b) for b in batches]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _safe, b) for b in batches]
+        return [future.result() for future in futures]
+
+
+class BatchPipeline:
+    """
+    Producer/consumer variant of run_batches: batches can be submitted while
+    they are still being produced (e.g. one per playlist page), and finished
+    batches are collected in submission order as (batch, result, error).
+    """
+
+    def __init__(self, fetch, max_workers=MAX_CONCURRENT_REQUESTS):
+        self._fetch = fetch
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._pending = deque()
+
+    def submit(self, batch):
+        future = self._pool.submit(contextvars.copy_context().run, self._fetch, batch)
+        self._pending.append((batch, future))
+
+    def __len__(self):
+        """Batches submitted and not collected yet."""
+        return len(self._pending)
+
+    def oldest(self):
+        """Wait for the batch at the head of the queue and return it."""
+        return self._pop()
+
+    def ready(self):
+        """Yield finished batches from the head of the queue without blocking."""
+        while self._pending and self._pending[0][1].done():
+            yield self._pop()
+
+    def drain(self):
+        """Yield every remaining batch, waiting for each in turn."""
+        while self._pending:
+            yield self._pop()
+
+    def close(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pop(self):
+        batch, future = self._pending.popleft()
+        try:
+            return batch, future.result(), None
+        except Exception as e:
+            return batch, None, e
@@ -0,0 +1,174 @@
+"""
+Offline benchmark of the fetch path against the fake API in yt_fakeapi.py.
+No API key or quota is used.
+
+    python yt_bench.py                              # 100, 10k and 100k videos
+    python yt_bench.py --sizes 1000 --latency 0.05 --error-rate 0.01
+    python yt_bench.py --connect-latency 0.1        # charge a handshake per new connection
+    python yt_bench.py --replay                     # also time a replay of the run from a response archive
+    python yt_bench.py --json bench.json            # save results
+    python yt_bench.py --compare bench.json         # fail on regressions
+
+For each channel size, get_all_videos runs once for timing and once under
+tracemalloc for peak memory (tracemalloc slows the run, so the two are kept
+apart). The fake server runs in a child process so its work is not measured.
+With --replay the run is also recorded into a yt_archive.ResponseArchive
+and replayed from it, which times the client and parsing work alone.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import yt_fetcher
+from yt_archive import ResponseArchive
+from yt_batch import MAX_CONCURRENT_REQUESTS
+from yt_fakeapi import fake_api_process, server_stats
+from yt_keys import KeyPool
+from yt_quota import QuotaTracker
+from yt_retry import get_rate_limiter
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+BENCH_SIZES = (100, 10_000, 100_000)
+
+# A run is a regression if its wall time or peak memory exceeds the baseline by this factor
+REGRESSION_TOLERANCE = 1.25
+
+BENCH_CHANNEL_ID = "UC" + "b" * 22
+
+
+def _use_endpoint(url):
+    yt_fetcher.API_ENDPOINT = url
+    yt_fetcher.get_client.cache_clear()
+    get_rate_limiter.cache_clear()   # no throttling carried over from the previous run
+
+
+def _fetch(workers, tmp, archive=None):
+    quota = QuotaTracker()
+    keys = KeyPool(["fake-key"], path=os.path.join(tmp, "keys.json"))
+    _, df = yt_fetcher.get_all_videos(keys, BENCH_CHANNEL_ID, use_cache=False, quota=quota, max_workers=workers,
+                                      archive=archive)
+    return df
+
+
+def run_size(size, latency=0.0, error_rate=0.0, throttle_rate=0.0, workers=MAX_CONCURRENT_REQUESTS,
+             memory=True, connect_latency=0.0, replay=False):
+    """Benchmark one channel of `size` videos; returns a result dict."""
+    with fake_api_process(videos_per_channel=size, latency=latency, error_rate=error_rate,
+                          throttle_rate=throttle_rate, connect_latency=connect_latency) as url, \
+            tempfile.TemporaryDirectory() as tmp:
+        _use_endpoint(url)
+
+        server_stats(url, reset=True)
+        start = time.perf_counter()
+        df = _fetch(workers, tmp)
+        wall = time.perf_counter() - start
+        stats = server_stats(url)
+
+        peak = None
+        if memory:
+            tracemalloc.start()
+            _fetch(workers, tmp)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        replay_wall = None
+        if replay:
+            directory = os.path.join(tmp, "archive")
+            _fetch(workers, tmp, ResponseArchive(directory, 'record'))
+            start = time.perf_counter()
+            _fetch(workers, tmp, ResponseArchive(directory, 'replay'))
+            replay_wall = time.perf_counter() - start
+
+    rows = 0 if df is None else len(df)
+    with_stats = 0 if df is None else int((df['Views'] > 0).sum())
+    return {
+        'videos': size,
+        'rows': rows,
+        'with_stats': with_stats,
+        'wall_s': round(wall, 3),
+        'requests': stats['requests'],
+        'errors': stats['errors'],
+        'connections': stats['connections'],
+        'mb_received': round(stats['bytes_sent'] / 1e6, 2),
+        'kb_per_request': round(stats['bytes_sent'] / 1e3 / stats['requests'], 2) if stats['requests'] else None,
+        'videos_per_s': round(rows / wall, 1) if wall else None,
+        'peak_mb': round(peak / 1e6, 1) if peak is not None else None,
+        'replay_s': round(replay_wall, 3) if replay_wall is not None else None,
+    }
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return messages for results slower or heavier than the baseline run of the same size."""
+    previous = {r['videos']: r for r in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(result['videos'])
+        if not base:
+            continue
+        for key in ('wall_s', 'peak_mb'):
+            if result.get(key) and base.get(key) and result[key] > base[key] * tolerance:
+                regressions.append(f"{result['videos']} videos: {key} {base[key]} -> {result[key]}")
+    return regressions
+
+
+def _print_table(results):
+    columns = ('videos', 'rows', 'with_stats', 'wall_s', 'requests', 'errors', 'connections', 'mb_received',
+               'kb_per_request', 'videos_per_s', 'peak_mb', 'replay_s')
+    print("  ".join(f"{c:>12}" for c in columns))
+    for result in results:
+        print("  ".join(f"{'-' if result.get(c) is None else result[c]:>12}" for c in columns))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark get_all_videos against a local fake YouTube API.")
+    parser.add_argument("--sizes", default=",".join(map(str, BENCH_SIZES)),
+                        help="Comma-separated channel sizes (default: %(default)s)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every fake API response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls that fail with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of API calls that fail with 403 rateLimitExceeded")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="Seconds the fake API adds once per new connection (TCP/TLS handshake)")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Concurrent API requests (default: {MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--replay", action="store_true",
+                        help="Also record the run and time replaying it from the archive (no network)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Baseline results file; exit 1 on regressions")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Retries and failed batches are expected with --error-rate; keep the table readable
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        results.append(run_size(size, args.latency, args.error_rate, args.throttle_rate, args.workers,
+                                not args.no_memory, args.connect_latency, args.replay))
+    _print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Local cache file (override with YT_CACHE_PATH)
+CACHE_PATH = os.environ.get("YT_CACHE_PATH", ".yt_cache.sqlite3")
+
+# Seconds before an entry is considered stale, per resource type
+CACHE_TTL = {
+    'channel': 24 * 3600,   # channels().list metadata
+    'uploads': 6 * 3600,    # full uploads playlist listing of a channel
+    'video': 6 * 3600,      # videos().list statistics + snippet per video
+    'sync': float('inf'),   # incremental sync bookkeeping per channel (never expires)
+    'refresh': float('inf'),  # background refresh schedule per channel (see yt_refresh)
+}
+
+# Total payload bytes kept on disk before least-recently-used entries are evicted
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# SQLite limits bound parameters per statement; stay well below it
+_SQL_CHUNK = 500
+
+
+class ResponseCache:
+    """
+    Persistent key/value cache for YouTube API lookups, backed by SQLite.
+
+    Entries are keyed by (kind, key), e.g. ('channel', channel_id) or
+    ('video', video_id). Each kind has its own TTL; the file as a whole is
+    kept under `max_bytes` by evicting the least recently used entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=None, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.ttl = dict(CACHE_TTL, **(ttl or {}))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " PRIMARY KEY (kind, key))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, kind, key, max_age=None):
+        """Return the cached value, or None if missing or expired."""
+        return self.get_many(kind, [key], max_age).get(key)
+
+    def get_many(self, kind, keys, max_age=None):
+        """
+        Return {key: value} for the keys that are cached and still fresh.
+        `max_age` (seconds) overrides the TTL of `kind` for this lookup.
+        """
+        now = time.time()
+        if max_age is None:
+            max_age = self.ttl[kind]
+        oldest = now - max_age if max_age != float('inf') else 0.0
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), _SQL_CHUNK):
+                chunk = list(keys[i:i + _SQL_CHUNK])
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM responses"
+                    f" WHERE kind = ? AND stored_at >= ? AND key IN ({marks})",
+                    [kind, oldest, *chunk],
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(value)
+            if found:
+                hit = list(found)
+                for i in range(0, len(hit), _SQL_CHUNK):
+                    chunk = hit[i:i + _SQL_CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    self._conn.execute(
+                        f"UPDATE responses SET accessed_at = ?"
+                        f" WHERE kind = ? AND key IN ({marks})",
+                        [now, kind, *chunk],
+                    )
+                self._conn.commit()
+        return found
+
+    def set(self, kind, key, value):
+        self.set_many(kind, {key: value})
+
+    def set_many(self, kind, items):
+        """Store {key: value} for one resource kind, then enforce the size bound."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            payload = json.dumps(value, separators=(",", ":"))
+            rows.append((kind, key, payload, len(payload), now, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO responses"
+                " (kind, key, value, size, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def clear(self, kind=None):
+        with self._lock:
+            if kind is None:
+                self._conn.execute("DELETE FROM responses")
+            else:
+                self._conn.execute("DELETE FROM responses WHERE kind = ?", (kind,))
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so we don't evict again on the very next write
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for kind, key, size in self._conn.execute(
+            "SELECT kind, key, size FROM responses ORDER BY accessed_at"
+        ):
+            victims.append((kind, key))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE kind = ? AND key = ?", victims)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache instance shared by every fetch."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
@@ -0,0 +1,221 @@
+"""
+Fetch YouTube channel data from the command line, without Streamlit.
+
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.csv
+    python yt_cli.py --channels-file channels.txt -o videos.json --incremental
+    python yt_cli.py --channels-file channels.txt -o videos.parquet
+
+Parquet and Arrow (.arrow / .feather) outputs are written while the fetch
+runs, one row group at a time, instead of after the whole table is built.
+
+--stream never holds the whole table: channels are fetched one after the
+other in chunks that fit in --memory-limit MB, each appended to the output
+(.csv, .jsonl, .parquet or .arrow) as it completes. Use it for channels
+with hundreds of thousands of videos:
+
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.parquet --stream --memory-limit 128
+
+--record keeps the raw API responses in an archive directory; --replay
+runs the same fetch from that archive instead of the API, with no key
+and no quota, e.g. to rebuild a table after changing how it is shaped
+(see yt_archive):
+
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.csv --record archive/
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.csv --replay archive/
+
+The API key is read from --api-key or the YOUTUBE_API_KEY environment variable.
+Several keys, comma-separated, are used as a pool: calls are spread over
+them and a key that runs out of quota is skipped until the reset (see yt_keys).
+
+--trace appends timing spans of the run (phases and API calls) to a file,
+--profile writes a cProfile (.prof) or pyinstrument (.html) profile, and -v
+prints the time spent per phase:
+
+    python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o videos.csv --trace trace.jsonl --profile run.prof -v
+"""
+import argparse
+import logging
+import os
+import sys
+
+from yt_archive import ResponseArchive
+from yt_batch import MAX_CONCURRENT_REQUESTS
+from yt_export import TableSink, format_for_path, text_frame
+from yt_fetcher import STREAM_MEMORY_LIMIT, VideoStream, get_all_channels_videos, get_all_videos, read_channel_ids
+from yt_history import get_history
+from yt_keys import get_key_pool
+from yt_quota import QuotaTracker
+from yt_trace import PROFILE_PATH, TRACE_FORMAT, TRACE_PATH, Tracer, profiled
+
+logger = logging.getLogger("yt_cli")
+
+
+def write_output(df, path):
+    """Write the video table to `path`; the format follows the file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        text_frame(df).to_csv(path, index=False)
+    elif ext == ".json":
+        df.to_json(path, orient="records", date_format="iso", force_ascii=False)
+    elif ext == ".jsonl":
+        df.to_json(path, orient="records", lines=True, date_format="iso", force_ascii=False)
+    elif format_for_path(path) in ('parquet', 'arrow'):
+        with TableSink(path, format_for_path(path)) as sink:
+            sink.write(df)
+    else:
+        raise ValueError(f"Unsupported output format '{ext}' (use .csv, .json, .jsonl, .parquet or .arrow)")
+
+
+def append_output(df, path, first):
+    """Append a chunk of the video table to a .csv or .jsonl file (`first` starts the file)."""
+    if path.lower().endswith(".csv"):
+        text_frame(df).to_csv(path, mode="w" if first else "a", header=first, index=False)
+    else:
+        df.to_json(path, orient="records", lines=True, date_format="iso", force_ascii=False,
+                   mode="w" if first else "a")
+
+
+def stream_output(args, channel_ids, sink, quota, history, tracer, archive):
+    """Fetch the channels one by one in chunks, writing each chunk out as it completes. Returns the rows written."""
+    rows = 0
+    for channel_id in channel_ids:
+        stream = VideoStream(args.api_key, channel_id, not args.no_cache, quota, max_workers=args.workers,
+                             history=history, tracer=tracer, memory_limit=args.memory_limit * 1024 * 1024,
+                             with_channel=len(channel_ids) > 1, archive=archive)
+        for frame in stream:
+            if sink is not None:
+                sink.write(frame)
+            else:
+                append_output(frame, args.output, first=rows == 0)
+            rows += len(frame)
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch video statistics for one or more YouTube channels.")
+    parser.add_argument("channel_ids", nargs="*", help="Channel IDs (UC...)")
+    parser.add_argument("--channels-file", help="File with channel IDs, one per line or comma-separated")
+    parser.add_argument("--api-key", default=os.environ.get("YOUTUBE_API_KEY", ""),
+                        help="YouTube Data API key, or several comma-separated (default: $YOUTUBE_API_KEY)")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.csv, .json, .jsonl, .parquet or .arrow)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the local cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch new videos; older stats refresh on a slower schedule")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Do not append this run's stats to the local snapshot history")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write the table in chunks instead of building it in memory (very large channels)")
+    parser.add_argument("--memory-limit", type=int, default=STREAM_MEMORY_LIMIT // (1024 * 1024),
+                        help="With --stream: MB the rows in flight may use "
+                             f"(default: {STREAM_MEMORY_LIMIT // (1024 * 1024)})")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Concurrent API requests (default: {MAX_CONCURRENT_REQUESTS})")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="DIR", help="Keep the raw API responses in this archive directory")
+    group.add_argument("--replay", metavar="DIR",
+                       help="Answer every API call from this archive directory (no API key or quota needed)")
+    parser.add_argument("--trace", default=TRACE_PATH,
+                        help="Append timing spans of the run to this file (default: $YT_TRACE_PATH)")
+    parser.add_argument("--trace-format", choices=("jsonl", "otlp"), default=TRACE_FORMAT,
+                        help="Flat JSON lines or OpenTelemetry OTLP/JSON (default: jsonl)")
+    parser.add_argument("--profile", default=PROFILE_PATH,
+                        help="Profile the run into this file: .prof (cProfile) or .html (pyinstrument)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress details and time per phase")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(asctime)s %(levelname)s: %(message)s',
+                        level=logging.INFO if args.verbose else logging.WARNING)
+
+    channel_ids = read_channel_ids(args.channel_ids)
+    if args.channels_file:
+        with open(args.channels_file, encoding="utf-8") as f:
+            channel_ids += [cid for cid in read_channel_ids(f) if cid not in channel_ids]
+
+    if not args.api_key and not args.replay:
+        logger.error("No API key given (use --api-key or set YOUTUBE_API_KEY).")
+        return 2
+    if not channel_ids:
+        logger.error("No channel IDs given.")
+        return 2
+    if args.stream and args.incremental:
+        logger.error("--stream always fetches every video; it cannot be combined with --incremental.")
+        return 2
+    if args.stream and os.path.splitext(args.output)[1].lower() not in (".csv", ".jsonl") \
+            and format_for_path(args.output) not in ('parquet', 'arrow'):
+        logger.error("--stream writes .csv, .jsonl, .parquet or .arrow files.")
+        return 2
+
+    # Columnar outputs are streamed to disk as rows complete
+    sink = None
+    fmt = format_for_path(args.output)
+    if fmt in ('parquet', 'arrow'):
+        try:
+            sink = TableSink(args.output, fmt)
+        except ImportError as e:
+            logger.error("%s", e)
+            return 2
+
+    archive = None
+    if args.record or args.replay:
+        archive = ResponseArchive(args.record or args.replay, 'record' if args.record else 'replay')
+
+    quota = QuotaTracker()
+    tracer = Tracer(args.trace, args.trace_format)
+    use_cache = not args.no_cache
+    incremental = args.incremental and use_cache
+    history = None if args.no_history else get_history()
+    df = None
+    try:
+        with profiled(args.profile):
+            if args.stream:
+                rows = stream_output(args, channel_ids, sink, quota, history, tracer, archive)
+            elif len(channel_ids) == 1:
+                _, df = get_all_videos(args.api_key, channel_ids[0], use_cache, incremental,
+                                       quota=quota, max_workers=args.workers, sink=sink,
+                                       history=history, tracer=tracer, archive=archive)
+            else:
+                _, df = get_all_channels_videos(args.api_key, channel_ids, use_cache, incremental,
+                                                quota=quota, max_workers=args.workers, sink=sink,
+                                                history=history, tracer=tracer, archive=archive)
+    except ImportError as e:   # a sampling profile without pyinstrument
+        logger.error("%s", e)
+        return 2
+    finally:
+        if sink is not None:
+            sink.close()
+
+    summary = quota.summary()
+    if not args.stream:
+        rows = 0 if df is None else len(df)
+    if not rows:
+        logger.error("No data fetched (%d quota units used).", summary['units'])
+        return 1
+
+    if sink is None and not args.stream:
+        write_output(df, args.output)
+    keys = None if args.replay else get_key_pool(args.api_key)
+    used = f"; {keys.used_today()} / {keys.total_budget} used today" if keys is not None else ""
+    print(f"Wrote {rows} videos to {args.output} "
+          f"({summary['units']} quota units over {summary['requests']} requests{used})", file=sys.stderr)
+    if args.verbose:
+        for phase in tracer.phase_summary():
+            print(f"  {phase['phase']:<14} {phase['wall_s']:7.2f} s wall  {phase['busy_s']:7.2f} s busy  "
+                  f"{phase['api_calls']:5} calls  {phase['bytes'] / 1e6:7.2f} MB  {phase['retries']} retries",
+                  file=sys.stderr)
+    if archive is not None:
+        stats = archive.stats()
+        print(f"  Archive {archive.directory}: {stats['calls']} responses, {stats['bodies']} distinct, "
+              f"{stats['bytes_received'] / 1e6:.1f} MB received, {stats['bytes_stored'] / 1e6:.1f} MB stored",
+              file=sys.stderr)
+    if keys is not None and len(keys) > 1:
+        for status in keys.status():
+            benched = f", out of quota until {status['benched_until']:%H:%M} UTC" if status['benched_until'] else ""
+            print(f"  {status['key']}: {status['used']} units used today{benched}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+Comment-thread harvester.
+
+Pages commentThreads().list for many videos at once and streams the
+top-level comments into numbered Parquet chunk files in an output
+directory, so memory stays flat however many comments a channel has.
+Calls go through the same FetchSession as the video fetch (client, API keys,
+rate limiters, retries, key ledger).
+
+A checkpoint next to the chunks records every video's next page token
+and the finished videos. It only advances after a chunk file is on
+disk, so an interrupted run resumes where the last chunk ended, without
+duplicates:
+
+    python yt_comments.py UCxxxxxxxxxxxxxxxxxxxxxx -o comments/
+    python yt_comments.py --videos dQw4w9WgXcQ,9bZkp7q19f0 -o comments/
+    python yt_comments.py UCxxxxxxxxxxxxxxxxxxxxxx -o comments/   # after Ctrl-C: resumes
+
+The same checkpoint also lets a run that hit the daily quota carry on
+after the reset.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # the harvester writes Parquet, so it needs pyarrow
+    pa = pc = ds = pq = None
+
+from yt_batch import MAX_CONCURRENT_REQUESTS
+from yt_fetcher import PROGRESS_INTERVAL, FetchSession, get_channel_stats, get_uploads, read_channel_ids
+from yt_keys import QuotaExhaustedError
+from yt_retry import error_reason, is_quota_exceeded
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Comments buffered before a chunk file is written and the checkpoint advances
+CHUNK_ROWS = 50_000
+COMMENTS_COMPRESSION = "zstd"
+
+COMMENT_PAGE_SIZE = 100   # API maximum for commentThreads().list
+
+# Partial-response mask: the columns of COMMENT_SCHEMA and the paging token
+COMMENT_FIELDS = ("nextPageToken,items(id,snippet(videoId,totalReplyCount,topLevelComment/snippet("
+                  "authorDisplayName,authorChannelId/value,textOriginal,likeCount,publishedAt,updatedAt)))")
+
+# Errors that end a video's harvest for good (the video is marked done)
+SKIP_REASONS = {'commentsDisabled', 'videoNotFound', 'forbidden'}
+
+CHECKPOINT_NAME = "_checkpoint.json"
+CHUNK_PATTERN = "comments-{:05d}.parquet"
+
+COMMENT_SCHEMA = pa.schema([
+    ('video_id', pa.string()),
+    ('comment_id', pa.string()),
+    ('author', pa.string()),
+    ('author_channel_id', pa.string()),
+    ('text', pa.string()),
+    ('likes', pa.int64()),
+    ('replies', pa.int32()),
+    ('published_at', pa.timestamp('s', tz='UTC')),
+    ('updated_at', pa.timestamp('s', tz='UTC')),
+]) if pa is not None else None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("The comment harvester needs pyarrow (pip install pyarrow)")
+
+
+class CommentColumns:
+    """Column buffers for one chunk of comments (no dict per comment is kept)."""
+
+    def __init__(self):
+        self.columns = {name: [] for name in COMMENT_SCHEMA.names}
+
+    def __len__(self):
+        return len(self.columns['comment_id'])
+
+    def extend(self, video_id, items):
+        c = self.columns
+        for item in items:
+            thread = item['snippet']
+            comment = thread['topLevelComment']['snippet']
+            c['video_id'].append(video_id)
+            c['comment_id'].append(item['id'])
+            c['author'].append(comment.get('authorDisplayName'))
+            c['author_channel_id'].append(comment.get('authorChannelId', {}).get('value'))
+            c['text'].append(comment.get('textOriginal'))
+            c['likes'].append(comment.get('likeCount', 0))
+            c['replies'].append(thread.get('totalReplyCount', 0))
+            c['published_at'].append(comment.get('publishedAt'))
+            c['updated_at'].append(comment.get('updatedAt'))
+
+    def to_table(self):
+        arrays = []
+        for field in COMMENT_SCHEMA:
+            values = self.columns[field.name]
+            if pa.types.is_timestamp(field.type):
+                # 'YYYY-MM-DDTHH:MM:SSZ' strings, parsed in one vectorized call
+                parsed = pc.strptime(pa.array(values, pa.string()), format="%Y-%m-%dT%H:%M:%SZ",
+                                     unit='s', error_is_null=True)
+                arrays.append(parsed.cast(field.type))
+            else:
+                arrays.append(pa.array(values, field.type))
+        return pa.Table.from_arrays(arrays, schema=COMMENT_SCHEMA)
+
+
+class Checkpoint:
+    """
+    Harvest progress of one output directory: next page token per video,
+    finished videos and the chunk files written. Saved atomically after
+    each chunk. Chunk files it does not list (written just before a crash)
+    are deleted by remove_orphans() when a harvest resumes, since their
+    pages will be fetched again; load() itself only reads.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, CHECKPOINT_NAME)
+        self.tokens = {}
+        self.done = set()
+        self.files = []
+        self.rows = 0
+
+    @classmethod
+    def load(cls, out_dir):
+        checkpoint = cls(out_dir)
+        try:
+            with open(checkpoint.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            state = {}
+        checkpoint.tokens = state.get('tokens', {})
+        checkpoint.done = set(state.get('done', []))
+        checkpoint.files = state.get('files', [])
+        checkpoint.rows = state.get('rows', 0)
+        return checkpoint
+
+    def remove_orphans(self):
+        """Delete chunk files the checkpoint does not list. Only the harvest writing `out_dir` may call this."""
+        listed = set(self.files)
+        for name in os.listdir(self.out_dir):
+            if name.startswith("comments-") and name not in listed:
+                logger.warning("Removing chunk %s written after the last checkpoint", name)
+                os.remove(os.path.join(self.out_dir, name))
+
+    def commit(self, buffer, progress):
+        """
+        Write `buffer` as the next chunk file (if it has rows), then record
+        `progress` ({video_id: next page token, or None when finished}).
+        """
+        if len(buffer):
+            name = CHUNK_PATTERN.format(len(self.files))
+            path = os.path.join(self.out_dir, name)
+            pq.write_table(buffer.to_table(), path + ".tmp", compression=COMMENTS_COMPRESSION)
+            os.replace(path + ".tmp", path)
+            self.files.append(name)
+            self.rows += len(buffer)
+
+        for video_id, token in progress.items():
+            if token is None:
+                self.done.add(video_id)
+                self.tokens.pop(video_id, None)
+            else:
+                self.tokens[video_id] = token
+
+        state = {'tokens': self.tokens, 'done': sorted(self.done), 'files': self.files, 'rows': self.rows}
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def fetch_comment_page(session, video_id, page_token=None):
+    return session.execute(session.youtube.commentThreads().list(
+        videoId=video_id,
+        part='snippet',
+        maxResults=COMMENT_PAGE_SIZE,
+        pageToken=page_token,
+        textFormat='plainText',
+        fields=COMMENT_FIELDS,
+        prettyPrint=False
+    ))
+
+
+def _harvest(session, video_ids, out_dir, chunk_rows=CHUNK_ROWS):
+    """
+    Page the comment threads of `video_ids` into chunk files in `out_dir`.
+    At most session.max_workers pages are in flight and at most one chunk
+    of comments is held in memory. Pages of one video are sequential (each
+    needs the previous token), so concurrency comes from several videos.
+    """
+    listener = session.listener
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = Checkpoint.load(out_dir)
+    checkpoint.remove_orphans()
+
+    todo = deque((vid, checkpoint.tokens.get(vid)) for vid in dict.fromkeys(video_ids)
+                 if vid not in checkpoint.done)
+    total_videos = len(todo)
+    buffer = CommentColumns()
+    progress = {}        # page tokens reached by the comments in `buffer`
+    rows_before = checkpoint.rows
+    finished = skipped = failed = 0
+    last_error = None
+    last_render = 0.0
+
+    # Stop handing out pages once today's remaining quota (over every key) is spent,
+    # or as soon as the API says so
+    remaining_units = session.keys.remaining()
+    out_of_quota = False
+
+    with ThreadPoolExecutor(max_workers=max(1, session.max_workers)) as pool:
+        running = {}
+        while todo or running:
+            while (todo and len(running) < session.max_workers and not out_of_quota
+                   and session.quota.units + len(running) < remaining_units):
+                video_id, token = todo.popleft()
+                running[pool.submit(fetch_comment_page, session, video_id, token)] = video_id, token
+            if not running:
+                break
+
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                video_id, token = running.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    if isinstance(e, QuotaExhaustedError) or is_quota_exceeded(e):
+                        out_of_quota = True
+                        todo.appendleft((video_id, token))
+                    elif error_reason(e) in SKIP_REASONS:
+                        logger.info("No comments for video_id=%s (%s)", video_id, error_reason(e))
+                        progress[video_id] = None
+                        skipped += 1
+                    else:
+                        # Its token stays where it was, so the next run retries it
+                        logger.error("commentThreads().list failed for video_id=%s", video_id, exc_info=e)
+                        failed += 1
+                        last_error = e
+                    continue
+
+                buffer.extend(video_id, response.get('items', []))
+                next_token = response.get('nextPageToken')
+                progress[video_id] = next_token
+                if next_token:
+                    todo.appendleft((video_id, next_token))   # finish started videos first
+                else:
+                    finished += 1
+
+            if len(buffer) >= chunk_rows:
+                checkpoint.commit(buffer, progress)
+                session.commit()
+                buffer, progress = CommentColumns(), {}
+
+            now = time.monotonic()
+            if now - last_render >= PROGRESS_INTERVAL:
+                last_render = now
+                listener.status(f"{finished + skipped}/{total_videos} videos done, "
+                                f"{checkpoint.rows + len(buffer) - rows_before} comments...")
+
+    checkpoint.commit(buffer, progress)
+
+    left = total_videos - finished - skipped
+    if todo and (out_of_quota or session.quota.units + len(running) >= remaining_units):
+        listener.warning(f"Daily API quota used up with {left} video(s) left; run again after the "
+                         f"quota resets to continue.")
+    if failed:
+        listener.error(f"Failed to fetch comments for {failed} video(s); run again to retry them.", last_error)
+
+    return {
+        'videos': total_videos,
+        'finished': finished,
+        'skipped': skipped,
+        'failed': failed,
+        'left': left,
+        'comments': checkpoint.rows - rows_before,
+        'total_comments': checkpoint.rows,
+        'files': len(checkpoint.files),
+    }
+
+
+def harvest_comments(api_key, video_ids, out_dir, quota=None, listener=None,
+                     max_workers=MAX_CONCURRENT_REQUESTS, chunk_rows=CHUNK_ROWS):
+    """
+    Harvest the top-level comments of `video_ids` into `out_dir`, resuming
+    from its checkpoint if there is one. Returns a summary dict.
+    """
+    _require_pyarrow()
+    session = FetchSession(api_key, False, quota, listener, max_workers)
+    try:
+        return _harvest(session, video_ids, out_dir, chunk_rows)
+    finally:
+        session.commit()
+        session.listener.finish()
+
+
+def harvest_channel_comments(api_key, channel_id, out_dir, use_cache=True, quota=None, listener=None,
+                             max_workers=MAX_CONCURRENT_REQUESTS, chunk_rows=CHUNK_ROWS):
+    """
+    harvest_comments for every upload of a channel. Videos whose cached
+    statistics show no comments are skipped without an API call.
+    """
+    _require_pyarrow()
+    session = FetchSession(api_key, use_cache, quota, listener, max_workers)
+    try:
+        channel_info = get_channel_stats(session, channel_id)
+        if not channel_info:
+            return None
+        session.listener.status("Fetching video list...")
+        uploads, _ = get_uploads(session, channel_id, channel_info['uploads_playlist'])
+        video_ids = [row[0] for row in uploads]
+        if session.cache is not None:
+            stats = session.cache.get_many('video', video_ids, max_age=float('inf'))
+            video_ids = [vid for vid in video_ids if stats.get(vid, {}).get('comments', 1) > 0]
+        return _harvest(session, video_ids, out_dir, chunk_rows)
+    finally:
+        session.commit()
+        session.listener.finish()
+
+
+def load_comments(out_dir, columns=None):
+    """
+    DataFrame of the comments harvested into `out_dir` so far (empty if it
+    does not exist). Read-only: safe while a harvest is writing there.
+    """
+    _require_pyarrow()
+    if not os.path.isdir(out_dir):
+        return COMMENT_SCHEMA.empty_table().to_pandas()
+    files = [os.path.join(out_dir, name) for name in Checkpoint.load(out_dir).files]
+    if not files:
+        return COMMENT_SCHEMA.empty_table().to_pandas()
+    return ds.dataset(files, schema=COMMENT_SCHEMA, format='parquet').to_table(columns=columns).to_pandas()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Harvest YouTube comment threads into Parquet chunk files.")
+    parser.add_argument("channel_ids", nargs="*", help="Channel IDs (UC...) whose uploads to harvest")
+    parser.add_argument("--videos", help="Comma-separated video IDs to harvest instead of channels")
+    parser.add_argument("--api-key", default=os.environ.get("YOUTUBE_API_KEY", ""),
+                        help="YouTube Data API key (default: $YOUTUBE_API_KEY)")
+    parser.add_argument("-o", "--output", required=True, help="Output directory (resumed if it has a checkpoint)")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the local cache")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Concurrent API requests (default: {MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                        help=f"Comments per chunk file (default: {CHUNK_ROWS})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log progress details")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(asctime)s %(levelname)s: %(message)s',
+                        level=logging.INFO if args.verbose else logging.WARNING)
+
+    if not args.api_key:
+        logger.error("No API key given (use --api-key or set YOUTUBE_API_KEY).")
+        return 2
+    channel_ids = read_channel_ids(args.channel_ids)
+    if not channel_ids and not args.videos:
+        logger.error("No channel or video IDs given.")
+        return 2
+
+    try:
+        if args.videos:
+            video_ids = list(dict.fromkeys(args.videos.replace(',', ' ').split()))
+            summaries = [harvest_comments(args.api_key, video_ids, args.output,
+                                          max_workers=args.workers, chunk_rows=args.chunk_rows)]
+        else:
+            summaries = [harvest_channel_comments(args.api_key, cid, args.output, not args.no_cache,
+                                                  max_workers=args.workers, chunk_rows=args.chunk_rows)
+                         for cid in channel_ids]
+    except ImportError as e:
+        logger.error("%s", e)
+        return 2
+
+    summaries = [s for s in summaries if s]
+    if not summaries:
+        logger.error("No channel found.")
+        return 1
+    last = summaries[-1]
+    print(f"Harvested {sum(s['comments'] for s in summaries)} comments "
+          f"({last['total_comments']} in {last['files']} files in {args.output}); "
+          f"{sum(s['left'] for s in summaries)} video(s) left", file=sys.stderr)
+    return 0 if not any(s['left'] for s in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
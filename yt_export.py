@@ -0,0 +1,161 @@
+"""
+Export of the video table as CSV, Parquet or Arrow IPC.
+
+TableSink streams DataFrame chunks into a Parquet / Arrow file one row
+group at a time, so the fetch pipeline can write rows as they complete.
+export_bytes builds a download payload and is meant to be called lazily,
+only when a download is actually requested.
+"""
+import io
+import os
+
+from yt_tags import TAGS_COLUMN, join_tags
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow export is optional
+    pa = pq = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+EXPORT_COMPRESSION = "zstd"
+
+# Rows buffered before a Parquet row group / Arrow record batch is written
+ROW_GROUP_ROWS = 50_000
+
+# format -> (mime type, file extension)
+EXPORT_FORMATS = {
+    'csv': ("text/csv", ".csv"),
+    'parquet': ("application/vnd.apache.parquet", ".parquet"),
+    'arrow': ("application/vnd.apache.arrow.file", ".arrow"),
+}
+
+
+def available_formats():
+    """Export formats usable in this environment (Parquet/Arrow need pyarrow)."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt == 'csv' or pa is not None]
+
+
+def format_for_path(path):
+    """Map a file name to an export format by extension ('.feather' counts as Arrow)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".feather":
+        return 'arrow'
+    for fmt, (_, fmt_ext) in EXPORT_FORMATS.items():
+        if ext == fmt_ext:
+            return fmt
+    return None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet/Arrow export needs pyarrow (pip install pyarrow)")
+
+
+def _plain_schema(frame):
+    """Arrow schema of `frame`, with categoricals (and interned tag lists) stored as plain strings."""
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(field.type.value_type)
+        if pa.types.is_list(field.type) and pa.types.is_dictionary(field.type.value_type):
+            # Every chunk has its own tag dictionary, which an Arrow IPC file cannot replace
+            field = field.with_type(pa.list_(pa.string()))
+        if pa.types.is_large_string(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+class TableSink:
+    """
+    Writes DataFrame chunks to a Parquet or Arrow IPC file. Chunks are
+    buffered until `row_group_rows` rows are pending and then written as
+    one row group (Parquet) or record batch (Arrow). The schema is taken
+    from the first chunk. `target` is a path or a binary file object.
+    """
+
+    def __init__(self, target, fmt='parquet', compression=EXPORT_COMPRESSION,
+                 row_group_rows=ROW_GROUP_ROWS):
+        _require_pyarrow()
+        if fmt not in ('parquet', 'arrow'):
+            raise ValueError(f"TableSink writes 'parquet' or 'arrow', not '{fmt}'")
+        self.target = target
+        self.fmt = fmt
+        self.compression = compression
+        self.row_group_rows = row_group_rows
+        self.rows_written = 0
+        self._schema = None
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write(self, frame):
+        if frame is None or frame.empty:
+            return
+        if self._schema is None:
+            self._schema = _plain_schema(frame)
+        self._pending.append(pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False))
+        self._pending_rows += len(frame)
+        while self._pending_rows >= self.row_group_rows:
+            self._write_pending(self.row_group_rows)
+
+    def flush(self):
+        if self._pending_rows:
+            self._write_pending(self._pending_rows)
+
+    def close(self):
+        self.flush()
+        if self._writer is None and self._schema is not None:
+            self._open()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open(self):
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.target, self._schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(self.target, self._schema, options=options)
+
+    def _write_pending(self, rows):
+        table = pa.concat_tables(self._pending)
+        head, rest = table.slice(0, rows), table.slice(rows)
+        self._pending = [rest] if rest.num_rows else []
+        self._pending_rows = rest.num_rows
+
+        if self._writer is None:
+            self._open()
+        if self.fmt == 'parquet':
+            self._writer.write_table(head, row_group_size=rows)
+        else:
+            for batch in head.combine_chunks().to_batches():
+                self._writer.write_batch(batch)
+        self.rows_written += head.num_rows
+
+
+def text_frame(df):
+    """`df` with list columns (tags) joined into strings, for CSV output."""
+    if TAGS_COLUMN not in df:
+        return df
+    return df.assign(**{TAGS_COLUMN: join_tags(df[TAGS_COLUMN])})
+
+
+def export_bytes(df, fmt='csv'):
+    """Serialize the video table for download. Call only when it is requested."""
+    if fmt == 'csv':
+        return text_frame(df).to_csv(index=False).encode('utf-8')
+    buf = io.BytesIO()
+    with TableSink(buf, fmt) as sink:
+        sink.write(df)
+    return buf.getvalue()
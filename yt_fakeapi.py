@@ -0,0 +1,567 @@
+"""
+Local stand-in for the YouTube Data API v3 endpoints the fetcher uses
+(channels, playlistItems, videos, commentThreads), for benchmarks and
+offline runs. With serve_images it also stands in for the thumbnail host:
+thumbnail URLs point back at the server, which answers /vi/<id>/<size>.jpg
+with a synthetic JPEG-sized payload.
+
+Every channel id asked for exists and has `videos_per_channel` synthetic
+videos. Items are generated from their index on each request, so a 100k
+video channel costs no memory. Latency and an error rate can be set to
+mimic a slow or flaky backend; a throttle rate answers that share of
+calls with 403 rateLimitExceeded.
+
+Like googleapis.com, responses honour `fields=` partial-response masks,
+are pretty-printed unless `prettyPrint=false`, and are gzipped when the
+client accepts it. A connect latency charges each new connection once,
+standing in for the TCP/TLS handshake a pooled client avoids.
+
+    python yt_fakeapi.py --videos 5000 --latency 0.05 --port 8765
+    YT_API_ENDPOINT=http://127.0.0.1:8765/ python yt_cli.py UCxxxxxxxxxxxxxxxxxxxxxx -o out.csv
+
+GET /_stats returns request, error, connection and byte counters; GET /_reset clears them.
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+DEFAULT_VIDEOS_PER_CHANNEL = 100
+
+# Newest synthetic upload; older ones are spaced PUBLISH_SPACING apart
+NEWEST_UPLOAD = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+PUBLISH_SPACING = timedelta(hours=7)
+
+# Real descriptions run to a few hundred characters (links, credits, hashtags)
+DESCRIPTION = ("Synthetic video served by yt_fakeapi. " * 6
+               + "\n\nFollow the channel: https://example.com/channel\n#fake #benchmark #youtube")
+
+# Comment threads per video are views // VIEWS_PER_COMMENT_THREAD; every
+# COMMENTS_DISABLED_EVERY-th video has comments turned off (403 commentsDisabled)
+VIEWS_PER_COMMENT_THREAD = 2700
+COMMENTS_DISABLED_EVERY = 50
+
+THUMBNAIL_SIZES = {
+    'default': (120, 90),
+    'medium': (320, 180),
+    'high': (480, 360),
+    'standard': (640, 480),
+    'maxres': (1280, 720),
+}
+CHANNEL_THUMBNAIL_SIZES = {
+    'default': (88, 88),
+    'medium': (240, 240),
+    'high': (800, 800),
+}
+IMAGE_HOST = "https://i.ytimg.com/"
+
+# Served thumbnails are about as large as real JPEGs (roughly 2 bits per pixel)
+IMAGE_BYTES_PER_PIXEL = 0.25
+
+# A valid 1x1 JPEG; served images are this padded with comment segments, so
+# image libraries can still open them
+_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDABALDA4MChAODQ4SERATGCgaGBYWGDEjJR0oOjM9PDkzODdASFxOQERXRTc4UG1R"
+    "V19iZ2hnPk1xeXBkeFxlZ2P/2wBDARESEhgVGC8aGi9jQjhCY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2Nj"
+    "Y2NjY2NjY2NjY2NjY2P/wAARCAABAAEDASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAA"
+    "AgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6"
+    "Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXG"
+    "x8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEBAQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREA"
+    "AgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYkNOEl8RcYGRomJygpKjU2Nzg5"
+    "OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0tba3uLm6wsPE"
+    "xcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwDHooorhPqD/9k="
+)
+
+
+def _video_id(channel_num, index):
+    # 11 characters like real ids: 3 hex digits of channel, 8 of index
+    return f"{channel_num:03x}{index:08x}"
+
+
+def _parse_fields(mask, pos=0):
+    """
+    Parse a partial-response mask such as 'nextPageToken,items(id,snippet/title)'
+    into a tree {name: subtree or None}. Returns (tree, position after it).
+    """
+    tree = {}
+    while pos < len(mask) and mask[pos] != ')':
+        path = re.match(r'[^,()]+', mask[pos:]).group(0)
+        pos += len(path)
+        sub = None
+        if pos < len(mask) and mask[pos] == '(':
+            sub, pos = _parse_fields(mask, pos + 1)
+            pos += 1   # ')'
+        node = tree
+        names = path.strip().split('/')
+        for name in names[:-1]:
+            node = node.setdefault(name, {})
+        node[names[-1]] = sub
+        if pos < len(mask) and mask[pos] == ',':
+            pos += 1
+    return tree, pos
+
+
+def _apply_fields(value, tree):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_apply_fields(v, tree) for v in value]
+    if isinstance(value, dict):
+        return {k: _apply_fields(value[k], sub) for k, sub in tree.items() if k in value}
+    return value
+
+
+def _parse_video_id(video_id):
+    try:
+        return int(video_id[:3], 16), int(video_id[3:], 16)
+    except ValueError:
+        return None, None
+
+
+def _views(channel_num, index):
+    return 1 + (index * 7919 + channel_num * 104729) % 5_000_000
+
+
+class ApiError(Exception):
+    """Raised by an endpoint to answer with an API error (status, reason)."""
+
+    def __init__(self, status, reason):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+def _thumbnails(image_id, host=IMAGE_HOST, sizes=THUMBNAIL_SIZES):
+    return {name: {'url': f"{host}vi/{image_id}/{name}.jpg", 'width': w, 'height': h}
+            for name, (w, h) in sizes.items()}
+
+
+def _image(path):
+    """Payload for /vi/<id>/<size>.jpg: a 1x1 JPEG padded to the variant's usual file size."""
+    match = re.fullmatch(r'/vi/([^/]+)/(\w+)\.jpg', path)
+    sizes = CHANNEL_THUMBNAIL_SIZES if match and match.group(1).startswith('ch') else THUMBNAIL_SIZES
+    if not match or match.group(2) not in sizes:
+        raise ApiError(404, 'notFound')
+    width, height = sizes[match.group(2)]
+    padding = max(0, int(width * height * IMAGE_BYTES_PER_PIXEL) - len(_JPEG))
+    filler = hashlib.sha256(path.encode('utf-8')).digest()
+    filler = (filler * (padding // len(filler) + 1))[:padding]
+    comments = []
+    for start in range(0, padding, 65000):   # a COM segment holds at most 65533 bytes
+        chunk = filler[start:start + 65000]
+        comments.append(b'\xff\xfe' + (len(chunk) + 2).to_bytes(2, 'big') + chunk)
+    return _JPEG[:2] + b''.join(comments) + _JPEG[2:]
+
+
+class FakeYouTubeAPI:
+    """Synthetic data and request counters shared by the handler threads."""
+
+    def __init__(self, videos_per_channel=DEFAULT_VIDEOS_PER_CHANNEL, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, seed=0, connect_latency=0.0, serve_images=False, key_quota=None):
+        self.videos_per_channel = videos_per_channel
+        self.key_quota = key_quota      # API calls per key before it answers quotaExceeded
+        self.serve_images = serve_images
+        self.image_host = IMAGE_HOST    # the server's own URL when serve_images is set
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self._channels = {}   # channel id suffix (without 'UC'/'UU') -> channel number
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.errors = 0
+            self.connections = 0
+            self.bytes_sent = 0
+            self.key_calls = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'by_endpoint': dict(self.requests),
+                'errors': self.errors,
+                'connections': self.connections,
+                'bytes_sent': self.bytes_sent,
+                'keys': len(self.key_calls),
+            }
+
+    def _channel_num(self, suffix):
+        with self._lock:
+            return self._channels.setdefault(suffix, len(self._channels))
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def record(self, endpoint, failed, size):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.errors += failed
+            self.bytes_sent += size
+
+    def pick_failure(self, key=''):
+        """None, or the (status, reason) this call should fail with."""
+        if self.key_quota is not None:
+            with self._lock:
+                calls = self.key_calls[key] = self.key_calls.get(key, 0) + 1
+            if calls > self.key_quota:
+                return 403, 'quotaExceeded'
+        if not (self.error_rate or self.throttle_rate):
+            return None
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return 503, 'backendError'
+        if roll < self.error_rate + self.throttle_rate:
+            return 403, 'rateLimitExceeded'
+        return None
+
+    # --- endpoints -----------------------------------------------------------
+
+    def channels(self, params):
+        items = []
+        for channel_id in params.get('id', '').split(','):
+            if not channel_id:
+                continue
+            suffix = channel_id[2:]
+            num = self._channel_num(suffix)
+            items.append({
+                'kind': 'youtube#channel',
+                'id': channel_id,
+                'snippet': {
+                    'title': f"Fake channel {num}",
+                    'description': "Synthetic channel served by yt_fakeapi.",
+                    'thumbnails': _thumbnails(f"ch{num:09d}", self.image_host, CHANNEL_THUMBNAIL_SIZES),
+                },
+                'statistics': {
+                    'viewCount': str(self.videos_per_channel * 1000),
+                    'subscriberCount': str(1000 + num),
+                    'videoCount': str(self.videos_per_channel),
+                },
+                'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + suffix}},
+            })
+        return {'kind': 'youtube#channelListResponse', 'items': items,
+                'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}}
+
+    def playlistItems(self, params):
+        num = self._channel_num(params.get('playlistId', '')[2:])
+        total = self.videos_per_channel
+        start = int(params.get('pageToken') or 0)
+        end = min(total, start + min(int(params.get('maxResults', 5)), 50))
+
+        items = []
+        for position in range(start, end):
+            index = total - 1 - position   # newest first
+            video_id = _video_id(num, index)
+            published = (NEWEST_UPLOAD - position * PUBLISH_SPACING).strftime("%Y-%m-%dT%H:%M:%SZ")
+            items.append({
+                'kind': 'youtube#playlistItem',
+                'etag': f"etag-{num}-{index}",
+                'id': f"PLI{num:03x}{index:08x}",
+                'snippet': {
+                    'publishedAt': published,
+                    'channelId': 'UC' + params.get('playlistId', '')[2:],
+                    'title': f"Video {index} of channel {num}",
+                    'description': DESCRIPTION,
+                    'thumbnails': _thumbnails(video_id, self.image_host),
+                    'channelTitle': f"Fake channel {num}",
+                    'playlistId': params.get('playlistId', ''),
+                    'position': position,
+                    'resourceId': {'kind': 'youtube#video', 'videoId': video_id},
+                },
+                'contentDetails': {'videoId': video_id, 'videoPublishedAt': published},
+            })
+        response = {'kind': 'youtube#playlistItemListResponse', 'items': items,
+                    'pageInfo': {'totalResults': total, 'resultsPerPage': 50}}
+        if end < total:
+            response['nextPageToken'] = str(end)
+        return response
+
+    def videos(self, params):
+        items = []
+        for video_id in params.get('id', '').split(',')[:50]:
+            num, index = _parse_video_id(video_id)
+            if index is None or index >= self.videos_per_channel:
+                continue   # unknown ids are left out, like the real API
+            views = _views(num, index)
+            title = f"Video {index} of channel {num}"
+            items.append({
+                'kind': 'youtube#video',
+                'etag': f"etag-{num}-{index}",
+                'id': video_id,
+                'snippet': {
+                    'publishedAt': NEWEST_UPLOAD.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    'channelId': f"UCfake{num:018d}",
+                    'title': title,
+                    'description': DESCRIPTION,
+                    'thumbnails': _thumbnails(video_id, self.image_host),
+                    'channelTitle': f"Fake channel {num}",
+                    'tags': [f"tag{index % 50}", f"topic{index % 7}", f"channel{num}"],
+                    'categoryId': "22",
+                    'liveBroadcastContent': "none",
+                    'localized': {'title': title, 'description': DESCRIPTION},
+                },
+                'statistics': {
+                    'viewCount': str(views),
+                    'likeCount': str(views // 40),
+                    'commentCount': str(views // 900),
+                },
+            })
+        return {'kind': 'youtube#videoListResponse', 'items': items,
+                'pageInfo': {'totalResults': len(items), 'resultsPerPage': len(items)}}
+
+
+    def commentThreads(self, params):
+        num, index = _parse_video_id(params.get('videoId', ''))
+        if index is None or index >= self.videos_per_channel:
+            raise ApiError(404, 'videoNotFound')
+        if index % COMMENTS_DISABLED_EVERY == COMMENTS_DISABLED_EVERY - 1:
+            raise ApiError(403, 'commentsDisabled')
+
+        video_id = params['videoId']
+        total = _views(num, index) // VIEWS_PER_COMMENT_THREAD
+        start = int(params.get('pageToken') or 0)
+        end = min(total, start + min(int(params.get('maxResults', 20)), 100))
+        items = []
+        for n in range(start, end):
+            comment_id = f"Ug{video_id}{n:06x}"
+            published = (NEWEST_UPLOAD + timedelta(minutes=n)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            text = f"Comment {n} on video {index}. " * (1 + n % 4)
+            items.append({
+                'kind': 'youtube#commentThread',
+                'etag': f"etag-{comment_id}",
+                'id': comment_id,
+                'snippet': {
+                    'channelId': f"UCfake{num:018d}",
+                    'videoId': video_id,
+                    'topLevelComment': {
+                        'kind': 'youtube#comment',
+                        'etag': f"etag-{comment_id}-c",
+                        'id': comment_id,
+                        'snippet': {
+                            'channelId': f"UCfake{num:018d}",
+                            'videoId': video_id,
+                            'textDisplay': text,
+                            'textOriginal': text,
+                            'authorDisplayName': f"@viewer{n % 997}",
+                            'authorProfileImageUrl': f"https://yt3.ggpht.com/viewer{n % 997}",
+                            'authorChannelUrl': f"http://www.youtube.com/@viewer{n % 997}",
+                            'authorChannelId': {'value': f"UCviewer{n % 997:016d}"},
+                            'canRate': True,
+                            'viewerRating': 'none',
+                            'likeCount': n % 13,
+                            'publishedAt': published,
+                            'updatedAt': published,
+                        },
+                    },
+                    'canReply': True,
+                    'totalReplyCount': n % 5,
+                    'isPublic': True,
+                },
+            })
+        response = {'kind': 'youtube#commentThreadListResponse', 'items': items,
+                    'pageInfo': {'totalResults': len(items), 'resultsPerPage': 100}}
+        if end < total:
+            response['nextPageToken'] = str(end)
+        return response
+
+
+_ENDPOINTS = ('channels', 'playlistItems', 'videos', 'commentThreads')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like googleapis.com
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def setup(self):
+        super().setup()
+        self.server.api.connected()
+        if self.server.api.connect_latency:
+            time.sleep(self.server.api.connect_latency)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        api = self.server.api
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if endpoint == '_stats':
+            return self._send(200, api.stats())
+        if endpoint == '_reset':
+            api.reset()
+            return self._send(200, {})
+        if url.path.startswith('/vi/'):
+            return self._send_image(url.path)
+        if endpoint not in _ENDPOINTS:
+            return self._send(404, {'error': {'code': 404, 'message': "Not found"}})
+
+        if api.latency:
+            time.sleep(api.latency)
+        failure = api.pick_failure(params.get('key', ''))
+        if failure:
+            status, reason = failure
+            size = self._send(status, {'error': {'code': status, 'message': f"Fake {reason}",
+                                                 'errors': [{'reason': reason}]}}, params)
+            api.record(endpoint, 1, size)
+            return
+        try:
+            body = getattr(api, endpoint)(params)
+        except ApiError as e:
+            size = self._send(e.status, {'error': {'code': e.status, 'message': f"Fake {e.reason}",
+                                                   'errors': [{'reason': e.reason}]}}, params)
+            api.record(endpoint, 1, size)
+            return
+        if params.get('fields'):
+            body = _apply_fields(body, _parse_fields(params['fields'])[0])
+        size = self._send(200, body, params)
+        api.record(endpoint, 0, size)
+
+    def _send_image(self, path):
+        api = self.server.api
+        if api.latency:
+            time.sleep(api.latency)
+        try:
+            data = _image(path)
+        except ApiError as e:
+            api.record('images', 1, self._send(e.status, {'error': {'code': e.status, 'message': e.reason}}))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        api.record('images', 0, len(data))
+
+    def _send(self, status, body, params=None):
+        pretty = (params or {}).get('prettyPrint', 'true').lower() != 'false'
+        data = json.dumps(body, indent=2 if pretty else None,
+                          separators=None if pretty else (',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        if params is not None and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            data = gzip.compress(data, compresslevel=6)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        return len(data)
+
+
+class FakeYouTubeServer(ThreadingHTTPServer):
+    """HTTP server for a FakeYouTubeAPI. Use as a context manager to run it in a thread."""
+
+    daemon_threads = True
+
+    def __init__(self, api=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), _Handler)
+        self.api = api or FakeYouTubeAPI()
+        if self.api.serve_images:
+            self.api.image_host = self.url
+
+    def handle_error(self, request, client_address):
+        # A client that goes away mid-response (killed benchmark, Ctrl-C) is not a server error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+
+def _serve(conn, config):
+    with FakeYouTubeServer(FakeYouTubeAPI(**config)) as server:
+        conn.send(server.url)
+        conn.recv()   # blocks until the parent says stop (or goes away)
+
+
+@contextmanager
+def fake_api_process(**config):
+    """
+    Run a fake server in a child process and yield its URL. Keeps the
+    server's CPU time and memory out of measurements taken in this process.
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, config), daemon=True)
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        try:
+            parent.send(None)
+        except OSError:
+            pass
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+
+def server_stats(url, reset=False):
+    """Counters of a running fake server (optionally clearing them)."""
+    with urllib.request.urlopen(url + ("_reset" if reset else "_stats")) as response:
+        return json.load(response)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake YouTube Data API for offline runs.")
+    parser.add_argument("--videos", type=int, default=DEFAULT_VIDEOS_PER_CHANNEL, help="Videos per channel")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of API calls answered with 503")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="Fraction of API calls answered with 403 rateLimitExceeded")
+    parser.add_argument("--connect-latency", type=float, default=0.0,
+                        help="Seconds added once per new connection (handshake cost)")
+    parser.add_argument("--serve-images", action="store_true",
+                        help="Point thumbnail URLs at this server and serve synthetic images")
+    parser.add_argument("--key-quota", type=int, default=None,
+                        help="API calls each key may make before it is answered with 403 quotaExceeded")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the error pattern")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    api = FakeYouTubeAPI(args.videos, args.latency, args.error_rate, args.throttle_rate, args.seed,
+                         args.connect_latency, args.serve_images, args.key_quota)
+    server = FakeYouTubeServer(api, args.host, args.port)
+    print(f"Fake YouTube API on {server.url} (set YT_API_ENDPOINT to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1047 @@
+"""
+UI-free fetch core shared by the Streamlit dashboards and yt_cli.py.
+
+Nothing in this module imports Streamlit. Progress and problems are
+reported through a FetchListener; the dashboards subclass it to drive
+st.* widgets, and the default one just logs.
+"""
+import functools
+import logging
+import os
+import re
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from urllib.parse import quote
+
+import googleapiclient.discovery
+import googleapiclient.discovery_cache
+import numpy as np
+import pandas as pd
+
+from yt_archive import ARCHIVE_METHODS, RecordingHttp, ReplayHttp, get_archive
+from yt_batch import MAX_CONCURRENT_REQUESTS, BatchPipeline, get_http_pool, run_batches
+from yt_cache import get_cache
+from yt_history import snapshot_frame
+from yt_keys import KeyPool, get_key_pool
+from yt_quota import QuotaTracker, estimate_cost, max_videos_within, method_cost, plan_run
+from yt_retry import (MAX_RETRIES, backoff_delay, describe_error, get_rate_limiter, is_client_error, is_quota_exceeded,
+                      is_retryable, is_throttled, redact_key)
+from yt_sync import PLAYLIST_FIELDS, mark_synced, sync_uploads
+from yt_tags import TAGS_COLUMN, tags_array
+from yt_thumbs import CHANNEL_THUMBNAIL, VIDEO_THUMBNAIL, thumbnail_url
+from yt_trace import Tracer
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Optional path to a saved YouTube v3 discovery document. By default the copy
+# bundled with google-api-python-client is used, so building a client never
+# touches the network.
+DISCOVERY_PATH = os.environ.get("YT_DISCOVERY_PATH", "")
+
+# Optional base URL that replaces https://youtube.googleapis.com/, e.g. the
+# local fake server in yt_fakeapi.py for benchmarks and offline runs.
+API_ENDPOINT = os.environ.get("YT_API_ENDPOINT", "")
+
+# Key a replaying session builds its requests with (see yt_archive)
+REPLAY_KEY = "replay"
+
+# Seconds between progress updates while a channel is loading
+PROGRESS_INTERVAL = 1.0
+
+# Memory a streaming fetch (VideoStream, yt_spill) may spend on rows in
+# flight; it sets the chunk size (override in MB with YT_STREAM_MEMORY_MB)
+STREAM_MEMORY_LIMIT = int(os.environ.get("YT_STREAM_MEMORY_MB", "256")) * 1024 * 1024
+
+# Bytes one buffered row costs while streaming: its column buffers, the
+# DataFrame chunk built from them and the Arrow copy a sink makes of that
+STREAM_ROW_BYTES = 2048
+STREAM_MIN_CHUNK_ROWS = 1000
+
+# Partial-response masks: only the fields parse_channel_item and parse_video_item
+# read (PLAYLIST_FIELDS lives in yt_sync). Quota cost is the same; responses shrink.
+# Only the thumbnail variant that fits where it is shown is requested (see yt_thumbs).
+CHANNEL_FIELDS = (f"items(id,snippet(title,thumbnails/{CHANNEL_THUMBNAIL}/url),"
+                  "statistics(viewCount,subscriberCount,videoCount),contentDetails/relatedPlaylists/uploads)")
+VIDEO_FIELDS = (f"items(id,statistics(viewCount,likeCount,commentCount),"
+                f"snippet(thumbnails/{VIDEO_THUMBNAIL}/url,tags))")
+
+
+# ==========================================
+# CLIENT
+# ==========================================
+
+@functools.lru_cache(maxsize=1)
+def _discovery_document():
+    if DISCOVERY_PATH:
+        with open(DISCOVERY_PATH, encoding="utf-8") as f:
+            return f.read()
+    return googleapiclient.discovery_cache.get_static_doc("youtube", "v3")
+
+
+@functools.lru_cache(maxsize=32)
+def get_client(api_key):
+    """
+    Return the YouTube client for `api_key`, built once per process from the
+    local discovery document. The client is shared across threads; requests
+    are always executed on a pooled HTTP object (see FetchSession.execute).
+    """
+    client_options = {'api_endpoint': API_ENDPOINT} if API_ENDPOINT else None
+    return googleapiclient.discovery.build_from_document(_discovery_document(), developerKey=api_key,
+                                                         client_options=client_options)
+
+
+class FetchListener:
+    """
+    Receives progress and problems from a fetch, always on the calling thread.
+    The default implementation only logs.
+    """
+
+    def status(self, text):
+        logger.info(text)
+
+    def rows(self, frame):
+        """
+        DataFrame of the rows completed since the previous call, while a
+        channel is loading (playlist order; the first call starts at row 0).
+        """
+
+    def warning(self, message):
+        logger.warning(message)
+
+    def error(self, message, exc=None):
+        logger.error(message)
+
+    def finish(self):
+        """Called once the fetch is over, successful or not."""
+
+
+def _with_key(uri, api_key):
+    """`uri` with its key= parameter replaced by `api_key`."""
+    return re.sub(r'([?&]key=)[^&]*', lambda m: m.group(1) + quote(api_key, safe=''), uri, count=1)
+
+
+class FetchSession:
+    """
+    Everything one run shares: the client, the API keys, the cache, the
+    snapshot history, quota accounting, the concurrency cap, the rate
+    limiters, the listener and the tracer. Every API call goes through
+    `execute`. `api_key` is one key, several (comma-separated or a list)
+    or a yt_keys.KeyPool.
+
+    `archive` (a yt_archive.ResponseArchive; default: the one YT_ARCHIVE_MODE
+    turns on) records the raw responses, or in replay mode answers every
+    call from disk. A replaying session needs no key, spends no quota and
+    leaves the cache and the snapshot history alone.
+    """
+
+    def __init__(self, api_key, use_cache=True, quota=None, listener=None,
+                 max_workers=MAX_CONCURRENT_REQUESTS, max_retries=MAX_RETRIES, history=None, tracer=None,
+                 archive=None):
+        self.archive = archive or get_archive()
+        self.replaying = self.archive is not None and self.archive.replaying
+        if self.replaying:
+            # One unmetered stand-in key: replayed calls never reach the API
+            self.keys = KeyPool([REPLAY_KEY], budget=float('inf'), path=None)
+            use_cache, history = False, None
+        else:
+            self.keys = get_key_pool(api_key)
+        self.youtube = get_client(self.keys.keys[0])
+        self.cache = get_cache() if use_cache else None
+        self.history = history
+        self.quota = quota or QuotaTracker()
+        self.listener = listener or FetchListener()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.tracer = tracer or Tracer()
+
+    def execute(self, request):
+        """
+        Run `request` on a pooled keep-alive HTTP object with the key the
+        pool picks, paced by that key's rate limiter. A key that runs out
+        of quota is benched and the call moves to the next key. Transient
+        failures are retried with exponential backoff and jitter; every
+        attempt is counted against the quota. The call is traced as one
+        'api' span (response bytes, items, retries).
+        """
+        sizes = []
+        request.add_response_callback(lambda resp: sizes.append(int(resp.get('content-length', 0))))
+        with self.tracer.span(request.methodId, kind='api') as span:
+            try:
+                response = self._execute(request, span)
+            finally:
+                span.add(api_calls=1, bytes=sum(sizes))
+            span.add(items=len(response.get('items', ())))
+            return response
+
+    def _execute(self, request, span):
+        if self.replaying:
+            return request.execute(http=ReplayHttp(self.archive))
+        attempt = 0
+        while True:
+            key = self.keys.acquire(method_cost(request.methodId))
+            request.uri = _with_key(request.uri, key)
+            limiter = get_rate_limiter(key)
+            limiter.acquire()
+            try:
+                with get_http_pool().connection() as http:
+                    if self.archive is not None and request.methodId in ARCHIVE_METHODS:
+                        http = RecordingHttp(http, self.archive)
+                    response = request.execute(http=http)
+            except Exception as e:
+                # The URI carries key=; scrub it before the error reaches any log or message
+                redact_key(e)
+                if is_quota_exceeded(e) and self.keys.exhausted(key):
+                    continue
+                if is_throttled(e):
+                    limiter.throttled()
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt, e)
+                logger.warning("%s failed (%s); retry %d/%d in %.1fs", request.methodId, describe_error(e),
+                               attempt + 1, self.max_retries, delay)
+                time.sleep(delay)
+                attempt += 1
+                span.add(retries=1)
+                continue
+            finally:
+                self.quota.record(request.methodId)
+            limiter.succeeded()
+            return response
+
+    def commit(self):
+        """Save the quota spent so far (per-key usage in the key ledger)."""
+        if self.replaying:
+            return
+        self.keys.commit()
+
+
+# ==========================================
+# FUNCTIONS
+# ==========================================
+
+def parse_channel_item(item):
+    return {
+        'title': item['snippet']['title'],
+        'thumbnail': thumbnail_url(item['snippet']['thumbnails'], CHANNEL_THUMBNAIL),
+        'subscribers': item['statistics']['subscriberCount'],
+        'total_views': item['statistics']['viewCount'],
+        'video_count': item['statistics']['videoCount'],
+        'uploads_playlist': item['contentDetails']['relatedPlaylists']['uploads']
+    }
+
+
+def get_channel_stats(session, channel_id):
+    cache = session.cache
+    if cache is not None:
+        cached = cache.get('channel', channel_id)
+        if cached:
+            return cached
+
+    try:
+        response = session.execute(session.youtube.channels().list(
+            id=channel_id,
+            part='snippet,statistics,contentDetails',
+            fields=CHANNEL_FIELDS,
+            prettyPrint=False
+        ))
+    except Exception as e:
+        logger.exception("get_channel_stats failed for channel_id=%s", channel_id)
+        session.listener.error("Failed to fetch channel info. Please check the Channel ID and API key.", e)
+        return None
+
+    if not response.get('items'):
+        logger.info("No channel found for channel_id=%s", channel_id)
+        return None
+
+    channel_info = parse_channel_item(response['items'][0])
+    if cache is not None:
+        cache.set('channel', channel_id, channel_info)
+    return channel_info
+
+
+def get_channels_stats(session, channel_ids):
+    """Channel metadata for many channels, 50 ids per channels().list call."""
+    cache = session.cache
+    channels = {}
+    if cache is not None:
+        channels.update(cache.get_many('channel', channel_ids))
+    missing = [cid for cid in channel_ids if cid not in channels]
+
+    def fetch_chunk(chunk):
+        return session.execute(session.youtube.channels().list(
+            id=",".join(chunk),
+            part='snippet,statistics,contentDetails',
+            maxResults=50,
+            fields=CHANNEL_FIELDS,
+            prettyPrint=False
+        ))
+
+    chunks = [missing[i:i+50] for i in range(0, len(missing), 50)]
+
+    fetched = {}
+    last_error = None
+    for chunk, response, error in run_batches(fetch_chunk, chunks, session.max_workers):
+        if error is not None:
+            logger.error("get_channels_stats batch failed (channels chunk size=%d)", len(chunk),
+                         exc_info=error)
+            last_error = error
+            continue
+
+        for item in response.get('items', []):
+            fetched[item['id']] = parse_channel_item(item)
+
+    if cache is not None:
+        cache.set_many('channel', fetched)
+    channels.update(fetched)
+
+    if last_error is not None:
+        session.listener.error("Failed to fetch info for some channels. Please check the Channel IDs and API key.",
+                               last_error)
+
+    # Keep the caller's order; unknown ids are dropped
+    return {cid: channels[cid] for cid in channel_ids if cid in channels}
+
+
+def fetch_video_chunk(session, chunk):
+    """
+    videos().list for up to 50 ids. If the API rejects the request itself
+    (a 4xx other than quota or auth), the chunk is bisected so one bad id
+    does not cost the others. Ids that still fail on their own are listed
+    under 'failed_ids' of the merged response, with the last 'error'.
+    """
+    try:
+        return session.execute(session.youtube.videos().list(
+            id=",".join(chunk),
+            part="statistics,snippet",
+            fields=VIDEO_FIELDS,
+            prettyPrint=False
+        ))
+    except Exception as e:
+        if len(chunk) == 1 or not is_client_error(e):
+            raise
+        logger.warning("videos().list rejected a batch of %d ids (%s); splitting it", len(chunk),
+                       describe_error(e))
+
+    mid = len(chunk) // 2
+    merged = {'items': [], 'failed_ids': []}
+    for half in (chunk[:mid], chunk[mid:]):
+        try:
+            response = fetch_video_chunk(session, half)
+        except Exception as e:
+            logger.error("videos().list failed for ids %s", ",".join(half), exc_info=e)
+            merged['failed_ids'].extend(half)
+            merged['error'] = e
+            continue
+        merged['items'].extend(response.get('items', []))
+        if response.get('failed_ids'):
+            merged['failed_ids'].extend(response['failed_ids'])
+            merged['error'] = response['error']
+    return merged
+
+
+def parse_video_item(item):
+    stats = item['statistics']
+    snippet = item['snippet']
+    return {
+        'views': int(stats.get('viewCount', 0)),
+        'likes': int(stats.get('likeCount', 0)),
+        'comments': int(stats.get('commentCount', 0)),
+        'thumbnail': thumbnail_url(snippet['thumbnails'], VIDEO_THUMBNAIL),
+        'tags': snippet.get('tags', [])
+    }
+
+
+def _merge_video_results(results):
+    """
+    Parse (chunk, response, error) tuples of videos().list batches.
+    Returns (details by video id, number of ids that failed, last error).
+    """
+    fetched = {}
+    failed = 0
+    last_error = None
+    for chunk, response, error in results:
+        if error is not None:
+            logger.error("get_video_details batch failed (videos chunk size=%d)", len(chunk),
+                         exc_info=error)
+            failed += len(chunk)
+            last_error = error
+            continue
+
+        for item in response.get('items', []):
+            fetched[item['id']] = parse_video_item(item)
+        if response.get('failed_ids'):
+            failed += len(response['failed_ids'])
+            last_error = response['error']
+    return fetched, failed, last_error
+
+
+def _report_failed_videos(session, failed, last_error):
+    if failed:
+        session.listener.error(f"Failed to fetch video statistics for {failed} video(s); they show zero "
+                               f"views and likes. Try again or check API quota.", last_error)
+
+
+def get_video_details(session, video_ids):
+    cache = session.cache
+    all_stats = {}
+
+    # Serve fresh cached videos locally; only the rest go to the API
+    if cache is not None:
+        all_stats.update(cache.get_many('video', video_ids))
+        video_ids = [vid for vid in video_ids if vid not in all_stats]
+
+    all_stats.update(fetch_video_details(session, video_ids))
+    return all_stats
+
+
+def fetch_video_details(session, video_ids):
+    """Details of `video_ids` straight from the API (and into the cache)."""
+    fetched, _ = _fetch_video_details(session, video_ids)
+    return fetched
+
+
+def _fetch_video_details(session, video_ids):
+    """fetch_video_details, also returning how many ids failed."""
+    cache = session.cache
+
+    # Split video_ids into chunks of 50 and fetch them in parallel
+    chunks = [video_ids[i:i+50] for i in range(0, len(video_ids), 50)]
+    results = run_batches(lambda c: fetch_video_chunk(session, c), chunks, session.max_workers)
+
+    # Merge in chunk order; ids that failed even after retries are logged and skipped
+    fetched, failed, last_error = _merge_video_results(results)
+
+    if cache is not None:
+        cache.set_many('video', fetched)
+
+    _report_failed_videos(session, failed, last_error)
+    return fetched, failed
+
+
+def _record_snapshot(session, channel_id, stats, taken_at=None):
+    """Append the stats fetched from the API in this run to the snapshot history."""
+    if session.history is None or not stats:
+        return
+    try:
+        session.history.append(channel_id, snapshot_frame(stats, taken_at))
+    except Exception:
+        logger.exception("Could not record a snapshot for channel_id=%s", channel_id)
+
+
+def get_uploads(session, channel_id, uploads_playlist_id, incremental=False,
+                max_videos=None, on_page=None):
+    """
+    Return (uploads, ids_to_fetch): the raw [video_id, title, publishedAt] rows
+    of the uploads playlist, and in incremental mode the ids whose details must
+    be re-fetched (None means all of them). `max_videos` keeps only the newest
+    videos and stops paging once that many are listed. `on_page(rows)` is called
+    with each page as it arrives from the API (not for cached listings).
+    """
+    cache = session.cache
+    if cache is not None and incremental:
+        return sync_uploads(session, channel_id, uploads_playlist_id)
+
+    uploads = cache.get('uploads', channel_id) if cache is not None else None
+    if uploads is not None:
+        return uploads[:max_videos], None
+
+    uploads = []
+    trimmed = False
+    for page in iter_playlist_pages(session, uploads_playlist_id):
+        if max_videos is not None:
+            page = page[:max_videos - len(uploads)]
+        uploads.extend(page)
+        if on_page is not None:
+            on_page(page)
+
+        if max_videos is not None and len(uploads) >= max_videos:
+            trimmed = True
+            break
+
+    # A trimmed listing is incomplete, so it must not be cached as the full one
+    if cache is not None and not trimmed:
+        cache.set('uploads', channel_id, uploads)
+    return uploads, None
+
+
+def iter_playlist_pages(session, playlist_id):
+    """Yield a playlist one page (up to 50 [video_id, title, publishedAt] rows) at a time, straight from the API."""
+    next_page_token = None
+    while True:
+        playlist_response = session.execute(session.youtube.playlistItems().list(
+            playlistId=playlist_id,
+            part='contentDetails,snippet',
+            maxResults=50,
+            pageToken=next_page_token,
+            fields=PLAYLIST_FIELDS,
+            prettyPrint=False
+        ))
+
+        yield [
+            [item['contentDetails']['videoId'], item['snippet']['title'], item['snippet']['publishedAt']]
+            for item in playlist_response['items']
+        ]
+
+        next_page_token = playlist_response.get('nextPageToken')
+        if not next_page_token:
+            return
+
+
+_NO_STATS = {}
+
+
+class VideoTable:
+    """
+    Column buffers for the video table. Rows go straight into per-column
+    lists and typed arrays (no dict per video), and to_frame() builds the
+    DataFrame with fixed dtypes and a single vectorized date parse. Tags are
+    interned and kept as per-row offsets into an array of tag ids (see yt_tags).
+    """
+
+    def __init__(self, with_channel=False):
+        self.thumbnails = []
+        self.titles = []
+        self.published = []
+        self.video_ids = []
+        self.views = array('q')
+        self.likes = array('q')
+        self.comments = array('q')
+        self.tag_ids = {}                 # tag -> interned id, in first-seen order
+        self._tag_names = []              # tags by id, caught up with tag_ids in to_frame()
+        self.tag_offsets = array('q', [0])
+        self.tag_codes = array('i')
+        self.channels = [] if with_channel else None
+        self.channel_ids = [] if with_channel else None
+
+    def __len__(self):
+        return len(self.video_ids)
+
+    def extend(self, uploads, detailed_stats, channel=None, channel_id=None):
+        """Append [video_id, title, publishedAt] rows with their details."""
+        for video_id, title, published_at in uploads:
+            stats = detailed_stats.get(video_id) or _NO_STATS
+            self.thumbnails.append(stats.get('thumbnail', ''))
+            self.titles.append(title)
+            self.published.append(published_at)
+            self.video_ids.append(video_id)
+            self.views.append(stats.get('views', 0))
+            self.likes.append(stats.get('likes', 0))
+            self.comments.append(stats.get('comments', 0))
+            tags = stats.get('tags')
+            if tags:
+                tag_ids = self.tag_ids
+                self.tag_codes.extend([tag_ids.setdefault(tag, len(tag_ids)) for tag in tags])
+            self.tag_offsets.append(len(self.tag_codes))
+        if self.channels is not None:
+            self.channels.extend([channel] * len(uploads))
+            self.channel_ids.extend([channel_id] * len(uploads))
+
+    def to_frame(self, start=0):
+        """DataFrame of the rows from `start` on (all rows by default)."""
+        def rows(column):
+            return column[start:] if start else column
+
+        columns = {}
+        if self.channels is not None:
+            columns['Channel'] = pd.Categorical(rows(self.channels))
+        columns['Thumbnail'] = rows(self.thumbnails)
+        columns['Title'] = rows(self.titles)
+        # publishedAt is 'YYYY-MM-DDTHH:MM:SSZ' (UTC). Parsing without the literal
+        # 'Z' keeps pandas on its fast path, roughly 10x quicker on large channels.
+        columns['Published'] = pd.to_datetime([p[:19] for p in rows(self.published)],
+                                              format="%Y-%m-%dT%H:%M:%S", errors='coerce')
+        columns['Views'] = np.array(rows(self.views), dtype=np.int64)
+        columns['Likes'] = np.array(rows(self.likes), dtype=np.int64)
+        columns['Comments'] = np.array(rows(self.comments), dtype=np.uint32)
+        columns['Video ID'] = rows(self.video_ids)
+        if self.channel_ids is not None:
+            columns['Channel ID'] = pd.Categorical(rows(self.channel_ids))
+        columns[TAGS_COLUMN] = tags_array(self.tag_offsets[start:], self.tag_codes, self.tag_names())
+        return pd.DataFrame(columns, copy=False)
+
+    def tag_names(self):
+        """Interned tags by id. Only tags interned since the last call are copied out of tag_ids."""
+        new = len(self.tag_ids) - len(self._tag_names)
+        if new:
+            self._tag_names.extend(reversed(list(islice(reversed(self.tag_ids), new))))
+        return self._tag_names
+
+
+def get_all_videos(api_key, channel_id, use_cache=True, incremental=False, quota=None, listener=None,
+                   max_workers=MAX_CONCURRENT_REQUESTS, sink=None, history=None, tracer=None, archive=None):
+    """
+    Fetch one channel's info and video table. If `sink` is given (anything
+    with a write(frame) method, e.g. yt_export.TableSink), rows are also
+    written to it in playlist order as soon as their details are in. If
+    `history` (a yt_history.SnapshotStore) is given, the stats fetched from
+    the API are appended to it as a snapshot. Timing spans go to `tracer`
+    (a yt_trace.Tracer) and, if configured, to the trace file. Responses are
+    recorded to or replayed from `archive` (see FetchSession).
+    """
+    session = FetchSession(api_key, use_cache, quota, listener, max_workers, history=history, tracer=tracer,
+                           archive=archive)
+    try:
+        with session.tracer.span('get_all_videos', kind='run', channel_id=channel_id, incremental=incremental):
+            return _fetch_channel(session, channel_id, incremental, sink)
+    finally:
+        session.commit()
+        session.tracer.export()
+        session.listener.finish()
+
+
+def _fetch_channel(session, channel_id, incremental, sink=None):
+    cache = session.cache
+    listener = session.listener
+    tracer = session.tracer
+    run_span = tracer.current()
+
+    with tracer.span('channel'):
+        channel_info = get_channel_stats(session, channel_id)
+    if not channel_info:
+        return None, None
+
+    uploads_playlist_id = channel_info['uploads_playlist']
+
+    # Incremental runs only page until known videos, so they are not planned
+    max_videos = None
+    if not incremental:
+        playlist_cached = cache is not None and cache.get('uploads', channel_id) is not None
+        plan = plan_run(estimate_cost(channel_info['video_count'], playlist_cached),
+                        remaining=session.keys.remaining())
+        if plan['action'] == 'refuse':
+            listener.error(f"Not enough API quota left today: this load needs about {plan['estimate']} units, "
+                           f"{plan['remaining']} remain.")
+            return None, None
+        if plan['action'] == 'trim':
+            max_videos = max_videos_within(plan['remaining'], playlist_cached)
+            listener.warning(f"Not enough API quota left today for all videos; loading the newest {max_videos}.")
+
+    listener.status("Fetching video list...")
+
+    listed = []           # uploads rows seen so far, newest first
+    detailed_stats = {}
+    fresh_stats = {}      # details that came from the API in this run
+    resolved = set()      # ids whose details are in (or whose batch failed)
+    table = VideoTable()
+    last_render = 0.0
+    rendered = 0          # rows already handed to listener.rows
+    failed = 0
+    last_error = None
+
+    def queue_details(video_ids):
+        if cache is not None:
+            cached = cache.get_many('video', video_ids)
+            detailed_stats.update(cached)
+            resolved.update(cached)
+            video_ids = [vid for vid in video_ids if vid not in cached]
+        for i in range(0, len(video_ids), 50):
+            pipeline.submit(video_ids[i:i+50])
+
+    def collect(results):
+        nonlocal failed, last_error
+        results = list(results)
+        fetched, batch_failed, batch_error = _merge_video_results(results)
+        if batch_failed:
+            failed += batch_failed
+            last_error = batch_error
+        for chunk, _, _ in results:
+            resolved.update(chunk)
+        if cache is not None:
+            cache.set_many('video', fetched)
+        detailed_stats.update(fetched)
+        fresh_stats.update(fetched)
+
+        # Rows are emitted in playlist order as soon as their details are in
+        done = len(table)
+        while done < len(listed) and listed[done][0] in resolved:
+            done += 1
+        start = len(table)
+        table.extend(listed[start:done], detailed_stats)
+        if sink is not None and done > start:
+            sink.write(table.to_frame(start))
+
+    def render(force=False):
+        nonlocal last_render, rendered
+        now = time.monotonic()
+        if not force and now - last_render < PROGRESS_INTERVAL:
+            return
+        last_render = now
+        listener.status(f"Found {len(listed)} videos, {len(table)} with stats...")
+        # Only the new rows: rebuilding the whole frame every interval is quadratic on large channels
+        if len(table) > rendered:
+            listener.rows(table.to_frame(rendered))
+            rendered = len(table)
+
+    def on_page(page):
+        # Producer: each playlist page goes straight to the videos().list queue
+        listed.extend(page)
+        queue_details([row[0] for row in page])
+        collect(pipeline.ready())
+        render()
+
+    def fetch_details(chunk):
+        # Batches are queued from inside the playlist phase but belong to their own
+        with tracer.span('video_details', parent=run_span, videos=len(chunk)):
+            return fetch_video_chunk(session, chunk)
+
+    with BatchPipeline(fetch_details, session.max_workers) as pipeline:
+        try:
+            with tracer.span('playlist') as span:
+                uploads, ids_to_fetch = get_uploads(session, channel_id, uploads_playlist_id, incremental,
+                                                    max_videos, on_page)
+                span.set(videos=len(uploads))
+        except Exception as e:
+            # Keep the pages listed before the failure instead of losing the whole load
+            logger.exception("get_uploads failed for channel_id=%s", channel_id)
+            listener.error(f"Failed to fetch the full video list; showing the {len(listed)} videos "
+                           f"listed before the error.", e)
+            uploads, ids_to_fetch = list(listed), None
+
+        if not listed:
+            # Listing came from the cache or an incremental sync: queue it all now
+            listed.extend(uploads)
+            if ids_to_fetch is None:
+                queue_details([row[0] for row in uploads])
+            else:
+                # Incremental: known videos keep their last stats until the next refresh,
+                # unless the cache no longer has them (failed batch, evicted)
+                fetch_set = set(ids_to_fetch)
+                known_ids = [row[0] for row in uploads if row[0] not in fetch_set]
+                known = cache.get_many('video', known_ids, max_age=float('inf'))
+                detailed_stats.update(known)
+                resolved.update(known)
+                queue_details(ids_to_fetch + [vid for vid in known_ids if vid not in known])
+
+        render(force=True)
+        for result in pipeline.drain():
+            collect([result])
+            render()
+        collect([])
+
+    if ids_to_fetch is not None:
+        mark_synced(cache, channel_id, uploads, len(ids_to_fetch) == len(uploads) and not failed)
+
+    _report_failed_videos(session, failed, last_error)
+    with tracer.span('snapshot', videos=len(fresh_stats)):
+        _record_snapshot(session, channel_id, fresh_stats)
+    with tracer.span('build_frame', videos=len(table)):
+        return channel_info, table.to_frame()
+
+
+def stream_chunk_rows(memory_limit=STREAM_MEMORY_LIMIT):
+    """Rows per chunk that keep a streaming fetch within `memory_limit` bytes."""
+    return max(STREAM_MIN_CHUNK_ROWS, memory_limit // (2 * STREAM_ROW_BYTES))
+
+
+class VideoStream:
+    """
+    One channel's video table as DataFrame chunks, in playlist order, for
+    channels too large to hold in memory at once:
+
+        stream = VideoStream(api_key, channel_id)
+        for frame in stream:          # chunks of stream.chunk_rows rows (the last one shorter)
+            sink.write(frame)
+        stream.channel                # channel info, once iteration has started
+
+    Only the current chunk and the listed rows still waiting on their
+    videos().list batch are held; paging pauses while 2 * max_workers
+    batches are in flight. Half of `memory_limit` goes to the chunk being
+    filled, half to the one the consumer is writing (the tracer's spans and
+    the process itself come on top). The full listing is not
+    cached, runs are never incremental, and each chunk's fresh stats go to
+    `history` as it is emitted. The session is committed when iteration ends.
+    """
+
+    def __init__(self, api_key, channel_id, use_cache=True, quota=None, listener=None,
+                 max_workers=MAX_CONCURRENT_REQUESTS, history=None, tracer=None,
+                 memory_limit=STREAM_MEMORY_LIMIT, with_channel=False, archive=None):
+        self.session = FetchSession(api_key, use_cache, quota, listener, max_workers, history=history, tracer=tracer,
+                                    archive=archive)
+        self.channel_id = channel_id
+        self.chunk_rows = stream_chunk_rows(memory_limit)
+        self.max_pending = 2 * max(1, max_workers)
+        self.with_channel = with_channel
+        self.channel = None
+        self.rows = 0
+
+    def __iter__(self):
+        session = self.session
+        try:
+            # No run span: a span opened here would stay current in the consumer's context between chunks
+            with session.tracer.span('channel', channel_id=self.channel_id):
+                self.channel = get_channel_stats(session, self.channel_id)
+            if not self.channel:
+                return
+
+            # The stream always pages the playlist from the API, cached listing or not
+            plan = plan_run(estimate_cost(self.channel['video_count']), remaining=session.keys.remaining())
+            max_videos = None
+            if plan['action'] == 'refuse':
+                session.listener.error(f"Not enough API quota left today: this load needs about "
+                                       f"{plan['estimate']} units, {plan['remaining']} remain.")
+                return
+            if plan['action'] == 'trim':
+                max_videos = max_videos_within(plan['remaining'])
+                session.listener.warning(f"Not enough API quota left today for all videos; "
+                                         f"loading the newest {max_videos}.")
+            yield from self._chunks(max_videos)
+        finally:
+            session.commit()
+            session.tracer.export()
+            session.listener.finish()
+
+    def _chunks(self, max_videos):
+        session = self.session
+        cache = session.cache
+        listener = session.listener
+        tracer = session.tracer
+        channel_id = self.channel_id
+        title = self.channel['title'] if self.with_channel else None
+        taken_at = datetime.now(timezone.utc)
+
+        waiting = deque()     # listed rows not in the table yet, in playlist order
+        details = {}          # video id -> details, for rows in `waiting`
+        fresh_stats = {}      # details that came from the API and are not in a snapshot yet
+        resolved = set()      # ids in `waiting` whose details are in (or whose batch failed)
+        table = VideoTable(self.with_channel)
+        listed = 0
+        last_status = 0.0
+        failed = 0
+        last_error = None
+
+        def queue_details(video_ids):
+            if cache is not None:
+                cached = cache.get_many('video', video_ids)
+                details.update(cached)
+                resolved.update(cached)
+                video_ids = [vid for vid in video_ids if vid not in cached]
+            for i in range(0, len(video_ids), 50):
+                pipeline.submit(video_ids[i:i+50])
+
+        def collect(results):
+            nonlocal failed, last_error
+            results = list(results)
+            fetched, batch_failed, batch_error = _merge_video_results(results)
+            if batch_failed:
+                failed += batch_failed
+                last_error = batch_error
+            for chunk, _, _ in results:
+                resolved.update(chunk)
+            if cache is not None:
+                cache.set_many('video', fetched)
+            details.update(fetched)
+            fresh_stats.update(fetched)
+
+        def fill():
+            # Move resolved rows from the head of `waiting` into the table; True once it holds a full chunk
+            rows = []
+            room = self.chunk_rows - len(table)
+            while waiting and len(rows) < room and waiting[0][0] in resolved:
+                rows.append(waiting.popleft())
+            table.extend(rows, details, title, channel_id)
+            for video_id, _, _ in rows:
+                details.pop(video_id, None)
+                resolved.discard(video_id)
+            return len(table) >= self.chunk_rows
+
+        def take():
+            nonlocal table
+            with tracer.span('build_frame', videos=len(table)):
+                frame = table.to_frame()
+            stats = {vid: fresh_stats.pop(vid) for vid in table.video_ids if vid in fresh_stats}
+            with tracer.span('snapshot', videos=len(stats)):
+                _record_snapshot(session, channel_id, stats, taken_at)
+            table = VideoTable(self.with_channel)
+            self.rows += len(frame)
+            return frame
+
+        def fetch_details(chunk):
+            with tracer.span('video_details', videos=len(chunk)):
+                return fetch_video_chunk(session, chunk)
+
+        listener.status("Fetching video list...")
+        pages = iter_playlist_pages(session, self.channel['uploads_playlist'])
+        with BatchPipeline(fetch_details, session.max_workers) as pipeline:
+            try:
+                while max_videos is None or listed < max_videos:
+                    with tracer.span('playlist'):
+                        page = next(pages, None)
+                    if page is None:
+                        break
+                    if max_videos is not None:
+                        page = page[:max_videos - listed]
+                    listed += len(page)
+                    waiting.extend(page)
+                    queue_details([row[0] for row in page])
+
+                    # Backpressure: stop paging until the oldest batches are in
+                    while len(pipeline) > self.max_pending:
+                        collect([pipeline.oldest()])
+                    collect(pipeline.ready())
+                    while fill():
+                        yield take()
+
+                    if time.monotonic() - last_status >= PROGRESS_INTERVAL:
+                        last_status = time.monotonic()
+                        listener.status(f"Found {listed} videos, {self.rows + len(table)} with stats...")
+            except Exception as e:
+                logger.exception("Listing uploads failed for channel_id=%s", channel_id)
+                listener.error(f"Failed to fetch the full video list; keeping the {listed} videos "
+                               f"listed before the error.", e)
+
+            for result in pipeline.drain():
+                collect([result])
+                while fill():
+                    yield take()
+        fill()
+        if len(table):
+            yield take()
+        _report_failed_videos(session, failed, last_error)
+
+
+def read_channel_ids(source):
+    """
+    Parse channel ids from text, a list of strings or an open/uploaded file.
+    Ids may be separated by newlines, commas or spaces; anything after '#'
+    on a line is ignored. Duplicates are dropped, order is kept.
+    """
+    if hasattr(source, 'read'):
+        source = source.read()
+    if isinstance(source, bytes):
+        source = source.decode('utf-8')
+    if isinstance(source, str):
+        source = source.splitlines()
+
+    channel_ids = []
+    for line in source:
+        line = line.split('#', 1)[0]
+        for cid in line.replace(',', ' ').split():
+            if cid not in channel_ids:
+                channel_ids.append(cid)
+    return channel_ids
+
+
+def get_all_channels_videos(api_key, channel_ids, use_cache=True, incremental=False, quota=None,
+                            listener=None, max_workers=MAX_CONCURRENT_REQUESTS, sink=None, history=None,
+                            tracer=None, archive=None):
+    """
+    Bulk variant of get_all_videos for many channels. Channel metadata is
+    resolved 50 ids at a time, uploads playlists are walked in parallel and
+    the video details of every channel share one batched videos().list pass.
+    Returns ({channel_id: channel_info}, DataFrame with a 'Channel' column).
+    If the quota budget does not cover every channel, trailing channels are
+    dropped (or the run is refused, depending on QUOTA_OVERRUN_POLICY).
+    Rows are written to `sink`, if given, one channel at a time, and fresh
+    stats to `history` as one snapshot per channel. Timing spans and the
+    response `archive` work as in get_all_videos.
+    """
+    session = FetchSession(api_key, use_cache, quota, listener, max_workers, history=history, tracer=tracer,
+                           archive=archive)
+    try:
+        with session.tracer.span('get_all_channels_videos', kind='run', channels=len(channel_ids),
+                                 incremental=incremental):
+            return _fetch_channels(session, channel_ids, incremental, sink)
+    finally:
+        session.commit()
+        session.tracer.export()
+        session.listener.finish()
+
+
+def _fetch_channels(session, channel_ids, incremental, sink=None):
+    cache = session.cache
+    listener = session.listener
+
+    tracer = session.tracer
+
+    listener.status(f"Fetching info for {len(channel_ids)} channels...")
+
+    with tracer.span('channel', channels=len(channel_ids)):
+        channels = get_channels_stats(session, channel_ids)
+    if not channels:
+        return None, None
+
+    if not incremental:
+        costs = {cid: estimate_cost(info['video_count']) for cid, info in channels.items()}
+        plan = plan_run(sum(costs.values()), remaining=session.keys.remaining())
+        if plan['action'] == 'refuse':
+            listener.error(f"Not enough API quota left today: this load needs about {plan['estimate']} units, "
+                           f"{plan['remaining']} remain.")
+            return None, None
+        if plan['action'] == 'trim':
+            kept, spent = {}, 0
+            for cid, info in channels.items():
+                if spent + costs[cid] > plan['remaining']:
+                    break
+                kept[cid] = info
+                spent += costs[cid]
+            listener.warning(f"Not enough API quota left today for all channels; loading the first {len(kept)}.")
+            channels = kept
+            if not channels:
+                return None, None
+
+    listener.status(f"Fetching video lists of {len(channels)} channels...")
+
+    def fetch_uploads(channel_id):
+        return get_uploads(session, channel_id, channels[channel_id]['uploads_playlist'], incremental)
+
+    uploads_by_channel = {}
+    ids_to_fetch = []
+    known_ids = []
+    failed = 0
+    last_error = None
+    with tracer.span('playlist', channels=len(channels)) as span:
+        listings = run_batches(fetch_uploads, list(channels), session.max_workers)
+        span.set(videos=sum(len(result[0]) for _, result, error in listings if error is None))
+    for channel_id, result, error in listings:
+        if error is not None:
+            logger.error("get_uploads failed for channel_id=%s", channel_id, exc_info=error)
+            failed += 1
+            last_error = error
+            continue
+        uploads, channel_ids_to_fetch = result
+        uploads_by_channel[channel_id] = (uploads, channel_ids_to_fetch)
+        if channel_ids_to_fetch is None:
+            ids_to_fetch.extend(row[0] for row in uploads)
+        else:
+            fetch_set = set(channel_ids_to_fetch)
+            ids_to_fetch.extend(channel_ids_to_fetch)
+            known_ids.extend(row[0] for row in uploads if row[0] not in fetch_set)
+
+    if failed:
+        listener.error(f"Failed to fetch the video list of {failed} channel(s). They are left out.", last_error)
+
+    listener.status(f"Found {len(ids_to_fetch) + len(known_ids)} videos. Fetching detailed stats...")
+
+    # Known videos keep their last stats; those the cache no longer has are fetched again
+    detailed_stats = cache.get_many('video', known_ids, max_age=float('inf')) if known_ids else {}
+    missing = [vid for vid in known_ids if vid not in detailed_stats]
+    if cache is not None:
+        detailed_stats.update(cache.get_many('video', ids_to_fetch))
+    missing += [vid for vid in ids_to_fetch if vid not in detailed_stats]
+    with tracer.span('video_details', videos=len(missing)):
+        fresh_stats, failed_videos = _fetch_video_details(session, missing)
+    detailed_stats.update(fresh_stats)
+
+    taken_at = datetime.now(timezone.utc)
+    with tracer.span('snapshot', videos=len(fresh_stats)):
+        for channel_id, (uploads, channel_ids_to_fetch) in uploads_by_channel.items():
+            if channel_ids_to_fetch is not None:
+                mark_synced(cache, channel_id, uploads,
+                            len(channel_ids_to_fetch) == len(uploads) and not failed_videos)
+            _record_snapshot(session, channel_id, {row[0]: fresh_stats[row[0]] for row in uploads
+                                                   if row[0] in fresh_stats}, taken_at)
+
+    with tracer.span('build_frame', videos=len(detailed_stats)):
+        table = VideoTable(with_channel=True)
+        for channel_id, (uploads, _) in uploads_by_channel.items():
+            start = len(table)
+            table.extend(uploads, detailed_stats, channels[channel_id]['title'], channel_id)
+            if sink is not None and uploads:
+                sink.write(table.to_frame(start))
+        return channels, table.to_frame()
@@ -0,0 +1,350 @@
+"""
+Historical snapshots of video statistics and view-velocity metrics.
+
+Each fetch appends the counts it got from the API as a timestamped
+snapshot to a Parquet dataset partitioned as
+
+    <root>/channel=<channel id>/date=<YYYY-MM-DD>/<ms timestamp>-<id>.parquet
+
+velocity() turns any number of snapshots into per-video deltas (views per
+hour, likes per day, 7-day growth) with numpy only, no per-video Python.
+
+Several processes (the dashboards, yt_refresh) may write the same store:
+files appear under their final name only once complete, and the interned
+ids and compaction of a channel are guarded by a per-channel lock file.
+"""
+import glob
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from yt_lock import file_lock
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # history is optional
+    pa = ds = pq = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Snapshot dataset directory (override with YT_HISTORY_PATH)
+HISTORY_PATH = os.environ.get("YT_HISTORY_PATH", ".yt_history")
+
+# Period for growth metrics, and how far back trending() reads snapshots
+GROWTH_WINDOW = timedelta(days=7)
+HISTORY_LOOKBACK = timedelta(days=14)
+
+# lz4 decodes ~1.5x faster than zstd here, for ~1.5x the bytes on disk
+HISTORY_COMPRESSION = "lz4"
+
+# A channel/date partition with more files than this is merged into one.
+# Partitions of past days are always merged once a newer day is written.
+COMPACT_AFTER_FILES = 24
+
+# Snapshots store an int32 key per video; the ids themselves are kept once
+# per channel in <root>/_videos/<channel id>.parquet (ignored by the dataset scan).
+SNAPSHOT_SCHEMA = pa and pa.schema([
+    ('snapshot_at', pa.timestamp('s', tz='UTC')),
+    ('video_key', pa.int32()),
+    ('views', pa.int64()),
+    ('likes', pa.int64()),
+    ('comments', pa.int64()),
+])
+
+# Partition values are read as dictionaries, so millions of rows share one string per channel
+_PARTITION_SCHEMA = pa and pa.schema([('channel', pa.dictionary(pa.int32(), pa.string())),
+                                      ('date', pa.dictionary(pa.int32(), pa.string()))])
+
+# Composite sort key: video code in the high bits, seconds since the oldest snapshot in the low 34
+_TIME_BITS = 34
+
+
+def snapshot_frame(stats, taken_at=None):
+    """Snapshot rows from {video_id: details} as returned by the API parsers."""
+    taken_at = taken_at or datetime.now(timezone.utc)
+    video_ids = list(stats)
+    return pd.DataFrame({
+        'snapshot_at': pd.Timestamp(taken_at).floor('s'),
+        'video_id': video_ids,
+        'views': np.fromiter((stats[v].get('views', 0) for v in video_ids), np.int64, len(video_ids)),
+        'likes': np.fromiter((stats[v].get('likes', 0) for v in video_ids), np.int64, len(video_ids)),
+        'comments': np.fromiter((stats[v].get('comments', 0) for v in video_ids), np.int64, len(video_ids)),
+    })
+
+
+class SnapshotStore:
+    """Append-only snapshot dataset on local disk."""
+
+    def __init__(self, root=HISTORY_PATH):
+        if pa is None:
+            raise ImportError("The snapshot history needs pyarrow (pip install pyarrow)")
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _partition(self, channel_id, day):
+        return os.path.join(self.root, f"channel={channel_id}", f"date={day}")
+
+    def _ids_path(self, channel_id):
+        return os.path.join(self.root, "_videos", f"{channel_id}.parquet")
+
+    def _lock_path(self, channel_id):
+        return os.path.join(self.root, "_videos", f"{channel_id}.lock")
+
+    def video_ids(self, channel_id):
+        """Interned video ids of a channel; a video's key is its position."""
+        try:
+            # Read through one open handle: another process may replace the file meanwhile
+            with open(self._ids_path(channel_id), "rb") as f:
+                return pq.read_table(f).column('video_id').to_pandas()
+        except FileNotFoundError:
+            return pd.Series([], dtype=object)
+
+    def _intern(self, channel_id, video_ids):
+        # Called with the channel's lock file held
+        known = self.video_ids(channel_id)
+        keys = pd.Index(known).get_indexer(video_ids)
+        new = np.flatnonzero(keys < 0)
+        if len(new):
+            keys[new] = np.arange(len(known), len(known) + len(new))
+            ids = pd.concat([known, pd.Series(np.asarray(video_ids, dtype=object)[new])], ignore_index=True)
+            path = self._ids_path(channel_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_table(pa.table({'video_id': pa.array(ids, pa.string())}), path)
+        return keys.astype(np.int32)
+
+    def append(self, channel_id, frame):
+        """Write one snapshot (a snapshot_frame) of a channel."""
+        if frame is None or frame.empty:
+            return
+        taken_at = frame['snapshot_at'].iloc[0]
+        directory = self._partition(channel_id, taken_at.strftime("%Y-%m-%d"))
+        name = f"{int(taken_at.timestamp() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        with self._lock, file_lock(self._lock_path(channel_id)):
+            rows = frame.drop(columns='video_id').assign(video_key=self._intern(channel_id, frame['video_id']))
+            table = pa.Table.from_pandas(rows, schema=SNAPSHOT_SCHEMA, preserve_index=False)
+            os.makedirs(directory, exist_ok=True)
+            _write_table(table, os.path.join(directory, name), compression=HISTORY_COMPRESSION)
+            if len(glob.glob(os.path.join(directory, "*.parquet"))) > COMPACT_AFTER_FILES:
+                self._compact(directory)
+            # Fewer files means a faster scan; past days get no more snapshots
+            for past in glob.glob(os.path.join(os.path.dirname(directory), "date=*")):
+                if past < directory and len(glob.glob(os.path.join(past, "*.parquet"))) > 1:
+                    self._compact(past)
+
+    def version(self, channel_ids):
+        """
+        A number that changes whenever a snapshot of one of `channel_ids` is
+        written, by this process or another one (e.g. yt_refresh). Cheap
+        enough to check on every dashboard rerun.
+        """
+        stamps = [0]
+        for channel_id in channel_ids:
+            days = glob.glob(os.path.join(self.root, f"channel={channel_id}", "date=*"))
+            if days:
+                stamps.append(os.stat(max(days)).st_mtime_ns)
+        return max(stamps)
+
+    def _compact(self, directory):
+        # Called with the channel's lock file held
+        files = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+        if len(files) < 2:
+            return
+        table = pq.read_table(files, schema=SNAPSHOT_SCHEMA).sort_by([('video_key', 'ascending'),
+                                                                      ('snapshot_at', 'ascending')])
+        merged = os.path.join(directory, os.path.basename(files[-1]).replace(".parquet", "-c.parquet"))
+        _write_table(table, merged, compression=HISTORY_COMPRESSION)
+        for path in files:
+            os.remove(path)
+        logger.info("Compacted %d snapshot files in %s", len(files), directory)
+
+    def load(self, channel_ids=None, since=None):
+        """
+        Snapshots as a DataFrame (snapshot_at, video_id, views, likes,
+        comments, channel_id), optionally only for some channels and from
+        `since` (a datetime) on. 'video_id' and 'channel_id' are categorical.
+        """
+        columns = ['snapshot_at', 'video_id', 'views', 'likes', 'comments', 'channel_id']
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns)
+
+        condition = None
+        if channel_ids is not None:
+            condition = ds.field('channel').isin(list(channel_ids))
+        if since is not None:
+            since = pd.Timestamp(since)
+            since = since.tz_localize('UTC') if since.tzinfo is None else since.tz_convert('UTC')
+            # The date test prunes whole partitions; the timestamp test trims the first day
+            after = ((ds.field('date') >= since.strftime("%Y-%m-%d"))
+                     & (ds.field('snapshot_at') >= since.to_pydatetime()))
+            condition = after if condition is None else condition & after
+
+        table = self._scan(condition)
+        if table is None or not table.num_rows:
+            return pd.DataFrame(columns=columns)
+
+        # Per-channel video keys -> codes into one category list of all channels' ids
+        channel = table.unify_dictionaries().column('channel').combine_chunks()
+        channels = channel.dictionary.to_pylist()
+        id_lists = [self.video_ids(cid) for cid in channels]
+        offsets = np.cumsum([0] + [len(ids) for ids in id_lists[:-1]])
+        channel_codes = channel.indices.to_numpy()
+        codes = offsets[channel_codes] + table.column('video_key').to_numpy()
+        # factorize also merges an id listed under two channels into one category
+        remap, video_ids = pd.factorize(pd.concat(id_lists, ignore_index=True))
+        codes = remap[codes]
+
+        return pd.DataFrame({
+            'snapshot_at': table.column('snapshot_at').to_pandas(),
+            'video_id': pd.Categorical.from_codes(codes, video_ids),
+            'views': table.column('views').to_numpy(),
+            'likes': table.column('likes').to_numpy(),
+            'comments': table.column('comments').to_numpy(),
+            'channel_id': pd.Categorical.from_codes(channel_codes, channels),
+        })
+
+
+    def _scan(self, condition):
+        # A compaction in another process can remove files between listing and
+        # reading them; listing again picks up the merged file instead
+        for attempt in range(3):
+            try:
+                # Every file is written with SNAPSHOT_SCHEMA, so the scan can infer it from any one
+                dataset = ds.dataset(self.root, format='parquet',
+                                     partitioning=ds.partitioning(_PARTITION_SCHEMA, flavor='hive',
+                                                                  dictionaries='infer'))
+            except pa.ArrowInvalid:
+                # Partition directories but no finished file in them yet: nothing to infer from
+                return None
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                continue
+            if not dataset.files:
+                return None
+            try:
+                return dataset.to_table(columns=['snapshot_at', 'video_key', 'views', 'likes', 'comments',
+                                                 'channel'], filter=condition)
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+
+def _write_table(table, path, **kwargs):
+    """
+    Write a Parquet file under a hidden temporary name (skipped by the
+    dataset scan and by other writers) and move it into place when complete.
+    """
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        pq.write_table(table, tmp, **kwargs)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _epoch_seconds(column):
+    values = pd.DatetimeIndex(column)
+    if values.tz is not None:
+        values = values.tz_convert('UTC').tz_localize(None)
+    return values.values.astype('datetime64[s]').astype(np.int64)
+
+
+def velocity(snapshots, window=GROWTH_WINDOW):
+    """
+    One row per video from a snapshot frame, with its latest counts and:
+      views_per_hour  views gained per hour between its last two snapshots
+      likes_per_day   likes gained per day over the same interval
+      growth_7d       relative view growth since the newest snapshot at least
+                      `window` old (or the oldest one, if none is that old)
+    Metrics are NaN for videos with a single snapshot.
+    """
+    if snapshots.empty:
+        return pd.DataFrame(columns=['video_id', 'channel_id', 'snapshot_at', 'views', 'likes', 'comments',
+                                     'snapshots', 'views_per_hour', 'likes_per_day', 'growth_7d'])
+
+    video_id = snapshots['video_id']
+    if isinstance(video_id.dtype, pd.CategoricalDtype):
+        codes, uniques = video_id.cat.codes.to_numpy(np.int64), video_id.cat.categories
+    else:
+        codes, uniques = pd.factorize(video_id)
+        codes = codes.astype(np.int64)
+    seconds = _epoch_seconds(snapshots['snapshot_at'])
+    seconds = seconds - seconds.min()
+
+    # Sort by (video, time) with a single integer key
+    key = (codes << _TIME_BITS) | seconds
+    order = np.argsort(key, kind='stable')
+    key, codes, seconds = key[order], codes[order], seconds[order]
+    views = snapshots['views'].to_numpy(np.int64)[order]
+    likes = snapshots['likes'].to_numpy(np.int64)[order]
+
+    last = np.flatnonzero(np.r_[codes[1:] != codes[:-1], True])
+    first = np.r_[0, last[:-1] + 1]
+    prev = np.maximum(last - 1, first)
+
+    elapsed = (seconds[last] - seconds[prev]).astype(np.float64)
+    elapsed[elapsed <= 0] = np.nan
+    views_per_hour = (views[last] - views[prev]) / (elapsed / 3600)
+    likes_per_day = (likes[last] - likes[prev]) / (elapsed / 86400)
+
+    # Growth baseline: last snapshot at or before (latest - window) of the same video
+    target = (codes[last] << _TIME_BITS) | np.maximum(seconds[last] - int(window.total_seconds()), 0)
+    base = np.searchsorted(key, target, side='right') - 1
+    base = np.where(base < first, first, base)
+    base_views = views[base].astype(np.float64)
+    base_views[(base == last) | (base_views <= 0)] = np.nan
+    growth = (views[last] - base_views) / base_views
+
+    # .array.take keeps tz-aware timestamps and categoricals out of object arrays
+    latest = order[last]
+    result = pd.DataFrame({
+        'video_id': pd.Categorical.from_codes(codes[last], uniques),
+        'snapshot_at': snapshots['snapshot_at'].array.take(latest),
+        'views': views[last],
+        'likes': likes[last],
+        'comments': snapshots['comments'].to_numpy()[latest],
+        'snapshots': last - first + 1,
+        'views_per_hour': views_per_hour,
+        'likes_per_day': likes_per_day,
+        'growth_7d': growth,
+    })
+    if 'channel_id' in snapshots:
+        result.insert(1, 'channel_id', snapshots['channel_id'].array.take(latest))
+    return result
+
+
+def trending(store, channel_ids=None, n=10, now=None):
+    """The `n` videos gaining views fastest, from the last HISTORY_LOOKBACK of snapshots."""
+    now = now or datetime.now(timezone.utc)
+    metrics = velocity(store.load(channel_ids, since=now - HISTORY_LOOKBACK))
+    if metrics.empty:
+        return metrics
+    return metrics.dropna(subset=['views_per_hour']).nlargest(n, 'views_per_hour')
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_history():
+    """Process-wide snapshot store, or None when pyarrow is not installed."""
+    global _default_store
+    if pa is None:
+        return None
+    with _default_lock:
+        if _default_store is None:
+            _default_store = SnapshotStore()
+        return _default_store
@@ -0,0 +1,219 @@
+"""
+A pool of YouTube Data API keys shared by every run in the process.
+
+Each key has its own daily quota budget. FetchSession asks the pool for a
+key on every call, so the playlistItems and videos().list batches of a
+large refresh spread over all keys instead of draining one:
+
+    get_all_channels_videos("AIza...1,AIza...2,AIza...3", channel_ids)
+    get_all_channels_videos(KeyPool([key1, key2]), channel_ids)
+
+The pool hands out the key with the most budget left. A key that answers
+quotaExceeded is taken out of rotation until the next quota reset
+(midnight Pacific time) and the call moves on to another key. Units
+spent per key and benched keys are saved to KEY_LEDGER_PATH, keyed by a
+fingerprint of the key (never the key itself), so later runs know.
+
+Processes sharing the ledger (the dashboards and yt_refresh) see each
+other's spending: the pool merges the file into its counts whenever it
+is asked what is left, and adds its own units to it at least every
+LEDGER_SYNC_INTERVAL seconds while calls are being made. The file is
+read and written under a lock file.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from yt_lock import file_lock
+from yt_quota import DAILY_QUOTA_BUDGET, next_quota_reset, quota_day
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Per-key units spent today and keys out of quota (override with YT_KEYS_PATH)
+KEY_LEDGER_PATH = os.environ.get("YT_KEYS_PATH", ".yt_keys.json")
+
+# Seconds between merges of this process's units into the ledger during a run
+LEDGER_SYNC_INTERVAL = 5.0
+
+
+class QuotaExhaustedError(Exception):
+    """Every key in the pool is out of quota until the next reset."""
+
+
+def split_keys(api_keys):
+    """Keys from one key, a comma-separated string of keys or a list of keys."""
+    if isinstance(api_keys, str):
+        api_keys = api_keys.split(",")
+    return list(dict.fromkeys(key.strip() for key in api_keys if key and key.strip()))
+
+
+def fingerprint(api_key):
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+class KeyPool:
+    """
+    API keys in rotation, each with `budget` units a day. acquire() picks a
+    key and counts the call against it; exhausted() benches a key until
+    the quota resets. Thread-safe; commit() saves what changed. With
+    `path` None the pool keeps no ledger file.
+    """
+
+    def __init__(self, keys, budget=DAILY_QUOTA_BUDGET, path=KEY_LEDGER_PATH):
+        self.keys = split_keys(keys)
+        if not self.keys:
+            raise ValueError("A KeyPool needs at least one API key")
+        self.budget = budget
+        self.path = path
+        self._lock = threading.Lock()
+        self._day = quota_day()
+        self._used = dict.fromkeys(self.keys, 0)      # units today, saved and unsaved
+        self._pending = dict.fromkeys(self.keys, 0)   # units not saved yet
+        self._benched = {}                            # key -> UTC datetime it comes back
+        self._synced_at = 0.0
+        self._sync()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def label(self, key):
+        """How a key is named in logs and messages: its position, never its value."""
+        return f"API key {self.keys.index(key) + 1}/{len(self.keys)}"
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _sync(self, write=False):
+        """
+        Called with the lock held: take the units other processes spent today
+        and the keys they benched from the ledger file; with `write`, add the
+        units this pool spent since the last write to it first.
+        """
+        if self.path is None:
+            return
+        with file_lock(self.path + ".lock"):
+            saved = self._load()
+            if saved.get('day') != self._day:
+                # Benched keys outlive the day they were benched on; counts do not
+                saved = {'day': self._day, 'keys': {fp: {'used': 0, 'benched_until': entry.get('benched_until')}
+                                                    for fp, entry in saved.get('keys', {}).items()}}
+            if write:
+                for key in self.keys:
+                    entry = saved['keys'].setdefault(fingerprint(key), {'used': 0, 'benched_until': None})
+                    entry['used'] += self._pending[key]
+                    if key in self._benched:
+                        entry['benched_until'] = self._benched[key].isoformat()
+                self._pending = dict.fromkeys(self.keys, 0)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(saved, f)
+                os.replace(tmp, self.path)
+        now = datetime.now(timezone.utc)
+        for key in self.keys:
+            entry = saved['keys'].get(fingerprint(key), {})
+            self._used[key] = entry.get('used', 0) + self._pending[key]
+            if entry.get('benched_until') and key not in self._benched:
+                until = datetime.fromisoformat(entry['benched_until'])
+                if until > now:
+                    self._benched[key] = until
+        self._synced_at = time.monotonic()
+
+    def _refresh(self):
+        # Called with the lock held: start a new quota day, bring back rested keys
+        today = quota_day()
+        if today != self._day:
+            self._day = today
+            self._used = dict.fromkeys(self.keys, 0)
+        now = datetime.now(timezone.utc)
+        for key in [key for key, until in self._benched.items() if until <= now]:
+            del self._benched[key]
+            logger.info("%s is back in rotation", self.label(key))
+
+    def acquire(self, cost=1):
+        """The key with the most budget left (not benched), with `cost` units counted against it."""
+        with self._lock:
+            self._refresh()
+            if time.monotonic() - self._synced_at >= LEDGER_SYNC_INTERVAL:
+                self._sync(write=True)
+            available = [key for key in self.keys if key not in self._benched]
+            if not available:
+                raise QuotaExhaustedError(f"All {len(self.keys)} API key(s) are out of quota until "
+                                          f"{min(self._benched.values()):%Y-%m-%d %H:%M} UTC")
+            key = max(available, key=lambda k: self.budget - self._used[k])
+            self._used[key] += cost
+            self._pending[key] += cost
+            return key
+
+    def exhausted(self, key):
+        """
+        Take `key` out of rotation until the next quota reset. Returns True
+        if other keys are still available.
+        """
+        with self._lock:
+            if key not in self._benched:
+                self._benched[key] = next_quota_reset()
+                logger.warning("%s is out of quota; benched until %s", self.label(key),
+                               self._benched[key].strftime("%Y-%m-%d %H:%M UTC"))
+            return len(self._benched) < len(self.keys)
+
+    def remaining(self):
+        """Units left today over the keys in rotation, counting what other processes spent."""
+        with self._lock:
+            self._refresh()
+            self._sync()
+            return sum(max(0, self.budget - self._used[key]) for key in self.keys if key not in self._benched)
+
+    def used_today(self):
+        with self._lock:
+            self._refresh()
+            self._sync()
+            return sum(self._used.values())
+
+    @property
+    def total_budget(self):
+        return self.budget * len(self.keys)
+
+    def status(self):
+        """One dict per key: label, units used today, units left, and when a benched key returns."""
+        with self._lock:
+            self._refresh()
+            self._sync()
+            return [{
+                'key': self.label(key),
+                'used': self._used[key],
+                'remaining': 0 if key in self._benched else max(0, self.budget - self._used[key]),
+                'benched_until': self._benched.get(key),
+            } for key in self.keys]
+
+    def commit(self):
+        """Add units spent since the last commit to the ledger file and record benched keys."""
+        with self._lock:
+            self._sync(write=True)
+
+
+def get_key_pool(api_keys):
+    """
+    The process-wide KeyPool for `api_keys` (one key, a comma-separated
+    string or a list), so every run sees the same usage and benched keys.
+    A KeyPool is returned as is.
+    """
+    if isinstance(api_keys, KeyPool):
+        return api_keys
+    return _shared_pool(tuple(split_keys(api_keys)))
+
+
+@functools.lru_cache(maxsize=32)
+def _shared_pool(keys):
+    return KeyPool(keys)
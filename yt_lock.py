@@ -0,0 +1,55 @@
+"""
+Advisory file locks between processes.
+
+The background refresher (yt_refresh) and the dashboards write the same
+snapshot history and key ledger. Each writer holds a lock file around
+its read-modify-write, so one process never overwrites another's:
+
+    with file_lock(path + ".lock"):
+        state = read(path)
+        ...
+        write(path, state)
+
+The lock file itself is left in place; only the lock on it matters.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Seconds between attempts while another process holds a lock (Windows only;
+# fcntl blocks until the lock is free)
+LOCK_POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if missing) for the block."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
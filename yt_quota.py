@@ -0,0 +1,107 @@
+import math
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Daily YouTube Data API budget in quota units (project default is 10,000)
+DAILY_QUOTA_BUDGET = int(os.environ.get("YT_DAILY_QUOTA", "10000"))
+
+# What to do when a run is estimated to exceed the remaining budget:
+# 'trim' fetches as many (newest) videos as fit, 'refuse' does not start.
+QUOTA_OVERRUN_POLICY = "trim"
+
+# Unit cost per API method; anything unlisted costs 1
+QUOTA_COSTS = {
+    'youtube.channels.list': 1,
+    'youtube.playlistItems.list': 1,
+    'youtube.videos.list': 1,
+    'youtube.commentThreads.list': 1,
+    'youtube.search.list': 100,
+}
+
+
+def quota_day(now=None):
+    """Quota resets at midnight Pacific time; return that day as YYYY-MM-DD."""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(QUOTA_TZ).strftime("%Y-%m-%d")
+
+
+def next_quota_reset(now=None):
+    """The next midnight Pacific time (when daily quota resets), as an aware UTC datetime."""
+    now = (now or datetime.now(timezone.utc)).astimezone(QUOTA_TZ)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=QUOTA_TZ)
+    return midnight.astimezone(timezone.utc)
+
+
+def method_cost(method_id):
+    return QUOTA_COSTS.get(method_id, 1)
+
+
+class QuotaTracker:
+    """
+    Per-run quota accounting. FetchSession.execute records every API call
+    here, whether it succeeds or not. Units spent per day are kept by the
+    key pool (yt_keys.KeyPool), which also charges each call.
+    """
+
+    def __init__(self):
+        self.units = 0
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def record(self, method_id):
+        cost = method_cost(method_id)
+        with self._lock:
+            self.units += cost
+            self.requests[method_id] = self.requests.get(method_id, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                'units': self.units,
+                'requests': sum(self.requests.values()),
+                'by_method': dict(self.requests),
+            }
+
+
+# ==========================================
+# PLANNING
+# ==========================================
+
+def estimate_cost(video_count, playlist_cached=False):
+    """
+    Upper-bound units to fetch one channel's videos: one playlistItems page
+    and one videos().list batch per 50 videos (channel lookup not included).
+    """
+    batches = math.ceil(int(video_count) / 50)
+    return (0 if playlist_cached else batches) + batches
+
+
+def max_videos_within(units, playlist_cached=False):
+    """Largest video count whose estimate_cost fits in `units`."""
+    per_batch = 1 if playlist_cached else 2
+    return max(0, units // per_batch) * 50
+
+
+def plan_run(estimate, remaining, policy=QUOTA_OVERRUN_POLICY):
+    """
+    Check an estimate against the `remaining` units of today's budget
+    (what a yt_keys.KeyPool has left). Returns {'estimate', 'remaining',
+    'action'} where action is 'ok', 'trim' or 'refuse'.
+    """
+    if estimate <= remaining:
+        action = 'ok'
+    elif policy == 'trim' and remaining > 0:
+        action = 'trim'
+    else:
+        action = 'refuse'
+    return {'estimate': estimate, 'remaining': remaining, 'action': action}
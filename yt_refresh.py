@@ -0,0 +1,358 @@
+"""
+Background refresher for a watchlist of channels.
+
+Keeps the channels listed in WATCHLIST_PATH fresh in the shared local
+store (the response cache and the snapshot history), so the dashboards
+can show them without waiting on a live fetch:
+
+    python yt_refresh.py --add UCxxxxxxxxxxxxxxxxxxxxxx UCyyyyyyyyyyyyyyyyyyyyyy
+    python yt_refresh.py                 # runs until interrupted
+    python yt_refresh.py --once          # refreshes what is due, then exits
+    python yt_refresh.py --list          # the schedule
+
+Every channel has its own refresh interval. A refresh that finds new
+uploads (or views growing by ACTIVE_VIEW_GROWTH or more) halves it, a
+quiet one stretches it, so busy channels come round more often. The most
+overdue channels go first, REFRESH_WORKERS at a time, and the refresher
+stops spending once only REFRESH_QUOTA_RESERVE of the keys' daily budget
+is left for interactive loads. Refreshes are incremental runs of
+get_all_videos, so a quiet channel costs a few units.
+
+The dashboards call prewarmed(channel_ids) before fetching anything.
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from yt_batch import MAX_CONCURRENT_REQUESTS
+from yt_cache import get_cache
+from yt_fetcher import VideoTable, get_all_videos, read_channel_ids
+from yt_history import get_history
+from yt_keys import get_key_pool
+from yt_quota import estimate_cost
+from yt_sync import STATS_REFRESH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Channel ids to keep fresh, one per line (override with YT_WATCHLIST_PATH)
+WATCHLIST_PATH = os.environ.get("YT_WATCHLIST_PATH", ".yt_watchlist.txt")
+
+# Seconds between refreshes of a channel: where new channels start, and the
+# bounds activity moves it between
+DEFAULT_REFRESH_INTERVAL = 3600
+MIN_REFRESH_INTERVAL = 15 * 60
+MAX_REFRESH_INTERVAL = 24 * 3600
+
+# Growth of a channel's total video views between refreshes that counts as
+# activity (new uploads always do)
+ACTIVE_VIEW_GROWTH = 0.01
+
+# Channels refreshed at once. Their API calls share MAX_CONCURRENT_REQUESTS.
+REFRESH_WORKERS = 4
+
+# Share of the keys' daily budget the refresher leaves for dashboard loads
+REFRESH_QUOTA_RESERVE = 0.5
+
+# Longest sleep between schedule checks (watchlist edits are seen this quickly)
+POLL_INTERVAL = 60
+
+# Refresh intervals after which prewarmed() stops serving a channel's data
+# and the dashboards load it live instead
+PREWARMED_MAX_INTERVALS = 2
+
+
+class Watchlist:
+    """Channel ids in a text file: one per line or comma-separated, '#' starts a comment."""
+
+    def __init__(self, path=WATCHLIST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return read_channel_ids(f)
+        except FileNotFoundError:
+            return []
+
+    def add(self, channel_ids):
+        with self._lock:
+            known = self.load()
+            self._save(known + [cid for cid in read_channel_ids(channel_ids) if cid not in known])
+
+    def remove(self, channel_ids):
+        with self._lock:
+            dropped = set(read_channel_ids(channel_ids))
+            self._save([cid for cid in self.load() if cid not in dropped])
+
+    def _save(self, channel_ids):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(f"{cid}\n" for cid in channel_ids)
+        os.replace(tmp, self.path)
+
+
+def priority(state, now=None):
+    """
+    How overdue a channel is: seconds since it was last tried over its
+    interval. 1 or more means due; a channel never tried is infinitely due.
+    """
+    if not state:
+        return float('inf')
+    now = now or time.time()
+    return (now - state['checked_at']) / state['interval']
+
+
+def next_interval(interval, new_videos, views_gained, views):
+    """Shorter after an active refresh, longer after a quiet one."""
+    if new_videos or (views and views_gained / views >= ACTIVE_VIEW_GROWTH):
+        return max(MIN_REFRESH_INTERVAL, interval / 2)
+    return min(MAX_REFRESH_INTERVAL, interval * 1.5)
+
+
+class Refresher:
+    """
+    Refreshes due watchlist channels on a thread pool. Per-channel state
+    (last refresh, interval, size, failures) is kept in the response cache
+    under kind 'refresh', next to the data it describes.
+    """
+
+    def __init__(self, api_key, watchlist=None, workers=REFRESH_WORKERS, reserve=REFRESH_QUOTA_RESERVE,
+                 history=None):
+        self.keys = get_key_pool(api_key)
+        self.watchlist = watchlist or Watchlist()
+        self.workers = workers
+        self.request_workers = max(1, MAX_CONCURRENT_REQUESTS // workers)
+        self.reserve_units = int(reserve * self.keys.total_budget)
+        self.cache = get_cache()
+        self.history = history if history is not None else get_history()
+        self._stop = threading.Event()
+
+    def schedule(self, now=None):
+        """[(channel_id, state, priority)] for every watched channel, most overdue first."""
+        now = now or time.time()
+        channel_ids = self.watchlist.load()
+        states = self.cache.get_many('refresh', channel_ids)
+        ranked = [(cid, states.get(cid), priority(states.get(cid), now)) for cid in channel_ids]
+        return sorted(ranked, key=lambda entry: entry[2], reverse=True)
+
+    def estimate(self, channel_id, state):
+        """Upper-bound units for one incremental refresh of `channel_id`."""
+        if state:
+            videos = state['videos']
+        else:
+            channel = self.cache.get('channel', channel_id, max_age=float('inf')) or {}
+            videos = int(channel.get('video_count', 0))
+        sync = self.cache.get('sync', channel_id) or {}
+        if not sync or time.time() - sync.get('stats_refreshed_at', 0) >= STATS_REFRESH_INTERVAL:
+            # First sync lists everything; the daily stats pass re-fetches every video
+            return 1 + estimate_cost(videos, playlist_cached=bool(sync))
+        return 3   # channel lookup, one playlist page, one videos().list batch
+
+    def refresh(self, channel_id):
+        """Run one incremental fetch of `channel_id` and reschedule it. Returns True on success."""
+        state = self.cache.get('refresh', channel_id) or {}
+        interval = state.get('interval', DEFAULT_REFRESH_INTERVAL)
+        started = time.time()
+        try:
+            channel_info, df = get_all_videos(self.keys, channel_id, use_cache=True, incremental=True,
+                                              max_workers=self.request_workers, history=self.history)
+        except Exception:
+            logger.exception("Refresh failed for channel_id=%s", channel_id)
+            channel_info, df = None, None
+
+        if not channel_info or df is None:
+            failures = state.get('failures', 0) + 1
+            state.update(checked_at=started, failures=failures,
+                         interval=min(MAX_REFRESH_INTERVAL, MIN_REFRESH_INTERVAL * 2 ** (failures - 1)))
+            state.setdefault('videos', 0)
+            self.cache.set('refresh', channel_id, state)
+            logger.warning("Could not refresh %s (%d failure(s) in a row); next try in %d min",
+                           channel_id, failures, state['interval'] // 60)
+            return False
+
+        views = int(df['Views'].sum())
+        new_videos = max(0, len(df) - state['videos']) if 'refreshed_at' in state else 0
+        views_gained = views - state.get('views', views)
+        if 'refreshed_at' in state:
+            interval = next_interval(interval, new_videos, views_gained, state.get('views', 0))
+        self.cache.set('refresh', channel_id, {
+            'checked_at': started,
+            'refreshed_at': started,
+            'interval': interval,
+            'videos': len(df),
+            'views': views,
+            'new_videos': new_videos,
+            'failures': 0,
+        })
+        logger.info("Refreshed %s: %d videos, %d new, %+d views; next in %d min",
+                    channel_id, len(df), new_videos, views_gained, interval // 60)
+        return True
+
+    def seconds_to_next(self, now=None):
+        """Seconds until the next channel is due, at most POLL_INTERVAL."""
+        now = now or time.time()
+        waits = [state['checked_at'] + state['interval'] - now if state else 0
+                 for _, state, _ in self.schedule(now)]
+        return max(0.0, min(waits + [POLL_INTERVAL]))
+
+    def run(self, once=False):
+        """
+        Refresh due channels until stop() (or, with `once`, until nothing
+        due is left that fits in the quota). Returns the number of refreshes.
+        """
+        refreshed = 0
+        running = {}          # future -> (channel_id, estimated units)
+        short_of_quota = False
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set():
+                busy = {cid for cid, _ in running.values()}
+                committed = sum(units for _, units in running.values())
+                for channel_id, state, rank in self.schedule():
+                    if rank < 1 or len(running) >= self.workers:
+                        break
+                    if channel_id in busy:
+                        continue
+                    units = self.estimate(channel_id, state)
+                    if self.keys.remaining() - committed - units < self.reserve_units:
+                        if not short_of_quota:
+                            logger.warning("Quota reserve reached (%d units kept for dashboard loads); "
+                                           "refreshes wait for the daily reset", self.reserve_units)
+                        short_of_quota = True
+                        break
+                    short_of_quota = False
+                    running[pool.submit(self.refresh, channel_id)] = channel_id, units
+                    committed += units
+
+                if not running:
+                    if once:
+                        break
+                    self._stop.wait(POLL_INTERVAL if short_of_quota else self.seconds_to_next())
+                    continue
+                done, _ = wait(running, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+                    refreshed += future.result()
+        return refreshed
+
+    def stop(self):
+        self._stop.set()
+
+
+def prewarmed(channel_ids, cache=None):
+    """
+    (channels, DataFrame, refreshed_at) for `channel_ids` built from the
+    local store alone, with no API call, or None unless the refresher has
+    refreshed every one of them and their data is still in the cache. A
+    channel whose last refresh failed, or that was last refreshed more
+    than PREWARMED_MAX_INTERVALS of its intervals ago, also gives None, so
+    the caller loads it live. `refreshed_at` is when the stalest of them
+    was refreshed (epoch seconds).
+    The DataFrame has a 'Channel' column when there are several channels,
+    like get_all_channels_videos.
+    """
+    cache = cache or get_cache()
+    forever = float('inf')
+    states = cache.get_many('refresh', channel_ids)
+    if not channel_ids or any('refreshed_at' not in states.get(cid, {}) for cid in channel_ids):
+        return None
+    now = time.time()
+    for cid in channel_ids:
+        state = states[cid]
+        if state.get('failures') or now - state['refreshed_at'] > PREWARMED_MAX_INTERVALS * state['interval']:
+            return None
+    channels = cache.get_many('channel', channel_ids, max_age=forever)
+    listings = cache.get_many('uploads', channel_ids, max_age=forever)
+    if len(channels) < len(channel_ids) or len(listings) < len(channel_ids):
+        return None
+    video_ids = list({row[0]: None for cid in channel_ids for row in listings[cid]})
+    stats = cache.get_many('video', video_ids, max_age=forever)
+    if len(stats) < len(video_ids):
+        return None   # partly evicted: a live load fills it back in
+
+    table = VideoTable(with_channel=len(channel_ids) > 1)
+    for cid in channel_ids:
+        table.extend(listings[cid], stats, channels[cid]['title'], cid)
+    refreshed_at = min(states[cid]['refreshed_at'] for cid in channel_ids)
+    return {cid: channels[cid] for cid in channel_ids}, table.to_frame(), refreshed_at
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a watchlist of YouTube channels refreshed in the background.")
+    parser.add_argument("--add", nargs="+", metavar="CHANNEL_ID", help="Add channel IDs to the watchlist and exit")
+    parser.add_argument("--remove", nargs="+", metavar="CHANNEL_ID",
+                        help="Remove channel IDs from the watchlist and exit")
+    parser.add_argument("--list", action="store_true", help="Show the watchlist and refresh schedule and exit")
+    parser.add_argument("--once", action="store_true", help="Refresh the channels that are due, then exit")
+    parser.add_argument("--watchlist", default=WATCHLIST_PATH, help=f"Watchlist file (default: {WATCHLIST_PATH})")
+    parser.add_argument("--api-key", default=os.environ.get("YOUTUBE_API_KEY", ""),
+                        help="YouTube Data API key, or several comma-separated (default: $YOUTUBE_API_KEY)")
+    parser.add_argument("--workers", type=int, default=REFRESH_WORKERS,
+                        help=f"Channels refreshed at once (default: {REFRESH_WORKERS})")
+    parser.add_argument("--reserve", type=float, default=REFRESH_QUOTA_RESERVE,
+                        help="Share of the daily quota left for dashboard loads "
+                             f"(default: {REFRESH_QUOTA_RESERVE})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every refresh")
+    return parser.parse_args(argv)
+
+
+def print_schedule(watchlist):
+    now = time.time()
+    states = get_cache().get_many('refresh', watchlist.load())
+    for channel_id in watchlist.load():
+        state = states.get(channel_id)
+        if state is None:
+            print(f"{channel_id}  never refreshed, due now")
+            continue
+        last = (datetime.fromtimestamp(state['refreshed_at']).strftime("%Y-%m-%d %H:%M")
+                if 'refreshed_at' in state else "never")
+        due_in = max(0, state['checked_at'] + state['interval'] - now)
+        print(f"{channel_id}  {state['videos']:>7} videos  last refresh {last}  "
+              f"every {state['interval'] / 60:.0f} min  due in {due_in / 60:.0f} min"
+              + (f"  ({state['failures']} failure(s))" if state.get('failures') else ""))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(asctime)s %(levelname)s: %(message)s',
+                        level=logging.INFO if args.verbose else logging.WARNING)
+    watchlist = Watchlist(args.watchlist)
+
+    if args.add or args.remove:
+        if args.add:
+            watchlist.add(args.add)
+        if args.remove:
+            watchlist.remove(args.remove)
+        print(f"{len(watchlist.load())} channel(s) on the watchlist", file=sys.stderr)
+        return 0
+    if args.list:
+        print_schedule(watchlist)
+        return 0
+
+    if not args.api_key:
+        logger.error("No API key given (use --api-key or set YOUTUBE_API_KEY).")
+        return 2
+    if not watchlist.load():
+        logger.error("The watchlist %s is empty (add channels with --add).", args.watchlist)
+        return 2
+
+    refresher = Refresher(args.api_key, watchlist, args.workers, args.reserve)
+    try:
+        refreshed = refresher.run(once=args.once)
+    except KeyboardInterrupt:
+        refresher.stop()
+        return 0
+    print(f"Refreshed {refreshed} channel(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Retry and rate limiting for YouTube API calls.
+
+FetchSession.execute retries transient failures (5xx, rate limiting,
+dropped connections) with exponential backoff and full jitter, and paces
+every request through a per-key TokenBucket. The bucket halves its rate
+when the API throttles and creeps back up on success.
+"""
+import functools
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import ssl
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Attempts after the first one before a call is given up
+MAX_RETRIES = 5
+
+# Backoff before retry n is uniform in [0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n)] seconds
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+# Request pacing per API key (requests/second). Throttling halves the rate,
+# down to MIN_REQUESTS_PER_SECOND; each success adds RATE_RECOVERY_STEP back.
+MAX_REQUESTS_PER_SECOND = float(os.environ.get("YT_MAX_RPS", "100"))
+MIN_REQUESTS_PER_SECOND = 1.0
+RATE_RECOVERY_STEP = 0.5
+RATE_BURST = 16
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+TRANSIENT_REASONS = THROTTLE_REASONS | {'backendError', 'internalError'}
+
+# Network errors worth another attempt
+TRANSIENT_ERRORS = (ConnectionError, socket.timeout, ssl.SSLError, http.client.HTTPException)
+
+
+def error_reason(exc):
+    """The API's reason code ('quotaExceeded', 'backendError', ...) of an HttpError, or None."""
+    if not isinstance(exc, HttpError):
+        return None
+    try:
+        return json.loads(exc.content.decode('utf-8'))['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        return None
+
+
+def describe_error(exc):
+    """Short text for logs: 'HTTP 503 backendError', or the exception itself if not an HttpError."""
+    if not isinstance(exc, HttpError):
+        return repr(exc)
+    reason = error_reason(exc)
+    return f"HTTP {exc.resp.status} {reason}" if reason else f"HTTP {exc.resp.status}"
+
+
+def redact_key(exc):
+    """
+    Mask the key= parameter in the request URI an HttpError carries, so
+    neither its message nor a logged traceback shows the API key.
+    """
+    if isinstance(exc, HttpError) and exc.uri:
+        exc.uri = re.sub(r'([?&]key=)[^&]*', r'\1***', exc.uri)
+    return exc
+
+
+def is_throttled(exc):
+    if not isinstance(exc, HttpError):
+        return False
+    return exc.resp.status == 429 or error_reason(exc) in THROTTLE_REASONS
+
+
+def is_quota_exceeded(exc):
+    """True if the API key's daily quota is spent (nothing to gain from retrying it today)."""
+    return error_reason(exc) in QUOTA_REASONS
+
+
+def is_retryable(exc):
+    """True for failures that may go away on their own (not quota, auth or bad requests)."""
+    if isinstance(exc, HttpError):
+        return exc.resp.status in RETRYABLE_STATUSES or error_reason(exc) in TRANSIENT_REASONS
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+def is_client_error(exc):
+    """A 4xx caused by the request itself, which splitting the request may get around."""
+    return (isinstance(exc, HttpError) and 400 <= exc.resp.status < 500
+            and exc.resp.status not in (401, 403, 429))
+
+
+def backoff_delay(attempt, exc=None):
+    """Seconds to wait before retry number `attempt` (0-based), honouring Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if isinstance(exc, HttpError):
+        try:
+            delay = max(delay, float(exc.resp.get('retry-after', 0)))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with additive-increase / multiplicative-decrease
+    of its rate. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate=MAX_REQUESTS_PER_SECOND, burst=RATE_BURST,
+                 min_rate=MIN_REQUESTS_PER_SECOND, recovery_step=RATE_RECOVERY_STEP):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now (possibly going negative) and sleep off the debt outside the lock
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+
+@functools.lru_cache(maxsize=32)
+def get_rate_limiter(api_key):
+    """One TokenBucket per API key, shared by every run in the process."""
+    return TokenBucket()
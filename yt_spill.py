@@ -0,0 +1,147 @@
+"""
+Very large channels on disk instead of in memory.
+
+spill_videos streams a channel (yt_fetcher.VideoStream) into a Parquet
+file chunk by chunk, so memory stays within the stream's limit however
+many videos the channel has. SpilledTable reads the file back lazily,
+only as much of it as is asked for:
+
+    channel, videos = spill_videos(api_key, channel_id, "videos.parquet")
+    len(videos)                                   # from the file footer, nothing loaded
+    videos.head(100)                              # only the first row group is read
+    videos.page(5000, 5100)                       # only the row groups under that range
+    videos.columns(['Published', 'Views'])        # just those columns
+    videos.scan(filter=pc.field('Views') > 10**6) # filtered while reading (pyarrow.compute)
+    df = videos.to_frame()                        # all of it, when it is really needed
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from yt_batch import MAX_CONCURRENT_REQUESTS
+from yt_export import TableSink
+from yt_fetcher import STREAM_MEMORY_LIMIT, VideoStream
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # spilling needs pyarrow, like Parquet export
+    pa = ds = pq = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Columns stored as plain strings that read back as categoricals
+CATEGORY_COLUMNS = ('Channel', 'Channel ID')
+
+
+def spill_videos(api_key, channel_id, path, use_cache=True, quota=None, listener=None,
+                 max_workers=MAX_CONCURRENT_REQUESTS, history=None, tracer=None,
+                 memory_limit=STREAM_MEMORY_LIMIT, archive=None):
+    """
+    Stream one channel's video table into a Parquet file at `path`, one
+    row group per chunk. Returns (channel info, SpilledTable), or
+    (None, None) if the channel could not be loaded. The file is written
+    next to `path` and moved into place once complete.
+    """
+    if pq is None:
+        raise ImportError("Spilling to disk needs pyarrow (pip install pyarrow)")
+    stream = VideoStream(api_key, channel_id, use_cache, quota, listener, max_workers, history=history,
+                         tracer=tracer, memory_limit=memory_limit, archive=archive)
+    tmp = path + ".tmp"
+    try:
+        with TableSink(tmp, 'parquet', row_group_rows=stream.chunk_rows) as sink:
+            for frame in stream:
+                sink.write(frame)
+    except BaseException:
+        _remove(tmp)
+        raise
+    if not stream.channel or not stream.rows:
+        _remove(tmp)
+        return stream.channel or None, None
+    os.replace(tmp, path)
+    logger.info("Spilled %d videos of channel_id=%s to %s", stream.rows, channel_id, path)
+    return stream.channel, SpilledTable(path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpilledTable:
+    """
+    A video table in a Parquet file, read on demand. Nothing is loaded
+    until a method asks for rows; the frames returned look like
+    VideoTable.to_frame() output (categorical channel columns, Tags as an
+    Arrow list column).
+    """
+
+    def __init__(self, path):
+        if pq is None:
+            raise ImportError("Reading spilled tables needs pyarrow (pip install pyarrow)")
+        self.path = path
+        self._file = pq.ParquetFile(path)
+        self.schema = self._file.schema_arrow
+
+    def __len__(self):
+        return self._file.metadata.num_rows
+
+    @property
+    def column_names(self):
+        return self.schema.names
+
+    def _to_pandas(self, table):
+        for name in CATEGORY_COLUMNS:
+            if name in table.column_names:
+                i = table.column_names.index(name)
+                table = table.set_column(i, name, table.column(name).dictionary_encode())
+        return table.to_pandas(types_mapper=_list_dtype, self_destruct=True)
+
+    def columns(self, names):
+        """All rows of the `names` columns."""
+        return self._to_pandas(self._file.read(columns=list(names)))
+
+    def page(self, start, stop, columns=None):
+        """Rows start..stop-1 (playlist order), reading only the row groups they fall in."""
+        metadata = self._file.metadata
+        start = max(0, start)
+        stop = min(stop, metadata.num_rows)
+        if start >= stop:
+            return self._to_pandas(self.schema.empty_table().select(columns or self.column_names))
+
+        bounds = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+        first = int(np.searchsorted(bounds, start, side='right')) - 1
+        last = int(np.searchsorted(bounds, stop, side='left'))
+        table = self._file.read_row_groups(range(first, last), columns=columns)
+        offset = start - int(bounds[first])
+        return self._to_pandas(table.slice(offset, stop - start)).reset_index(drop=True)
+
+    def head(self, n=5, columns=None):
+        return self.page(0, n, columns)
+
+    def scan(self, columns=None, filter=None):
+        """
+        Rows matching `filter` (a pyarrow.compute expression), read one
+        row group at a time so only the matches are held.
+        """
+        table = ds.dataset(self.path, format='parquet').to_table(columns=columns, filter=filter)
+        return self._to_pandas(table)
+
+    def to_frame(self, columns=None):
+        """The whole table (or `columns` of it) as one DataFrame."""
+        return self._to_pandas(self._file.read(columns=columns))
+
+
+def _list_dtype(arrow_type):
+    # Tags stay an Arrow list column, as VideoTable.to_frame() builds it
+    if pa.types.is_list(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
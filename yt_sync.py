@@ -0,0 +1,85 @@
+import time
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# How often statistics of already-known videos are re-fetched in incremental
+# mode. New uploads are always fetched in full.
+STATS_REFRESH_INTERVAL = 24 * 3600
+
+# Partial-response mask for uploads playlist pages: the [video_id, title,
+# publishedAt] rows and the paging token, nothing else
+PLAYLIST_FIELDS = "nextPageToken,items(contentDetails/videoId,snippet(title,publishedAt))"
+
+
+def fetch_new_uploads(session, playlist_id, known_ids):
+    """
+    Page the uploads playlist (newest first) and stop at the first video
+    that is already in `known_ids`. Returns [video_id, title, publishedAt]
+    rows for the new videos only.
+    """
+    new_uploads = []
+    next_page_token = None
+
+    while True:
+        playlist_response = session.execute(session.youtube.playlistItems().list(
+            playlistId=playlist_id,
+            part='contentDetails,snippet',
+            maxResults=50,
+            pageToken=next_page_token,
+            fields=PLAYLIST_FIELDS,
+            prettyPrint=False
+        ))
+
+        for item in playlist_response['items']:
+            video_id = item['contentDetails']['videoId']
+            if video_id in known_ids:
+                return new_uploads
+            new_uploads.append([
+                video_id,
+                item['snippet']['title'],
+                item['snippet']['publishedAt']
+            ])
+
+        next_page_token = playlist_response.get('nextPageToken')
+        if not next_page_token:
+            return new_uploads
+
+
+def sync_uploads(session, channel_id, playlist_id, stats_refresh_interval=STATS_REFRESH_INTERVAL):
+    """
+    Bring the cached uploads listing of a channel up to date.
+
+    Returns (uploads, ids_to_fetch): the full [video_id, title, publishedAt]
+    listing, newest first, and the video ids whose details must come from
+    the API. That is the new uploads, plus every older video once the
+    stats refresh interval has elapsed. Requires `session.cache`.
+    """
+    cache = session.cache
+    state = cache.get('sync', channel_id) or {}
+    known = cache.get('uploads', channel_id, max_age=float('inf')) or []
+    known_ids = {row[0] for row in known}
+
+    new_uploads = fetch_new_uploads(session, playlist_id, known_ids)
+    uploads = new_uploads + known
+
+    if new_uploads or not known:
+        cache.set('uploads', channel_id, uploads)
+
+    refresh_due = time.time() - state.get('stats_refreshed_at', 0) >= stats_refresh_interval
+    if refresh_due:
+        ids_to_fetch = [row[0] for row in uploads]
+    else:
+        ids_to_fetch = [row[0] for row in new_uploads]
+
+    return uploads, ids_to_fetch
+
+
+def mark_synced(cache, channel_id, uploads, stats_refreshed):
+    """Record the newest known video and, if all stats were refreshed, when."""
+    state = cache.get('sync', channel_id) or {}
+    state['newest_video_id'] = uploads[0][0] if uploads else None
+    state['synced_at'] = time.time()
+    if stats_refreshed:
+        state['stats_refreshed_at'] = state['synced_at']
+    cache.set('sync', channel_id, state)
@@ -0,0 +1,187 @@
+"""
+Server-side filtering, sorting and paging of the video table.
+
+st.dataframe serializes every row it is handed and ships it to the
+browser, so a 100k-video table stalls the page. TableIndex answers table
+queries on the server instead and the dashboard renders one page:
+
+    index = TableIndex(df)
+    rows = index.query(title="tutorial", published=(start, end), views=(1000, None),
+                       sort='Views', descending=True)
+    page = index.page(rows, page=1, page_size=100)    # a 100-row DataFrame
+
+Sort orders are computed once per column and reused for both sorting and
+range filters (a range is a binary search on the sorted values). Title
+search goes through TitleIndex, an inverted index of byte trigrams.
+"""
+import numpy as np
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Columns the table can be sorted by (None keeps playlist order)
+SORT_COLUMNS = (None, 'Published', 'Views', 'Likes', 'Comments', 'Title')
+
+PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 100
+
+# Separator between titles in the trigram buffer; titles never contain NUL,
+# so trigrams spanning two titles are easy to drop
+_GAP = b"\0\0"
+
+
+class TitleIndex:
+    """
+    Case-insensitive substring search over titles. Every trigram of the
+    casefolded UTF-8 bytes maps to the sorted rows containing it; a query
+    intersects the posting lists of its trigrams and checks only the
+    surviving rows. Queries shorter than three bytes scan all titles.
+    """
+
+    def __init__(self, titles):
+        self.titles = [str(t).casefold() for t in titles]
+        encoded = [t.encode('utf-8') for t in self.titles]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        buf = np.frombuffer(_GAP.join(encoded), dtype=np.uint8).astype(np.int32)
+
+        keys = buf[:-2] << 16 | buf[1:-1] << 8 | buf[2:]
+        rows = np.repeat(np.arange(len(encoded), dtype=np.int32), lengths + len(_GAP))[:len(keys)]
+        inside = (buf[:-2] != 0) & (buf[1:-1] != 0) & (buf[2:] != 0)
+        keys, rows = keys[inside], rows[inside]
+
+        # Stable two-pass radix sort on the 24-bit keys (numpy radix-sorts 16-bit
+        # keys); rows stay ascending within a key
+        order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind='stable')
+        order = order[np.argsort((keys[order] >> 16).astype(np.uint16), kind='stable')]
+        keys, rows = keys[order], rows[order]
+        # A title repeating a trigram lists its row once
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+        keys, self.rows = keys[first], rows[first]
+
+        starts = np.flatnonzero(np.diff(keys, prepend=-1))
+        self.keys = keys[starts]
+        self.offsets = np.append(starts, len(keys))
+
+    def __len__(self):
+        return len(self.titles)
+
+    def _postings(self, key):
+        i = np.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.rows[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def search(self, text, within=None):
+        """
+        Sorted positions of the titles containing `text` (ignoring case).
+        `within`, a boolean mask over all rows, limits the search to its rows.
+        """
+        text = text.casefold()
+        data = text.encode('utf-8')
+        if len(data) < 3:
+            candidates = np.arange(len(self.titles)) if within is None else np.flatnonzero(within)
+        else:
+            grams = {int.from_bytes(data[i:i + 3], 'big') for i in range(len(data) - 2)}
+            candidates = None
+            for postings in sorted(map(self._postings, grams), key=len):
+                candidates = postings if candidates is None else np.intersect1d(candidates, postings,
+                                                                                assume_unique=True)
+                if not len(candidates):
+                    break
+            if within is not None:
+                candidates = candidates[within[candidates]]
+        titles = self.titles
+        return np.fromiter((row for row in candidates.tolist() if text in titles[row]), dtype=np.int64)
+
+
+class TableIndex:
+    """
+    Filter, sort and page the rows of a video frame. Each column's stable
+    ascending sort order (with its values in that order and how many of
+    them are not missing) is computed on first use and kept; the title
+    index is built on the first title search.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._orders = {}
+        self._titles = None
+        self._last = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def order(self, column, descending=False):
+        """
+        Row positions sorted by `column`, ascending unless `descending`
+        (ascending ties keep table order; missing dates come last either way).
+        """
+        if column not in self._orders:
+            values = self.df[column]
+            if values.dtype.kind == 'O':     # titles: object or string dtype
+                values = values.str.casefold()
+            order = values.argsort(kind='stable').to_numpy()
+            self._orders[column] = order, values.to_numpy()[order], int(values.notna().sum())
+        order, _, present = self._orders[column]
+        if descending:
+            return np.concatenate([order[:present][::-1], order[present:]])
+        return order
+
+    def title_index(self):
+        if self._titles is None:
+            self._titles = TitleIndex(self.df['Title'].str.casefold().tolist())
+        return self._titles
+
+    def between(self, column, low=None, high=None):
+        """
+        Positions of the rows with low <= column < high (either bound may be
+        None), in `column` order. Rows missing the value never match.
+        """
+        order = self.order(column)
+        _, values, present = self._orders[column]
+        start = 0 if low is None else np.searchsorted(values[:present], np.asarray(low, dtype=values.dtype), 'left')
+        stop = present if high is None else np.searchsorted(values[:present], np.asarray(high, dtype=values.dtype),
+                                                            'left')
+        return order[start:stop]
+
+    def query(self, title="", published=(None, None), views=(None, None), sort=None, descending=False):
+        """
+        Positions of the matching rows in display order. `published` and
+        `views` are half-open [low, high) ranges; `title` is a
+        case-insensitive substring. The last result is kept, so paging
+        through it costs nothing.
+        """
+        key = (title, tuple(published), tuple(views), sort, descending)
+        if self._last is not None and self._last[0] == key:
+            return self._last[1]
+
+        mask = None
+        for column, (low, high) in (('Published', published), ('Views', views)):
+            if low is None and high is None:
+                continue
+            inside = np.zeros(len(self.df), dtype=bool)
+            inside[self.between(column, low, high)] = True
+            mask = inside if mask is None else mask & inside
+        if title:
+            inside = np.zeros(len(self.df), dtype=bool)
+            inside[self.title_index().search(title, within=mask)] = True
+            mask = inside
+
+        if sort is None:
+            rows = np.arange(len(self.df))[::-1] if descending else np.arange(len(self.df))
+        else:
+            rows = self.order(sort, descending)
+        if mask is not None:
+            rows = rows[mask[rows]]
+        self._last = key, rows
+        return rows
+
+    def page(self, rows, page=1, page_size=DEFAULT_PAGE_SIZE):
+        """The rows of 1-based page `page` of `rows`, as a DataFrame."""
+        start = (page - 1) * page_size
+        return self.df.iloc[rows[start:start + page_size]]
+
+
+def page_count(rows, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, -(-len(rows) // page_size))
@@ -0,0 +1,229 @@
+"""
+Tag analytics on the 'Tags' column of the video table.
+
+VideoTable interns every tag once and stores each video's tags as ids in
+CSR form (offsets + codes); to_frame() exposes them as an Arrow
+list<dictionary<string>> column without copying a string per video.
+TagIndex reads those arrays back and answers tag queries (videos with a
+tag, per-tag views / likes / engagement, co-occurring tags) with numpy
+bincount and slicing, never by scanning DataFrame rows.
+"""
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # without pyarrow the column holds plain lists
+    pa = pc = None
+
+try:
+    import scipy.sparse as sparse
+except ImportError:  # only TagIndex.matrix() needs scipy
+    sparse = None
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+TAGS_COLUMN = "Tags"
+
+# Separator for tags in CSV / JSON exports (YouTube tags cannot contain commas)
+TAG_SEPARATOR = ", "
+
+
+def tags_array(offsets, codes, names):
+    """
+    Column values for the tags of len(offsets) - 1 videos: row i holds
+    names[codes[offsets[i]:offsets[i+1]]]. `offsets` may start above zero
+    (a slice of a longer table); the dictionary then holds only the tags
+    the slice uses, so its cost follows the slice, not the whole table.
+    The codes are copied, so the result does not pin the buffer of a
+    growing `array.array`.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    codes = np.array(codes[offsets[0]:offsets[-1]], dtype=np.int32)
+    if offsets[0]:
+        used, codes = np.unique(codes, return_inverse=True)
+        codes = codes.astype(np.int32)
+        names = [names[code] for code in used.tolist()]
+    offsets = offsets - offsets[0]
+    if pa is None:
+        names = np.asarray(names, dtype=object)
+        return [list(names[codes[a:b]]) for a, b in zip(offsets[:-1], offsets[1:])]
+    values = pa.DictionaryArray.from_arrays(pa.array(codes, pa.int32()), pa.array(names, pa.string()))
+    return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), values))
+
+
+def join_tags(values, sep=TAG_SEPARATOR):
+    """Tags column as one 'a, b, c' string per row (for CSV and JSON)."""
+    if pa is not None and isinstance(values.array, pd.arrays.ArrowExtensionArray):
+        lists = values.array.__arrow_array__()
+        lists = lists.cast(pa.list_(pa.string()))
+        joined = pc.binary_join(lists, sep)
+        return pd.Series(joined.to_pandas(), index=values.index, name=values.name).fillna("")
+    return values.map(lambda tags: sep.join(tags) if isinstance(tags, (list, tuple, np.ndarray)) else "")
+
+
+class TagIndex:
+    """
+    Tags of a video table as a sparse video x tag matrix in CSR form:
+    row i (the i-th row of the frame it was built from) has the tag ids
+    codes[offsets[i]:offsets[i+1]], which index into `names`. The inverted
+    index (tag -> rows, sorted) is built on first use.
+    """
+
+    def __init__(self, names, offsets, codes):
+        self.names = np.asarray(names, dtype=object)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self._ids = None
+        self._entry_rows = None
+        self._inverted = None
+
+    @classmethod
+    def from_frame(cls, df, column=TAGS_COLUMN):
+        values = df[column].array
+        if pa is not None and isinstance(values, pd.arrays.ArrowExtensionArray):
+            return cls._from_arrow(values.__arrow_array__())
+        lists = [tags if isinstance(tags, (list, tuple, np.ndarray)) else () for tags in values]
+        lengths = np.fromiter(map(len, lists), dtype=np.int64, count=len(lists))
+        codes, names = pd.factorize(np.array(list(chain.from_iterable(lists)), dtype=object))
+        return cls(names, np.concatenate(([0], np.cumsum(lengths))), codes)
+
+    @classmethod
+    def _from_arrow(cls, chunked):
+        lengths, code_parts, name_parts = [], [], []
+        base = 0
+        for chunk in chunked.chunks:
+            values = chunk.flatten()
+            if not pa.types.is_dictionary(values.type):
+                values = values.dictionary_encode()
+            lengths.append(chunk.value_lengths().fill_null(0).to_numpy())
+            code_parts.append(values.indices.to_numpy(zero_copy_only=False).astype(np.int64) + base)
+            name_parts.append(values.dictionary.to_numpy(zero_copy_only=False))
+            base += len(values.dictionary)
+
+        lengths = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int64)
+        codes = np.concatenate(code_parts) if code_parts else np.zeros(0, dtype=np.int64)
+        names = np.concatenate(name_parts) if name_parts else np.zeros(0, dtype=object)
+        if len(name_parts) > 1:
+            # Chunks carry their own dictionaries; merge them into one id space
+            remap, names = pd.factorize(names)
+            codes = remap[codes]
+        return cls(names, np.concatenate(([0], np.cumsum(lengths))), codes)
+
+    @property
+    def n_videos(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_tags(self):
+        return len(self.names)
+
+    def tag_id(self, tag):
+        """Interned id of `tag`, or None if no video has it."""
+        if self._ids is None:
+            self._ids = {name: i for i, name in enumerate(self.names)}
+        return self._ids.get(tag)
+
+    def _rows(self):
+        # Row of every (video, tag) entry
+        if self._entry_rows is None:
+            self._entry_rows = np.repeat(np.arange(self.n_videos), np.diff(self.offsets))
+        return self._entry_rows
+
+    def _inverted_index(self):
+        if self._inverted is None:
+            # Stable, so rows stay sorted within a tag; numpy radix-sorts 16-bit keys
+            keys = self.codes.astype(np.uint16 if self.n_tags <= 1 << 16 else np.int32)
+            order = np.argsort(keys, kind='stable')
+            tag_offsets = np.concatenate(([0], np.cumsum(np.bincount(self.codes, minlength=self.n_tags))))
+            self._inverted = tag_offsets, self._rows()[order]
+        return self._inverted
+
+    def videos_with(self, tag):
+        """Sorted row positions of the videos tagged `tag`."""
+        tag_id = self.tag_id(tag)
+        if tag_id is None:
+            return np.zeros(0, dtype=np.int64)
+        tag_offsets, rows = self._inverted_index()
+        return rows[tag_offsets[tag_id]:tag_offsets[tag_id + 1]]
+
+    def videos_with_all(self, tags):
+        """Sorted row positions of the videos tagged with every tag in `tags`."""
+        result = None
+        for tag in sorted(tags, key=lambda t: len(self.videos_with(t))):
+            rows = self.videos_with(tag)
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result if result is not None else np.zeros(0, dtype=np.int64)
+
+    def counts(self):
+        """Number of videos per tag id."""
+        return np.bincount(self.codes, minlength=self.n_tags)
+
+    def matrix(self):
+        """The video x tag incidence matrix as a scipy.sparse CSR matrix."""
+        if sparse is None:
+            raise ImportError("TagIndex.matrix() needs scipy (pip install scipy)")
+        data = np.ones(len(self.codes), dtype=np.int8)
+        return sparse.csr_matrix((data, self.codes, self.offsets), shape=(self.n_videos, self.n_tags))
+
+    def aggregate(self, df):
+        """
+        Per-tag totals over the rows of `df` (the frame this index was built
+        from): videos, views, likes, comments, average views and engagement
+        ((likes + comments) / views). Sorted by views, unused tags left out.
+        """
+        rows = self._rows()
+        counts = self.counts()
+        totals = {}
+        for column in ('Views', 'Likes', 'Comments'):
+            values = df[column].to_numpy(dtype=np.float64)
+            totals[column] = np.bincount(self.codes, weights=values[rows], minlength=self.n_tags)
+
+        used = counts > 0
+        views = totals['Views'][used]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            engagement = np.where(views > 0, (totals['Likes'][used] + totals['Comments'][used]) / views, 0.0)
+        result = pd.DataFrame({
+            'Tag': self.names[used],
+            'Videos': counts[used],
+            'Views': views.astype(np.int64),
+            'Likes': totals['Likes'][used].astype(np.int64),
+            'Comments': totals['Comments'][used].astype(np.int64),
+            'Avg views': views / counts[used],
+            'Engagement': engagement,
+        })
+        return result.sort_values('Views', ascending=False, kind='stable', ignore_index=True)
+
+    def cooccurrence(self, tag, n=None):
+        """
+        Tags that appear together with `tag`: how many of its videos carry
+        each one, and that count as a share of its videos. Most common first.
+        """
+        rows = self.videos_with(tag)
+        if not len(rows):
+            return pd.DataFrame({'Tag': [], 'Videos': [], 'Share': []})
+
+        # Gather the CSR rows of those videos in one vectorized step
+        starts = self.offsets[rows]
+        lengths = self.offsets[rows + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        counts = np.bincount(self.codes[positions], minlength=self.n_tags)
+        counts[self.tag_id(tag)] = 0
+
+        top = np.flatnonzero(counts)
+        top = top[np.argsort(-counts[top], kind='stable')][:n]
+        return pd.DataFrame({'Tag': self.names[top], 'Videos': counts[top], 'Share': counts[top] / len(rows)})
+
+    def cooccurrence_matrix(self, tags):
+        """Videos shared by every pair of `tags` (a len(tags) x len(tags) DataFrame)."""
+        indicator = np.zeros((self.n_videos, len(tags)), dtype=np.float32)
+        for j, tag in enumerate(tags):
+            indicator[self.videos_with(tag), j] = 1
+        shared = (indicator.T @ indicator).astype(np.int64)
+        return pd.DataFrame(shared, index=list(tags), columns=list(tags))
@@ -0,0 +1,268 @@
+"""
+Thumbnails: which size variant to ask the API for, and a local disk cache
+of the images so the browser does not fetch one full-size image per row
+from i.ytimg.com on every render.
+
+The fetcher asks only for the smallest variant at least as wide as the
+place it is shown (times THUMBNAIL_DPR for HiDPI screens). ThumbnailCache
+downloads images concurrently over keep-alive connections, keeps them as
+files under THUMBNAIL_DIR with a SQLite index for least-recently-used
+eviction, and hands the dashboards something local to show:
+
+    thumbs = get_thumbnail_cache()
+    frame['Thumbnail'] = thumbs.display_urls(frame['Thumbnail'])   # data: URIs / static URLs
+    st.image(thumbs.local_path(channel['thumbnail']), width=150)   # served by Streamlit
+
+Images up to INLINE_MAX_BYTES are inlined as data: URIs. With
+THUMBNAIL_URL_PREFIX set (THUMBNAIL_DIR inside Streamlit's static/ folder
+and server.enableStaticServing on), every cached image is linked there
+instead. Images that cannot be fetched keep their original URL.
+"""
+import base64
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from yt_batch import HttpPool
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# Widths of the thumbnail variants the API returns (heights follow the aspect ratio)
+VIDEO_THUMBNAIL_WIDTHS = {'default': 120, 'medium': 320, 'high': 480, 'standard': 640, 'maxres': 1280}
+CHANNEL_THUMBNAIL_WIDTHS = {'default': 88, 'medium': 240, 'high': 800}
+
+# CSS pixels the dashboards show thumbnails at: a video table cell (rows are
+# 35 px high, 16:9 images) and the channel header (st.image(width=150))
+TABLE_THUMBNAIL_WIDTH = 60
+CHANNEL_THUMBNAIL_WIDTH = 150
+
+# Device pixel ratio to fetch for, so images stay sharp on HiDPI screens
+THUMBNAIL_DPR = 2
+
+# Local image cache (override the directory with YT_THUMBNAIL_DIR)
+THUMBNAIL_DIR = os.environ.get("YT_THUMBNAIL_DIR", ".yt_thumbnails")
+MAX_THUMBNAIL_BYTES = 64 * 1024 * 1024
+
+# Optional URL the cache directory is served under, e.g. "app/static/thumbnails/"
+THUMBNAIL_URL_PREFIX = os.environ.get("YT_THUMBNAIL_URL", "")
+
+# Cached images up to this size are inlined as data: URIs (the 'default'
+# video variant is a few KB)
+INLINE_MAX_BYTES = 16 * 1024
+
+# Concurrent image downloads, and how long one may take
+THUMBNAIL_WORKERS = 8
+THUMBNAIL_TIMEOUT = 5
+
+# A URL that could not be fetched is not tried again for this many seconds
+# (the row keeps its original URL meanwhile)
+RETRY_FAILED_AFTER = 600
+
+_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
+
+# SQLite limits bound parameters per statement; stay well below it
+_SQL_CHUNK = 500
+
+
+def thumbnail_variant(widths, display_width, dpr=THUMBNAIL_DPR):
+    """Name of the smallest variant at least display_width * dpr wide (else the widest one)."""
+    wide_enough = [name for name, width in widths.items() if width >= display_width * dpr]
+    if wide_enough:
+        return min(wide_enough, key=widths.get)
+    return max(widths, key=widths.get)
+
+
+# Variants the fetcher requests (see the fields masks in yt_fetcher)
+VIDEO_THUMBNAIL = thumbnail_variant(VIDEO_THUMBNAIL_WIDTHS, TABLE_THUMBNAIL_WIDTH)
+CHANNEL_THUMBNAIL = thumbnail_variant(CHANNEL_THUMBNAIL_WIDTHS, CHANNEL_THUMBNAIL_WIDTH)
+
+
+def thumbnail_url(thumbnails, variant):
+    """URL of `variant` in a snippet's thumbnails, or '' if it has none."""
+    return thumbnails.get(variant, {}).get('url', '')
+
+
+class ThumbnailCache:
+    """
+    Downloaded thumbnails as files named after a hash of their URL, with a
+    SQLite index of sizes and access times. The directory as a whole is
+    kept under `max_bytes` by deleting the least recently used images.
+    """
+
+    def __init__(self, directory=THUMBNAIL_DIR, max_bytes=MAX_THUMBNAIL_BYTES, url_prefix=THUMBNAIL_URL_PREFIX,
+                 inline_max_bytes=INLINE_MAX_BYTES, max_workers=THUMBNAIL_WORKERS, timeout=THUMBNAIL_TIMEOUT):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.url_prefix = url_prefix
+        self.inline_max_bytes = inline_max_bytes
+        self.max_workers = max_workers
+        self._http = HttpPool(max_workers, timeout)
+        self._failed = {}    # url -> time of the last failed download
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " url TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " content_type TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS images_lru ON images (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _file_name(url):
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        return hashlib.sha1(url.encode('utf-8')).hexdigest() + (ext if ext in _EXTENSIONS else '.jpg')
+
+    def _lookup(self, urls):
+        """{url: (name, content_type, size)} for the cached ones, marking them used."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(urls), _SQL_CHUNK):
+                chunk = urls[i:i + _SQL_CHUNK]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(f"SELECT url, name, content_type, size FROM images WHERE url IN ({marks})",
+                                          chunk).fetchall()
+                for url, name, content_type, size in rows:
+                    found[url] = name, content_type, size
+                if rows:
+                    self._conn.execute(f"UPDATE images SET accessed_at = ? WHERE url IN ({marks})",
+                                       [time.time(), *chunk])
+            if found:
+                self._conn.commit()
+        # An image removed from disk behind our back is fetched again
+        return {url: entry for url, entry in found.items()
+                if os.path.exists(os.path.join(self.directory, entry[0]))}
+
+    def _download(self, url):
+        with self._http.connection() as http:
+            response, content = http.request(url, "GET")
+        if response.status != 200:
+            raise OSError(f"HTTP {response.status}")
+        content_type = response.get('content-type', 'image/jpeg').split(';')[0].strip()
+        if not content_type.startswith('image/'):
+            raise OSError(f"not an image ({content_type})")
+        return content, content_type
+
+    def _store(self, fetched):
+        """Write {url: (content, content_type)} to disk and the index, then evict."""
+        rows = []
+        for url, (content, content_type) in fetched.items():
+            name = self._file_name(url)
+            path = os.path.join(self.directory, name)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+            rows.append((url, name, content_type, len(content), time.time()))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO images (url, name, content_type, size, accessed_at)"
+                                   " VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+        return {url: (name, content_type, size) for url, name, content_type, size, _ in rows}
+
+    def _evict(self):
+        """Delete least recently used images until the cache fits in max_bytes."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so we don't evict again on the very next write
+        excess = total - int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for url, name, size in self._conn.execute("SELECT url, name, size FROM images ORDER BY accessed_at"):
+            victims.append((url, name))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM images WHERE url = ?", [(url,) for url, _ in victims])
+        for _, name in victims:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def fetch_many(self, urls):
+        """
+        {url: (file name, content type, size)} for every URL that is cached or
+        could be downloaded now. Missing images are fetched concurrently.
+        """
+        urls = list(dict.fromkeys(url for url in urls if url))
+        cached = self._lookup(urls)
+        retry_from = time.time() - RETRY_FAILED_AFTER
+        missing = [url for url in urls if url not in cached and self._failed.get(url, 0) < retry_from]
+        if not missing:
+            return cached
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as pool:
+            for url, future in zip(missing, [pool.submit(self._download, url) for url in missing]):
+                try:
+                    fetched[url] = future.result()
+                except Exception as e:
+                    self._failed[url] = time.time()
+                    logger.warning("Could not fetch thumbnail %s: %s", url, e)
+        if fetched:
+            cached.update(self._store(fetched))
+        return cached
+
+    def local_path(self, url):
+        """Path of the cached copy of `url` (fetched now if needed), or `url` itself if it cannot be had."""
+        entry = self.fetch_many([url]).get(url)
+        return os.path.join(self.directory, entry[0]) if entry else url
+
+    def display_urls(self, urls):
+        """
+        What to put in an image column instead of `urls`: a static URL under
+        url_prefix, a data: URI for small images, or the original URL.
+        """
+        urls = list(urls)
+        cached = self.fetch_many(urls)
+        shown = []
+        for url in urls:
+            entry = cached.get(url)
+            if entry is not None and self.url_prefix:
+                url = self.url_prefix + entry[0]
+            elif entry is not None and entry[2] <= self.inline_max_bytes:
+                url = self._data_uri(entry) or url
+            shown.append(url)
+        return shown
+
+    def _data_uri(self, entry):
+        name, content_type, _ = entry
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                return f"data:{content_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+        except FileNotFoundError:   # evicted by another session in the meantime
+            return None
+
+    def clear(self):
+        with self._lock:
+            names = [name for (name,) in self._conn.execute("SELECT name FROM images")]
+            self._conn.execute("DELETE FROM images")
+            self._conn.commit()
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+@functools.lru_cache(maxsize=1)
+def get_thumbnail_cache():
+    """Process-wide thumbnail cache shared by every dashboard session."""
+    return ThumbnailCache()
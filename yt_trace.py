@@ -0,0 +1,301 @@
+"""
+Timing spans for the fetch path, and an optional profiler switch.
+
+Every fetch run gets a Tracer (FetchSession.tracer). The run, each of its
+phases (channel lookup, playlist paging, video details, building the
+table, writing the snapshot) and every API call is a span with its start,
+duration and attributes (response bytes, items, retries, status):
+
+    tracer = Tracer("trace.jsonl")
+    get_all_videos(api_key, channel_id, tracer=tracer)   # appends its spans to trace.jsonl
+    tracer.phase_summary()          # one dict per phase, for the dashboards
+
+Spans nest through a context variable, which yt_batch hands to its worker
+threads, so an API call made on a worker lands under the phase that
+queued it. API calls roll their bytes, items and retries up into their
+parent span.
+
+With TRACE_PATH set, every run appends its spans there: as flat JSON
+lines, or with TRACE_FORMAT = 'otlp' as OTLP/JSON (one
+ExportTraceServiceRequest per line, the format the OpenTelemetry
+Collector's otlpjsonfile receiver reads).
+
+profiled(path) wraps a run in cProfile (.prof, for pstats or snakeviz),
+or in pyinstrument's sampling profiler for an .html path.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import pyinstrument
+except ImportError:  # only needed for sampling profiles (.html)
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# File every run appends its spans to; empty disables export (override with YT_TRACE_PATH)
+TRACE_PATH = os.environ.get("YT_TRACE_PATH", "")
+
+# 'jsonl' (one flat record per span) or 'otlp' (OpenTelemetry OTLP/JSON)
+TRACE_FORMAT = os.environ.get("YT_TRACE_FORMAT", "jsonl")
+
+# Profile dashboard loads and CLI runs into this file (.prof: cProfile, .html: pyinstrument);
+# empty disables (override with YT_PROFILE_PATH)
+PROFILE_PATH = os.environ.get("YT_PROFILE_PATH", "")
+
+# Functions listed when a cProfile run is logged
+PROFILE_TOP = 25
+
+SERVICE_NAME = "youtube-channel-data-fetcher"
+
+# Phases in the order a run goes through them (the summary follows it)
+PHASES = ('channel', 'playlist', 'video_details', 'build_frame', 'snapshot')
+
+# API call spans kept per tracer; beyond this (long comment harvests) calls
+# still count in their parent's totals but are not recorded one by one
+MAX_SPANS = 100_000
+
+# Counters an API call span adds to its parent
+_ROLLUP = ('api_calls', 'bytes', 'items', 'retries')
+
+_current = contextvars.ContextVar('yt_trace_span', default=None)
+
+
+def _random_id(nbytes):
+    # Ids only need to be unique, not unguessable; secrets.token_hex costs a
+    # getrandom() syscall per span, which adds up over thousands of API calls
+    return f"{random.getrandbits(nbytes * 8):0{nbytes * 2}x}"
+
+
+class Span:
+    """One timed operation. `attributes` holds its counters and labels."""
+
+    __slots__ = ('tracer', 'name', 'kind', 'span_id', 'parent', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, tracer, name, kind, parent, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.span_id = _random_id(8)
+        self.parent = parent
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.error = None
+
+    @property
+    def duration(self):
+        """Seconds, so far for a span that has not ended."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set(self, **attributes):
+        with self.tracer._lock:
+            self.attributes.update(attributes)
+
+    def add(self, **counters):
+        with self.tracer._lock:
+            for key, value in counters.items():
+                self.attributes[key] = self.attributes.get(key, 0) + value
+
+
+class Tracer:
+    """
+    Spans of one run (or of several runs that share it), kept in memory.
+    export() appends them to `path` in `fmt` ('jsonl' or 'otlp').
+    """
+
+    def __init__(self, path=TRACE_PATH, fmt=TRACE_FORMAT, max_spans=MAX_SPANS):
+        self.trace_id = _random_id(16)
+        self.path = path
+        self.fmt = fmt
+        self.spans = []
+        self.max_spans = max_spans
+        self.dropped = 0
+        self._exported = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        """The innermost open span of this tracer in the current context, or None."""
+        span = _current.get()
+        return span if span is not None and span.tracer is self else None
+
+    @contextmanager
+    def span(self, name, kind='phase', parent=None, **attributes):
+        """
+        Time the block as a span named `name`, under `parent` (default: the
+        current span). kind is 'run', 'phase' or 'api'. Yields the Span.
+        """
+        parent = parent or self.current()
+        span = Span(self, name, kind, parent, attributes)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            span.end_ns = time.time_ns()
+            with self._lock:
+                if kind != 'api' or len(self.spans) < self.max_spans:
+                    self.spans.append(span)
+                else:
+                    self.dropped += 1
+                if kind == 'api' and parent is not None:
+                    for key in _ROLLUP:
+                        if key in span.attributes:
+                            parent.attributes[key] = parent.attributes.get(key, 0) + span.attributes[key]
+
+    def phase_summary(self):
+        """
+        One dict per phase that ran: how many spans, wall seconds (first
+        start to last end), busy seconds (summed; above wall when batches ran
+        in parallel), and the API calls, bytes, items and retries under it.
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span.kind == 'phase']
+        rows = {}
+        for span in spans:
+            row = rows.setdefault(span.name, {'phase': span.name, 'spans': 0, 'start': span.start_ns,
+                                              'end': span.end_ns, 'busy_s': 0.0, 'api_calls': 0,
+                                              'bytes': 0, 'items': 0, 'retries': 0, 'errors': 0})
+            row['spans'] += 1
+            row['start'] = min(row['start'], span.start_ns)
+            row['end'] = max(row['end'], span.end_ns)
+            row['busy_s'] += span.duration
+            row['errors'] += span.error is not None
+            for key in _ROLLUP:
+                row[key] += span.attributes.get(key, 0)
+        order = {name: i for i, name in enumerate(PHASES)}
+        result = sorted(rows.values(), key=lambda row: (order.get(row['phase'], len(order)), row['start']))
+        for row in result:
+            row['wall_s'] = (row.pop('end') - row.pop('start')) / 1e9
+        return result
+
+    def records(self, spans=None):
+        """Finished spans (default: all) as flat dicts (the 'jsonl' format)."""
+        if spans is None:
+            with self._lock:
+                spans = list(self.spans)
+        return [{
+            'trace_id': self.trace_id,
+            'span_id': span.span_id,
+            'parent_id': span.parent.span_id if span.parent is not None else None,
+            'name': span.name,
+            'kind': span.kind,
+            'start': span.start_ns / 1e9,
+            'duration_ms': round((span.end_ns - span.start_ns) / 1e6, 3),
+            'status': 'error' if span.error else 'ok',
+            'error': span.error,
+            'attributes': dict(span.attributes),
+        } for span in spans]
+
+    def otlp(self, spans=None):
+        """Finished spans (default: all) as one OTLP/JSON ExportTraceServiceRequest."""
+        if spans is None:
+            with self._lock:
+                spans = list(self.spans)
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [{
+                    'traceId': self.trace_id,
+                    'spanId': span.span_id,
+                    'parentSpanId': span.parent.span_id if span.parent is not None else '',
+                    'name': span.name,
+                    'kind': 3 if span.kind == 'api' else 1,     # SPAN_KIND_CLIENT / SPAN_KIND_INTERNAL
+                    'startTimeUnixNano': str(span.start_ns),
+                    'endTimeUnixNano': str(span.end_ns),
+                    'attributes': _otlp_attributes(dict(span.attributes, **{'yt.kind': span.kind})),
+                    'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+                } for span in spans],
+            }],
+        }]}
+
+    def export(self):
+        """Append the spans finished since the last export to the trace file, if there is one."""
+        path = self.path
+        if not path:
+            return
+        with self._lock:
+            spans = self.spans[self._exported:]
+            self._exported = len(self.spans)
+        if not spans:
+            return
+        if self.fmt == 'otlp':
+            lines = [json.dumps(self.otlp(spans), separators=(',', ':'))]
+        else:
+            lines = [json.dumps(record, separators=(',', ':'), default=str) for record in self.records(spans)]
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            logger.exception("Could not write trace to %s", path)
+
+
+def _otlp_attributes(attributes):
+    values = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        values.append({'key': key, 'value': typed})
+    return values
+
+
+@contextmanager
+def profiled(path=None):
+    """
+    Profile the block into `path` (default PROFILE_PATH; no-op if both are
+    empty): a cProfile dump, or a pyinstrument sampling profile for an
+    .html path. The top functions of a cProfile run are logged. Only the
+    calling thread is profiled; time it spends waiting on worker threads
+    (API calls) shows up as waits.
+    """
+    path = path or PROFILE_PATH
+    if not path:
+        yield
+        return
+
+    if path.lower().endswith(".html"):
+        if pyinstrument is None:
+            raise ImportError("Sampling profiles need pyinstrument (pip install pyinstrument)")
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            logger.info("Sampling profile written to %s", path)
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        logger.info("Profile written to %s\n%s", path, out.getvalue())
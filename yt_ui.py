@@ -0,0 +1,370 @@
+"""
+Streamlit pieces shared by both dashboards.
+
+youtube_dashboard.py and utube_secure_scraper.py differ in how they read
+and check their inputs; what they show once data is loaded is the same
+and lives here:
+
+    listener = StreamlitListener(progress_area)      # progress while loading
+    get_all_videos(api_key, channel_id, listener=listener)
+    ...
+    dataset_view()                                   # everything below the sidebar
+
+dataset_view() reads the loaded data from st.session_state ('data',
+'channel', 'channels', 'quota', 'phases', 'refreshed_at', 'keys').
+"""
+import functools
+import logging
+import time
+
+import pandas as pd
+import streamlit as st
+
+from yt_export import EXPORT_FORMATS, available_formats, export_bytes
+from yt_fetcher import FetchListener
+from yt_history import get_history, trending
+from yt_refresh import prewarmed
+from yt_table import DEFAULT_PAGE_SIZE, PAGE_SIZES, SORT_COLUMNS, TableIndex, page_count
+from yt_tags import TagIndex
+from yt_thumbs import get_thumbnail_cache
+
+try:
+    import pyarrow as pa
+except ImportError:  # tables go to st.dataframe as pandas, export is CSV only
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# CONFIGURATION
+# ==========================================
+# How the video table columns are shown (while loading and once loaded)
+VIDEO_COLUMNS = {
+    "Thumbnail": st.column_config.ImageColumn("Thumbnail", width="medium"),
+    "Published": st.column_config.DatetimeColumn("Published", format="YYYY-MM-DD"),
+    "Views": st.column_config.NumberColumn("Views", format="%d 👁️"),
+    "Likes": st.column_config.NumberColumn("Likes", format="%d 👍"),
+    "Comments": st.column_config.NumberColumn("Comments", format="%d 💬"),
+    "Tags": st.column_config.ListColumn("Tags"),
+}
+
+# Videos gaining views fastest since earlier loads (from the snapshot history)
+TRENDING_COUNT = 10
+TRENDING_COLUMNS = {
+    "Views/hour": st.column_config.NumberColumn("Views/hour", format="%.1f"),
+    "Likes/day": st.column_config.NumberColumn("Likes/day", format="%.1f"),
+    "7-day growth": st.column_config.NumberColumn("7-day growth", format="percent"),
+}
+
+# Per-phase timing of the last load (see yt_trace)
+PHASE_COLUMNS = {
+    "Wall (s)": st.column_config.NumberColumn("Wall (s)", format="%.2f",
+                                              help="From the phase's first start to its last end"),
+    "Busy (s)": st.column_config.NumberColumn("Busy (s)", format="%.2f",
+                                              help="Summed over parallel batches, so it can exceed the wall time"),
+    "KB received": st.column_config.NumberColumn("KB received", format="%.1f"),
+}
+
+# Tags with the most total views, and tags used together with a chosen one
+TAG_COUNT = 20
+TAG_COLUMNS = {
+    "Avg views": st.column_config.NumberColumn("Avg views", format="%d"),
+    "Engagement": st.column_config.NumberColumn("Engagement", format="percent",
+                                                help="(Likes + Comments) / Views"),
+    "Share": st.column_config.NumberColumn("Share", format="percent",
+                                           help="Share of the chosen tag's videos that also have this tag"),
+}
+
+
+class StreamlitListener(FetchListener):
+    """
+    Shows fetch progress where it is created and partial results in
+    `table_area`. With `error_details` off, errors are shown as their
+    message only and the exception stays in the logs (yt_fetcher logs
+    every failure with its traceback).
+    """
+
+    def __init__(self, table_area, error_details=True):
+        self.status_text = st.empty()
+        self.table = table_area.empty()
+        self.error_details = error_details
+        self.newest = None
+
+    def status(self, text):
+        self.status_text.text(text)
+
+    def rows(self, frame):
+        # Only the newest rows; the full table is paged once loading is done
+        frame = frame.tail(DEFAULT_PAGE_SIZE)
+        if self.newest is not None:
+            frame = pd.concat([self.newest, frame], ignore_index=True)
+        self.newest = frame.tail(DEFAULT_PAGE_SIZE)
+        self.table.dataframe(arrow_table(self.newest), column_config=VIDEO_COLUMNS, width="stretch", hide_index=True)
+
+    def warning(self, message):
+        st.warning(message)
+
+    def error(self, message, exc=None):
+        st.error(f"{message} ({exc})" if exc is not None and self.error_details else message)
+
+    def finish(self):
+        self.status_text.empty()
+        self.table.empty()
+
+
+def arrow_table(frame):
+    """
+    `frame` as an Arrow table for st.dataframe, without the pandas metadata
+    (pandas cannot read its own dtype string back for the list-typed Tags column).
+    Without pyarrow, Tags holds plain lists and `frame` is passed as is.
+    """
+    if pa is None:
+        return frame
+    return pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata()
+
+
+def dataset_memo():
+    """
+    Results derived from the loaded data (metrics, tables, export files).
+    Streamlit reruns the whole script on every interaction; anything kept
+    here is computed once per Load Data instead of once per rerun.
+    """
+    return st.session_state.setdefault('derived', {})
+
+
+def derived(memo, key, compute):
+    if key not in memo:
+        memo[key] = compute()
+    return memo[key]
+
+
+def phase_table(phases):
+    """Tracer.phase_summary() rows as a display table."""
+    return pd.DataFrame({
+        'Phase': [p['phase'].replace('_', ' ').capitalize() for p in phases],
+        'Wall (s)': [p['wall_s'] for p in phases],
+        'Busy (s)': [p['busy_s'] for p in phases],
+        'API calls': [p['api_calls'] for p in phases],
+        'KB received': [p['bytes'] / 1000 for p in phases],
+        'Items': [p['items'] for p in phases],
+        'Retries': [p['retries'] for p in phases],
+    })
+
+
+def history_version(channel_ids):
+    """Changes whenever new snapshots of `channel_ids` are written (see SnapshotStore.version)."""
+    history = get_history()
+    if history is None:
+        return None
+    try:
+        return history.version(channel_ids)
+    except OSError:
+        logger.exception("Could not read the snapshot history")
+        return None
+
+
+def load_prewarmed(channel_ids):
+    """What the background refresher keeps for `channel_ids`, or None (errors are logged, not shown)."""
+    try:
+        return prewarmed(channel_ids)
+    except Exception:
+        logger.exception("Could not read pre-warmed data")
+        return None
+
+
+def trending_table(df, channel_ids):
+    """Trending videos of `channel_ids` with their titles, or None before a second load."""
+    history = get_history()
+    if history is None:
+        return None
+    try:
+        trend = trending(history, channel_ids, TRENDING_COUNT)
+    except Exception:
+        # A history problem must not break the page
+        logger.exception("Could not compute trending videos")
+        return None
+    if trend is None or trend.empty:
+        return None
+    ids = trend['video_id'].astype(str)
+    # Only the few trending rows are looked up, not a title map of the whole table
+    known = df.loc[df['Video ID'].isin(ids), ['Video ID', 'Title']]
+    titles = dict(zip(known['Video ID'], known['Title']))
+    return pd.DataFrame({
+        'Title': ids.map(titles).to_numpy(),
+        'Views': trend['views'].to_numpy(),
+        'Views/hour': trend['views_per_hour'].to_numpy(),
+        'Likes/day': trend['likes_per_day'].to_numpy(),
+        '7-day growth': trend['growth_7d'].to_numpy(),
+    })
+
+
+@st.fragment
+def tag_panel(tag_index, tag_stats):
+    """Top tags by views and the tags most often used with a chosen one (reruns on its own)."""
+    top, related = st.columns([3, 2])
+    with top:
+        st.dataframe(tag_stats.head(TAG_COUNT), column_config=TAG_COLUMNS, width="stretch", hide_index=True)
+    with related:
+        tag = st.selectbox("Used together with", tag_stats['Tag'].head(TAG_COUNT))
+        st.dataframe(tag_index.cooccurrence(tag, TAG_COUNT), column_config=TAG_COLUMNS,
+                     width="stretch", hide_index=True)
+
+
+@st.fragment
+def export_controls(df, memo):
+    """Format picker and download button; changing the format reruns only this part."""
+    formats = available_formats()
+    # Without pyarrow only CSV is left, and there is nothing to pick
+    export_format = formats[0] if len(formats) == 1 else st.radio("Export format", formats, format_func=str.upper,
+                                                                  horizontal=True)
+    mime, ext = EXPORT_FORMATS[export_format]
+    # The file is generated on the first click and then kept for this dataset
+    payload = functools.partial(derived, memo, ('export', export_format),
+                                functools.partial(export_bytes, df, export_format))
+    st.download_button(f"Download Data as {export_format.upper()}", payload,
+                       f"youtube_stats_dashboard{ext}", mime)
+
+
+@st.fragment
+def video_table(table_index, max_chars=None):
+    """
+    Filters, sort order and paging for the video table. Queries run on the
+    server (see yt_table) and only the current page goes to the browser.
+    `max_chars` caps the title search input.
+    """
+    published = table_index.df['Published']
+    first, last = published.min(), published.max()
+
+    title_col, date_col, min_col, max_col = st.columns([3, 2, 1, 1])
+    title = title_col.text_input("Title contains", max_chars=max_chars)
+    dates = date_col.date_input("Published between", value=(), format="YYYY-MM-DD",
+                                min_value=first.date() if pd.notna(first) else None,
+                                max_value=last.date() if pd.notna(last) else None)
+    min_views = min_col.number_input("Min views", min_value=0, value=None, step=1000, placeholder="Any")
+    max_views = max_col.number_input("Max views", min_value=0, value=None, step=1000, placeholder="Any")
+
+    sort_col, order_col, size_col, page_col = st.columns([2, 1, 1, 1])
+    sort = sort_col.selectbox("Sort by", SORT_COLUMNS, index=SORT_COLUMNS.index('Published'),
+                              format_func=lambda column: column or "Playlist order")
+    descending = order_col.toggle("Descending", value=True)
+    page_size = size_col.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+
+    # Both ranges are half-open, so the end date and max views are bumped by one
+    start = pd.Timestamp(dates[0]) if dates else None
+    end = pd.Timestamp(dates[1]) + pd.Timedelta(days=1) if len(dates) > 1 else None
+    rows = table_index.query((title or "").strip(), (start, end),
+                             (min_views, None if max_views is None else max_views + 1), sort, descending)
+
+    # The label carries the page count, so a filter that changes it starts over at page 1
+    pages = page_count(rows, page_size)
+    page = page_col.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1)
+    first_row = (page - 1) * page_size
+    # Thumbnails come from the local cache (inlined), not one i.ytimg.com request per row
+    shown = table_index.page(rows, page, page_size)
+    shown = shown.assign(Thumbnail=get_thumbnail_cache().display_urls(shown['Thumbnail']))
+    st.dataframe(
+        arrow_table(shown),
+        column_config=VIDEO_COLUMNS,
+        width="stretch",
+        hide_index=True,
+        height=800
+    )
+    if len(rows):
+        st.caption(f"Videos {first_row + 1:,}–{min(first_row + page_size, len(rows)):,} of {len(rows):,}")
+    else:
+        st.caption("No videos match these filters.")
+
+
+def dataset_view(max_chars=None):
+    """The loaded data in st.session_state: header, load details, metrics, trending, tags, table, export."""
+    df = st.session_state['data']
+    ch = st.session_state['channel']
+    memo = dataset_memo()
+
+    if ch is not None:
+        col1, col2 = st.columns([1, 4])
+        with col1:
+            if ch['thumbnail']:
+                st.image(get_thumbnail_cache().local_path(ch['thumbnail']), width=150)
+        with col2:
+            st.title(ch['title'])
+            st.write(f"**Subscribers:** {int(ch['subscribers']):,} | "
+                     f"**Total Videos:** {ch['video_count']} | "
+                     f"**Total Views:** {int(ch['total_views']):,}")
+    else:
+        # Multi-channel load: one summary row per channel
+        channels = st.session_state['channels']
+        st.title(f"{len(channels)} Channels")
+        summary = derived(memo, 'channels', lambda: pd.DataFrame([
+            {
+                'Thumbnail': c['thumbnail'],
+                'Channel': c['title'],
+                'Subscribers': int(c['subscribers']),
+                'Videos': int(c['video_count']),
+                'Total Views': int(c['total_views'])
+            }
+            for c in channels.values()
+        ]))
+        st.dataframe(
+            summary,
+            column_config={"Thumbnail": st.column_config.ImageColumn("Thumbnail", width="small")},
+            width="stretch",
+            hide_index=True
+        )
+
+    q = st.session_state.get('quota')
+    keys = st.session_state.get('keys')
+    if q and keys is not None:
+        # Over every key of the pool, not one key's budget
+        st.caption(f"API quota: {q['units']} units over {q['requests']} requests for this load · "
+                   f"{keys.used_today():,} / {keys.total_budget:,} units used today")
+    refreshed_at = st.session_state.get('refreshed_at')
+    if refreshed_at:
+        st.caption(f"Kept fresh by the background refresher · last refreshed "
+                   f"{(time.time() - refreshed_at) / 60:.0f} min ago")
+    phases = st.session_state.get('phases')
+    if phases:
+        with st.expander("⏱️ Load timing"):
+            st.dataframe(phase_table(phases), column_config=PHASE_COLUMNS, width="stretch", hide_index=True)
+    if keys is not None and len(keys) > 1:
+        st.caption(" · ".join(
+            f"{s['key']}: {s['used']:,} units" + (f" (out of quota until {s['benched_until']:%H:%M} UTC)"
+                                                  if s['benched_until'] else "")
+            for s in keys.status()))
+
+    st.divider()
+
+    avg_views, max_views, avg_likes, total_likes = derived(memo, 'metrics', lambda: (
+        int(df['Views'].mean()), int(df['Views'].max()), int(df['Likes'].mean()), int(df['Likes'].sum())))
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Avg Views per Video", f"{avg_views:,}")
+    m2.metric("Most Viewed Video", f"{max_views:,}")
+    m3.metric("Avg Likes", f"{avg_likes:,}")
+    m4.metric("Total Likes", f"{total_likes:,}")
+
+    # Trending needs at least two loads of a channel; it is recomputed when the
+    # background refresher writes new snapshots
+    channel_ids = list(st.session_state['channels'])
+    trend = derived(memo, ('trending', history_version(channel_ids)), lambda: trending_table(df, channel_ids))
+    if trend is not None:
+        st.subheader("🔥 Trending")
+        st.dataframe(
+            trend,
+            column_config=TRENDING_COLUMNS,
+            width="stretch",
+            hide_index=True
+        )
+
+    tag_index = derived(memo, 'tag_index', lambda: TagIndex.from_frame(df))
+    tag_stats = derived(memo, 'tag_stats', lambda: tag_index.aggregate(df))
+    if not tag_stats.empty:
+        st.subheader("🏷️ Tags")
+        tag_panel(tag_index, tag_stats)
+
+    st.divider()
+
+    st.subheader("📺 Video Performance")
+
+    video_table(derived(memo, 'table', lambda: TableIndex(df)), max_chars)
+
+    export_controls(df, memo)